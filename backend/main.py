@@ -1,12 +1,18 @@
 from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel, Field, ConfigDict
 from services.ner_service import NERService
-from services.std_service import StdService
+from services.ner_batcher import create_ner_batcher
+from services.std_registry import std_service_registry
+from services.search_params import InvalidSearchParamsError
 from services.abbr_service import AbbrService
 from services.corr_service import CorrService
 from services.gen_service import GenService
+from utils.executors import cpu_executor, llm_executor, sparse_search_executor, configure_torch_threads, ExecutorSaturatedError
 from typing import List, Dict, Optional, Literal, Union, Any
+import asyncio
+import json
 import logging
 
 # 配置日志
@@ -25,13 +31,26 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# 设置每个 worker 的 torch 线程数，须在加载模型前完成
+configure_torch_threads()
+
 # 初始化各个服务
 ner_service = NERService()  # 命名实体识别服务
-standardization_service = StdService()  # 术语标准化服务
+ner_batcher = create_ner_batcher(ner_service, cpu_executor)  # NER 微批调度器
+standardization_service = std_service_registry.get()  # 术语标准化服务（预热默认配置）
 abbr_service = AbbrService()  # 缩写扩展服务
 gen_service = GenService()  # 文本生成服务
 corr_service = CorrService()  # 拼写纠正服务
 
+@app.on_event("shutdown")
+def shutdown_services():
+    """进程退出时关闭执行器并释放注册表中缓存的标准化服务"""
+    ner_batcher.shutdown()
+    cpu_executor.shutdown()
+    sparse_search_executor.shutdown(wait=True)
+    llm_executor.shutdown()
+    std_service_registry.shutdown()
+
 # 基础模型类
 class BaseInputModel(BaseModel):
     """基础输入模型，包含所有模型共享的字段"""
@@ -45,9 +64,36 @@ class BaseInputModel(BaseModel):
         description="大语言模型配置选项"
     )
 
+class SearchParams(BaseModel):
+    """索引检索参数，可用的参数取决于集合的索引类型"""
+    nprobe: Optional[int] = Field(
+        default=None,
+        description="IVF 类索引探测的聚类数",
+        ge=1,
+        le=65536
+    )
+    ef: Optional[int] = Field(
+        default=None,
+        description="HNSW 检索时的候选列表大小，不小于 topK",
+        ge=1,
+        le=32768
+    )
+    radius: Optional[float] = Field(
+        default=None,
+        description="范围检索的相似度下限",
+        ge=-1.0,
+        le=1.0
+    )
+    rerankFactor: Optional[int] = Field(
+        default=None,
+        description="压缩向量集合的重排候选倍数",
+        ge=0,
+        le=100
+    )
+
 class EmbeddingOptions(BaseModel):
     """向量数据库配置选项"""
-    provider: Literal["huggingface", "openai", "bedrock"] = Field(
+    provider: Literal["huggingface", "huggingface-onnx", "openai", "bedrock"] = Field(
         default="huggingface",
         description="向量数据库提供商"
     )
@@ -63,6 +109,32 @@ class EmbeddingOptions(BaseModel):
         default="economics_only_name",
         description="集合名称"
     )
+    topK: int = Field(
+        default=5,
+        description="每个实体返回的标准术语数量",
+        ge=1,
+        le=100
+    )
+    searchPreset: Optional[Literal["fast", "balanced", "accurate"]] = Field(
+        default=None,
+        description="检索延迟预设：fast 适合交互式调用，accurate 适合批量任务"
+    )
+    searchParams: Optional[SearchParams] = Field(
+        default=None,
+        description="显式指定的索引检索参数，覆盖预设"
+    )
+    domainName: Optional[str] = Field(
+        default=None,
+        description="只返回该领域（domain_name）的术语"
+    )
+    hybrid: bool = Field(
+        default=False,
+        description="同时做稠密与 BM25 稀疏检索并按倒数排名融合，需集合建库时写入稀疏向量"
+    )
+    fuzzyMatch: bool = Field(
+        default=True,
+        description="用术语名三元组索引处理拼写错误：高相似度时直接返回，否则作为候选与检索结果融合"
+    )
 
 class TextInput(BaseInputModel):
     """文本输入模型，用于标准化和命名实体识别"""
@@ -80,6 +152,35 @@ class TextInput(BaseInputModel):
         description="向量数据库配置选项"
     )
 
+class BatchDocument(BaseModel):
+    """批量标准化中的单篇文档"""
+    id: Optional[Union[str, int]] = Field(
+        None,
+        description="文档标识（字符串或整数，原样返回），缺省时使用文档序号"
+    )
+    text: str = Field(..., description="文档文本")
+
+class StdBatchInput(BaseModel):
+    """批量术语标准化输入模型"""
+    documents: List[Union[str, BatchDocument]] = Field(
+        default_factory=list,
+        description="文档列表，元素可以是纯文本或带 id 的文档"
+    )
+    options: Dict[str, bool] = Field(
+        default_factory=dict,
+        description="处理选项"
+    )
+    embeddingOptions: EmbeddingOptions = Field(
+        default_factory=EmbeddingOptions,
+        description="向量数据库配置选项"
+    )
+    batchSize: int = Field(
+        default=32,
+        description="每批送入 NER 模型的文档数",
+        ge=1,
+        le=512
+    )
+
 class AbbrInput(BaseInputModel):
     """缩写扩展输入模型"""
     text: str = Field(..., description="输入文本")
@@ -160,6 +261,146 @@ class GenInput(BaseInputModel):
         description="生成方法"
     )
 
+async def _recognize(text: str, options: Dict[str, bool], term_types: Dict[str, bool]) -> Dict:
+    """只用词典引擎时在 CPU 线程池中线性扫描（长文档不阻塞事件循环），否则经微批调度器运行模型"""
+    if not ner_service.uses_model(options):
+        return await cpu_executor.run(ner_service.process, text, options, term_types)
+    return await ner_batcher.process(text, options, term_types)
+
+def _search_entities(embedding_options: EmbeddingOptions, words: List[str]) -> List[List[Dict]]:
+    """从注册表取用已预热的标准化服务并批量检索实体（在 CPU 线程池中执行）"""
+    search_params = None
+    if embedding_options.searchParams is not None:
+        params = embedding_options.searchParams.model_dump(exclude_none=True)
+        if "rerankFactor" in params:
+            params["rerank_factor"] = params.pop("rerankFactor")
+        search_params = params
+    with std_service_registry.acquire(
+        provider=embedding_options.provider,
+        model=embedding_options.model,
+        collection_name=embedding_options.collectionName
+    ) as standardization_service:
+        return standardization_service.search_similar_terms_batch(
+            words,
+            limit=embedding_options.topK,
+            search_preset=embedding_options.searchPreset,
+            search_params=search_params,
+            domain_name=embedding_options.domainName,
+            hybrid=embedding_options.hybrid,
+            fuzzy=embedding_options.fuzzyMatch
+        )
+
+def _build_std_response(entities: List[Dict], std_results: List[List[Dict]]) -> Dict:
+    """组装单篇文档的标准化结果"""
+    if not entities:
+        return {"message": "No economics terms have been recognized", "standardized_terms": []}
+    # 跳过向量检索的快速路径（术语表精确匹配或三元组高相似度命中）的命中情况
+    fast_path_hits = sum(
+        1 for std_result in std_results
+        if std_result and std_result[0].get("match_type") in ("lexical", "lexical_variant", "fuzzy")
+    )
+    return {
+        "message": f"{len(entities)} economics terms have been recognized and standardized",
+        "metadata": {
+            "fast_path_hits": fast_path_hits,
+            "fast_path_hit_ratio": fast_path_hits / len(entities)
+        },
+        "standardized_terms": [
+            {
+                "original_term": entity['word'],
+                "entity_group": entity['entity_group'],
+                "standardized_results": std_result
+            }
+            for entity, std_result in zip(entities, std_results)
+        ]
+    }
+
+def _parse_jsonl_documents(content: bytes) -> List[Union[str, Dict]]:
+    """解析上传的 JSONL 文件，每行是一个文本字符串或 {"id", "text"} 对象"""
+    documents = []
+    for line_no, line in enumerate(content.decode("utf-8").splitlines(), start=1):
+        if not line.strip():
+            continue
+        try:
+            documents.append(json.loads(line))
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Invalid JSON on line {line_no}: {e}")
+    return documents
+
+async def _run_cpu_batch(func, *args):
+    """批量任务在 CPU 线程池已满时退避重试，而不是让整批失败"""
+    while True:
+        try:
+            return await cpu_executor.run(func, *args)
+        except ExecutorSaturatedError:
+            await asyncio.sleep(0.05)
+
+async def _stream_std_batch(input: StdBatchInput):
+    """
+    按批执行 NER 与标准化，并逐篇输出 NDJSON 结果
+    下一批的 NER 与当前批的向量检索并行；实体字符串在整个请求内去重，
+    每个不同的实体只做一次向量化与检索
+    """
+    options = dict(input.options)
+    term_types = {'allEconomicsTerms': options.pop('allEconomicsTerms', False)}
+    documents = [
+        (doc if isinstance(doc, BatchDocument) else BatchDocument(text=doc))
+        for doc in input.documents
+    ]
+    doc_ids = [doc.id if doc.id is not None else str(idx) for idx, doc in enumerate(documents)]
+    chunks = [
+        list(range(start, min(start + input.batchSize, len(documents))))
+        for start in range(0, len(documents), input.batchSize)
+    ]
+
+    def start_ner(chunk):
+        return asyncio.ensure_future(_run_cpu_batch(
+            ner_service.process_batch,
+            [documents[idx].text for idx in chunk],
+            options,
+            term_types,
+            input.batchSize
+        ))
+
+    std_cache: Dict[str, List[Dict]] = {}
+    next_ner = start_ner(chunks[0]) if chunks else None
+    try:
+        for chunk_no, chunk in enumerate(chunks):
+            try:
+                ner_results = await next_ner
+                error = None
+            except Exception as e:
+                ner_results, error = None, e
+            next_ner = start_ner(chunks[chunk_no + 1]) if chunk_no + 1 < len(chunks) else None
+
+            if error is None:
+                new_words = list(dict.fromkeys(
+                    entity['word']
+                    for result in ner_results
+                    for entity in result['entities']
+                    if entity['word'] not in std_cache
+                ))
+                if new_words:
+                    try:
+                        std_results = await _run_cpu_batch(_search_entities, input.embeddingOptions, new_words)
+                        std_cache.update(zip(new_words, std_results))
+                    except Exception as e:
+                        error = e
+
+            if error is not None:
+                logger.error(f"Error in batch standardization chunk {chunk_no + 1}: {str(error)}")
+                for idx in chunk:
+                    yield json.dumps({"id": doc_ids[idx], "error": str(error)}, ensure_ascii=False) + "\n"
+                continue
+
+            for idx, result in zip(chunk, ner_results):
+                entities = result['entities']
+                response = _build_std_response(entities, [std_cache[entity['word']] for entity in entities])
+                yield json.dumps({"id": doc_ids[idx], **response}, ensure_ascii=False) + "\n"
+    finally:
+        if next_ner is not None:
+            next_ner.cancel()
+
 # API 端点：术语标准化
 @app.post("/api/std")
 async def standardization(input: TextInput):
@@ -172,15 +413,7 @@ async def standardization(input: TextInput):
         term_types = {'allEconomicsTerms': all_economics_terms}
 
         # 进行命名实体识别
-        ner_results = ner_service.process(input.text, input.options, term_types)
-
-        # 初始化标准化服务
-        standardization_service = StdService(
-            provider=input.embeddingOptions.provider,
-            model=input.embeddingOptions.model,
-            # db_path=f"db/{input.embeddingOptions.dbName}.db",
-            collection_name=input.embeddingOptions.collectionName
-        )
+        ner_results = await _recognize(input.text, input.options, term_types)
 
         # 获取识别到的实体
         entities = ner_results.get('entities', [])
@@ -190,46 +423,87 @@ async def standardization(input: TextInput):
         if not entities:
             return {"message": "No economics terms have been recognized", "standardized_terms": []}
 
-        # 标准化每个实体
-        standardized_results = []
-        for entity in entities:
-            std_result = standardization_service.search_similar_terms(entity['word'])
-            standardized_results.append({
-                "original_term": entity['word'],
-                "entity_group": entity['entity_group'],
-                "standardized_results": std_result
-            })
-
-        return {
-            "message": f"{len(entities)} economics terms have been recognized and standardized",
-            "standardized_terms": standardized_results
-        }
+        # 一次批量检索标准化所有实体
+        std_results = await cpu_executor.run(
+            _search_entities,
+            input.embeddingOptions,
+            [entity['word'] for entity in entities]
+        )
+        return _build_std_response(entities, std_results)
 
+    except ExecutorSaturatedError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except InvalidSearchParamsError as e:
+        raise HTTPException(status_code=422, detail=str(e))
     except Exception as e:
         logger.error(f"Error in standardization processing: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+# API 端点：批量术语标准化
+@app.post("/api/std/batch")
+async def standardization_batch(request: Request):
+    """
+    批量标准化文档，结果以 NDJSON 流式返回，每行对应一篇文档
+    支持两种请求格式：
+    1. application/json：StdBatchInput
+    2. multipart/form-data：file 字段为 JSONL 文档文件，
+       可选 payload 字段为 StdBatchInput 其余字段的 JSON
+    """
+    try:
+        content_type = request.headers.get("content-type", "")
+        if content_type.startswith("multipart/form-data"):
+            form = await request.form()
+            upload = form.get("file")
+            if upload is None:
+                raise HTTPException(status_code=400, detail="Missing 'file' field")
+            payload = json.loads(form.get("payload") or "{}")
+            payload["documents"] = _parse_jsonl_documents(await upload.read())
+            input = StdBatchInput.model_validate(payload)
+        else:
+            input = StdBatchInput.model_validate(await request.json())
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+    logger.info(f"Received batch std request: documents={len(input.documents)}, batchSize={input.batchSize}")
+    return StreamingResponse(_stream_std_batch(input), media_type="application/x-ndjson")
+
 # API 端点：命名实体识别
 @app.post("/api/ner")
 async def ner(input: TextInput):
     try:
         logger.info(f"Received NER request: text={input.text}, options={input.options}, termTypes={input.termTypes}")
-        results = ner_service.process(input.text, input.options, input.termTypes)
+        results = await _recognize(input.text, input.options, input.termTypes)
         return results
+    except ExecutorSaturatedError as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         logger.error(f"Error in NER processing: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+# API 端点：NER 微批调度指标
+@app.get("/api/ner/metrics")
+async def ner_metrics():
+    return ner_batcher.stats()
+
+# API 端点：标准化服务与查询向量缓存指标
+@app.get("/api/std/metrics")
+async def std_metrics():
+    return std_service_registry.stats()
+
 # API 端点：拼写纠正
 @app.post("/api/corr")
 async def correct_notes(input: CorrInput):
     try:
         if input.method == "correct_spelling":  # 拼写纠正
-            return corr_service.correct_spelling(input.text, input.llmOptions)
+            return await llm_executor.run(corr_service.correct_spelling, input.text, input.llmOptions)
         elif input.method == "add_mistakes":  # 添加错误（测试用）
-            return corr_service.add_mistakes(input.text, input.errorOptions)
+            return await llm_executor.run(corr_service.add_mistakes, input.text, input.errorOptions)
         else:
             raise HTTPException(status_code=400, detail="Invalid method")
+    except ExecutorSaturatedError as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         logger.error(f"Error in correction processing: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -239,17 +513,19 @@ async def correct_notes(input: CorrInput):
 async def expand_abbreviations(input: AbbrInput):
     try:
         if input.method == "simple_ollama":  # 简单扩展
-            output = abbr_service.simple_ollama_expansion(input.text, input.llmOptions)
+            output = await llm_executor.run(abbr_service.simple_ollama_expansion, input.text, input.llmOptions)
             return {"input": input.text, "output": output}
         elif input.method == "query_db_llm_rerank":  # 数据库查询+重排序
-            return abbr_service.query_db_llm_rerank(
+            return await llm_executor.run(
+                abbr_service.query_db_llm_rerank,
                 input.text, 
                 input.context, 
                 input.llmOptions,
                 input.embeddingOptions
             )
         elif input.method == "llm_rank_query_db":  # LLM扩展+数据库标准化
-            return abbr_service.llm_rank_query_db(
+            return await llm_executor.run(
+                abbr_service.llm_rank_query_db,
                 input.text, 
                 input.context, 
                 input.llmOptions,
@@ -257,6 +533,8 @@ async def expand_abbreviations(input: AbbrInput):
             )
         else:
             raise HTTPException(status_code=400, detail="Invalid method")
+    except ExecutorSaturatedError as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         logger.error(f"Error in abbreviation expansion: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -266,7 +544,8 @@ async def expand_abbreviations(input: AbbrInput):
 async def generate_medical_content(input: GenInput):
     try:
         if input.method == "generate_medical_note":  # 生成病历
-            return gen_service.generate_medical_note(
+            return await llm_executor.run(
+                gen_service.generate_medical_note,
                 input.patient_info,
                 input.symptoms,
                 input.diagnosis,
@@ -274,18 +553,22 @@ async def generate_medical_content(input: GenInput):
                 input.llmOptions
             )
         elif input.method == "generate_differential_diagnosis":  # 生成鉴别诊断
-            return gen_service.generate_differential_diagnosis(
+            return await llm_executor.run(
+                gen_service.generate_differential_diagnosis,
                 input.symptoms,
                 input.llmOptions
             )
         elif input.method == "generate_treatment_plan":  # 生成治疗计划
-            return gen_service.generate_treatment_plan(
+            return await llm_executor.run(
+                gen_service.generate_treatment_plan,
                 input.diagnosis,
                 input.patient_info,
                 input.llmOptions
             )
         else:
             raise HTTPException(status_code=400, detail="Invalid method")
+    except ExecutorSaturatedError as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         logger.error(f"Error in medical content generation: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
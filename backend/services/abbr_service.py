@@ -1,8 +1,10 @@
 from langchain_community.llms import Ollama
 from langchain.chat_models import ChatOpenAI
 from langchain.prompts import ChatPromptTemplate
-from typing import Dict
+from contextlib import ExitStack, contextmanager
+from typing import Dict, Iterator
 from services.std_service import StdService
+from services.std_registry import std_service_registry
 import os
 import logging
 
@@ -17,12 +19,10 @@ class AbbrService:
     1. 简单 LLM 扩展：快速但不保证准确性
     2. LLM 生成 + 数据库查询：更准确但较慢
     """
-    def __init__(self):
-        self.std_service = None  # 按需初始化标准化服务
-        
-    def _get_std_service(self, embedding_options: dict) -> StdService:
+    @contextmanager
+    def _get_std_service(self, embedding_options: dict) -> Iterator[StdService]:
         """
-        获取或创建标准化服务实例
+        在 with 块内从进程级注册表取用（必要时创建）标准化服务实例
         
         Args:
             embedding_options: 嵌入模型配置选项，包含：
@@ -31,22 +31,26 @@ class AbbrService:
                 - dbName: 数据库名称
                 - collectionName: 集合名称
             
-        Returns:
+        Yields:
             配置好的标准化服务实例
             
         Raises:
             ValueError: 当标准化服务初始化失败时
         """
-        try:
-            return StdService(
-                provider=embedding_options.get("provider", "huggingface"),
-                model=embedding_options.get("model", "BAAI/bge-m3"),
-                db_path=f"db/{embedding_options.get('dbName', 'snomed_bge_m3')}.db",
-                collection_name=embedding_options.get("collectionName", "concepts_only_name")
-            )
-        except Exception as e:
-            logger.error(f"Failed to initialize StdService: {str(e)}")
-            raise ValueError(f"Failed to initialize standardization service: {str(e)}")
+        # 兼容 main.py 传入的 pydantic 模型
+        if hasattr(embedding_options, "model_dump"):
+            embedding_options = embedding_options.model_dump()
+        with ExitStack() as stack:
+            try:
+                std_service = stack.enter_context(std_service_registry.acquire(
+                    provider=embedding_options.get("provider", "huggingface"),
+                    model=embedding_options.get("model", "BAAI/bge-m3"),
+                    collection_name=embedding_options.get("collectionName", "economics_only_name")
+                ))
+            except Exception as e:
+                logger.error(f"Failed to initialize StdService: {str(e)}")
+                raise ValueError(f"Failed to initialize standardization service: {str(e)}")
+            yield std_service
 
     def _get_llm(self, llm_options: dict):
         """
@@ -139,32 +143,31 @@ class AbbrService:
             ValueError: 当标准化服务初始化失败时
         """
         try:
-            # 获取标准化服务实例
-            self.std_service = self._get_std_service(embedding_options)
-            
-            # 使用 LLM 生成扩展
-            llm = self._get_llm(llm_options)
-            expand_prompt = ChatPromptTemplate.from_messages([
-                ("system", "Given the medical abbreviation and its context, provide the most likely expansion based on common medical usage."),
-                ("human", f"Abbreviation: {text}\nContext: {context}")
-            ])
+            # 获取标准化服务实例，整个请求期间持有
+            with self._get_std_service(embedding_options) as std_service:
+                # 使用 LLM 生成扩展
+                llm = self._get_llm(llm_options)
+                expand_prompt = ChatPromptTemplate.from_messages([
+                    ("system", "Given the medical abbreviation and its context, provide the most likely expansion based on common medical usage."),
+                    ("human", f"Abbreviation: {text}\nContext: {context}")
+                ])
             
-            chain = expand_prompt | llm
-            expansion_result = chain.invoke({})
+                chain = expand_prompt | llm
+                expansion_result = chain.invoke({})
             
-            # 从 AIMessage 中提取实际的文本内容
-            expansion_text = expansion_result.content if hasattr(expansion_result, 'content') else str(expansion_result)
+                # 从 AIMessage 中提取实际的文本内容
+                expansion_text = expansion_result.content if hasattr(expansion_result, 'content') else str(expansion_result)
             
-            # 在数据库中查找相似的标准术语
-            std_terms = self.std_service.search_similar_terms(expansion_text)
+                # 在数据库中查找相似的标准术语
+                std_terms = std_service.search_similar_terms(expansion_text)
             
-            return {
-                "input": text,
-                "context": context,
-                "expansion": expansion_text,
-                "standardized_terms": std_terms,
-                "method": "llm_db"
-            }
+                return {
+                    "input": text,
+                    "context": context,
+                    "expansion": expansion_text,
+                    "standardized_terms": std_terms,
+                    "method": "llm_db"
+                }
         except Exception as e:
             logger.error(f"Error in llm_rank_query_db: {str(e)}")
             raise ValueError(f"Failed to process abbreviation expansion: {str(e)}") 
\ No newline at end of file
@@ -0,0 +1,204 @@
+from functools import lru_cache
+from typing import Dict, List, Tuple
+import csv
+import logging
+import re
+import time
+
+from services.glossary_index import DEFAULT_GLOSSARY_PATH, _DASH_SPLIT_RE, _PAREN_RE
+
+# 配置日志
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# 按词切分：字母数字串为一个词，连字符视为空白（"asset-backed" 与 "asset backed" 等价），
+# 其余标点各自成词（"a+/a1" 需要逐个匹配 "+" 与 "/"）
+_TOKEN_RE = re.compile(r"[^\W_]+|[^\w\s\-]")
+
+def _tokenize(text: str) -> List[Tuple[str, int, int]]:
+    return [(m.group(), m.start(), m.end()) for m in _TOKEN_RE.finditer(text)]
+
+def _is_acronym(form: str) -> bool:
+    """全大写的缩写与代码（如 "ALL"、"ITS"、"A+/A1"），与普通词只差大小写，须区分大小写匹配"""
+    return not any(char.islower() for char in form) and any(char.isupper() for char in form)
+
+def _surface_forms(name: str) -> set:
+    """术语在正文中可能出现的写法：全称、" - 缩写" 两侧、括号内容与去掉括号后的部分"""
+    name = name.replace("\\", "")
+    forms = {name, *_DASH_SPLIT_RE.split(name)}
+    parens = _PAREN_RE.findall(name)
+    if parens:
+        forms.update(parens)
+        forms.add(_PAREN_RE.sub(" ", name))
+    return {form.strip() for form in forms if form.strip()}
+
+class _WordAutomaton:
+    """以词为转移单位的 Aho–Corasick 自动机，匹配天然落在词边界上"""
+    def __init__(self):
+        self._goto: Dict[Tuple[int, str], int] = {}
+        self._children: List[List[str]] = [[]]
+        self._fail: List[int] = [0]
+        # 每个节点上结束的术语：(词数, 术语条目列表)
+        self._output: List = [None]
+        # 沿失败链最近的有输出节点
+        self._output_link: List[int] = [0]
+        self.patterns = 0
+
+    @property
+    def states(self) -> int:
+        return len(self._fail)
+
+    def add(self, tokens: List[str], entry: Dict, preferred: bool):
+        node = 0
+        for token in tokens:
+            child = self._goto.get((node, token))
+            if child is None:
+                child = len(self._fail)
+                self._goto[(node, token)] = child
+                self._children[node].append(token)
+                self._children.append([])
+                self._fail.append(0)
+                self._output.append(None)
+                self._output_link.append(0)
+            node = child
+        if self._output[node] is None:
+            self._output[node] = (len(tokens), [])
+            self.patterns += 1
+        entries = self._output[node][1]
+        if entry in entries:
+            return
+        if preferred:
+            entries.insert(0, entry)
+        else:
+            entries.append(entry)
+
+    def build(self):
+        """按广度优先计算失败指针与输出链"""
+        queue = []
+        for token in self._children[0]:
+            queue.append(self._goto[(0, token)])
+        head = 0
+        while head < len(queue):
+            node = queue[head]
+            head += 1
+            for token in self._children[node]:
+                child = self._goto[(node, token)]
+                fail = self._fail[node]
+                while fail and (fail, token) not in self._goto:
+                    fail = self._fail[fail]
+                fail = self._goto.get((fail, token), 0)
+                self._fail[child] = fail
+                self._output_link[child] = fail if self._output[fail] is not None else self._output_link[fail]
+                queue.append(child)
+
+    def scan(self, tokens: List[str]) -> List[Tuple[int, int, List[Dict]]]:
+        """返回每个结束位置上最长的匹配：(起始词下标, 结束词下标, 术语条目列表)"""
+        matches = []
+        node = 0
+        for position, token in enumerate(tokens):
+            while node and (node, token) not in self._goto:
+                node = self._fail[node]
+            node = self._goto.get((node, token), 0)
+            # 当前节点深度最大，其自身输出即为在此结束的最长术语
+            hit = node if self._output[node] is not None else self._output_link[node]
+            if hit:
+                length, entries = self._output[hit]
+                matches.append((position - length + 1, position, entries))
+        return matches
+
+class GlossaryAutomaton:
+    """
+    术语表词级 Aho–Corasick 匹配
+    普通写法大小写不敏感；全大写的缩写与代码（"ALL"、"ITS"、"CAD"）放在单独的区分大小写的自动机中，
+    避免与普通英文词 "all"、"its" 混淆。两个自动机各做一次线性扫描，
+    合并每个结束位置上最长的术语后按最左最长原则去掉重叠
+    """
+    def __init__(self, min_term_length: int = 2):
+        self.min_term_length = min_term_length
+        self._folded = _WordAutomaton()
+        self._exact_case = _WordAutomaton()
+        self.build_ms = 0.0
+
+    @property
+    def patterns(self) -> int:
+        return self._folded.patterns + self._exact_case.patterns
+
+    @classmethod
+    def from_csv(cls, path: str = DEFAULT_GLOSSARY_PATH, min_term_length: int = 2) -> "GlossaryAutomaton":
+        """从包含 economics_name, domain_name 列的 CSV 构建自动机"""
+        start = time.perf_counter()
+        automaton = cls(min_term_length)
+        with open(path, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                name = (row.get("economics_name") or "").strip()
+                if name:
+                    automaton.add(name, row.get("domain_name") or None)
+        automaton.build()
+        automaton.build_ms = (time.perf_counter() - start) * 1000
+        stats = automaton.stats()
+        logger.info(
+            f"Built glossary automaton from {path}: {stats['patterns']} patterns "
+            f"({stats['case_sensitive_patterns']} case-sensitive), {stats['states']} states in {automaton.build_ms:.1f} ms"
+        )
+        return automaton
+
+    def add(self, name: str, domain_name: str = None):
+        # 术语表 CSV 中的括号带有转义反斜杠，返回的标准术语名去掉它们
+        name = name.replace("\\", "")
+        entry = {"economics_name": name, "domain_name": domain_name}
+        for form in _surface_forms(name):
+            if len(form) < self.min_term_length:
+                continue
+            acronym = _is_acronym(form)
+            tokens = [token if acronym else token.lower() for token, _, _ in _tokenize(form)]
+            if not tokens:
+                continue
+            # 写法即术语全称时优先作为标准术语，其次才是缩写或括号等次级写法来源
+            (self._exact_case if acronym else self._folded).add(tokens, entry, form.lower() == name.lower())
+
+    def build(self):
+        self._folded.build()
+        self._exact_case.build()
+
+    def stats(self) -> Dict:
+        return {
+            "patterns": self.patterns,
+            "case_sensitive_patterns": self._exact_case.patterns,
+            "states": self._folded.states + self._exact_case.states,
+            "build_ms": self.build_ms,
+        }
+
+    def find(self, text: str) -> List[Dict]:
+        """
+        扫描文本中的术语
+
+        Returns:
+            不重叠的实体列表，格式同 NERService 的实体：entity_group 为 glossary，
+            score 为 1.0，并带上匹配到的标准术语 economics_name / domain_name
+        """
+        tokens = _tokenize(text)
+        raw = [token for token, _, _ in tokens]
+        matches = self._folded.scan([token.lower() for token in raw]) + self._exact_case.scan(raw)
+
+        # 最左最长：按起点升序、终点降序，跳过与已选实体重叠的匹配
+        entities, last_end = [], -1
+        for first, last, entries in sorted(matches, key=lambda m: (m[0], -m[1])):
+            start, end = tokens[first][1], tokens[last][2]
+            if start < last_end:
+                continue
+            entities.append({
+                "entity_group": "glossary",
+                "word": text[start:end],
+                "start": start,
+                "end": end,
+                "score": 1.0,
+                "economics_name": entries[0]["economics_name"],
+                "domain_name": entries[0]["domain_name"],
+            })
+            last_end = end
+        return entities
+
+@lru_cache(maxsize=None)
+def get_glossary_automaton(path: str = DEFAULT_GLOSSARY_PATH) -> GlossaryAutomaton:
+    """进程内按路径共享的术语表自动机"""
+    return GlossaryAutomaton.from_csv(path)
@@ -0,0 +1,144 @@
+from functools import lru_cache
+from typing import Dict, List, Optional
+import csv
+import logging
+import os
+import re
+import time
+import unicodedata
+
+# 配置日志
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# 默认的经济学术语表
+DEFAULT_GLOSSARY_PATH = os.path.join(os.path.dirname(__file__), "..", "data", "EconomicsGlossary.csv")
+# 由该术语表建库（create_milvus_db.py）的集合，只有这些集合启用术语表快速路径
+DEFAULT_GLOSSARY_COLLECTIONS = "economics_only_name"
+
+_DASH_RE = re.compile(r"[\u2010-\u2015\u2212]")
+_DROP_RE = re.compile(r"[\\.'`\u2018\u2019]")
+_PUNCT_RE = re.compile(r"[,;:!?()\[\]{}\"\u201c\u201d_*]")
+_INNER_HYPHEN_RE = re.compile(r"(?<=\w)-(?=\w)")
+_SLASH_RE = re.compile(r"\s*/\s*")
+_WHITESPACE_RE = re.compile(r"\s+")
+
+# 变体规则：" - 缩写" 后缀、括号内容、评级类的斜杠写法（如 "A+/A1"）；
+# 哈希索引只使用斜杠写法，缩写与括号内容（如 "abs"、"first out"）常对应多个术语，只用于三元组模糊匹配
+_DASH_SPLIT_RE = re.compile(r"\s+-\s*|\s*-\s+")
+_PAREN_RE = re.compile(r"\\?\((.*?)\\?\)")
+_MAX_SLASH_PART_LEN = 4
+
+def normalize_term(text: str) -> str:
+    """
+    术语归一化：Unicode 兼容分解、大小写折叠、统一连字符，
+    去掉句点和引号，其余标点视为空白，并规范斜杠两侧的空白
+    """
+    text = unicodedata.normalize("NFKC", text).casefold()
+    text = _DASH_RE.sub("-", text)
+    text = _DROP_RE.sub("", text)
+    text = _PUNCT_RE.sub(" ", text)
+    text = _INNER_HYPHEN_RE.sub(" ", text)
+    text = _SLASH_RE.sub("/", text)
+    return _WHITESPACE_RE.sub(" ", text).strip()
+
+def _slash_variants(normalized: str) -> List[str]:
+    """评级类斜杠写法的各个部分，如 "a+/a1" 的 "a+" 与 "a1"（normalized 为术语本身的归一化结果）"""
+    if " " in normalized or "/" not in normalized:
+        return []
+    parts = normalized.split("/")
+    if not all(0 < len(part) <= _MAX_SLASH_PART_LEN for part in parts):
+        return []
+    return [part for part in dict.fromkeys(parts) if part != normalized]
+
+def _variants(name: str, normalized: str) -> List[str]:
+    """生成术语的全部次级写法（normalized 为术语本身的归一化结果），供三元组索引使用"""
+    variants = set(_DASH_SPLIT_RE.split(name))
+    parens = _PAREN_RE.findall(name)
+    if parens:
+        variants.update(parens)
+        variants.add(_PAREN_RE.sub(" ", name))
+    variants.discard(name)
+
+    keys = {normalize_term(v) for v in variants}
+    keys.update(_slash_variants(normalized))
+    keys.discard("")
+    keys.discard(normalized)
+    return list(keys)
+
+class GlossaryIndex:
+    """
+    术语表归一化哈希索引
+    查询时先按归一化后的完整术语精确匹配，再按斜杠写法的单个部分匹配，
+    命中时无需向量化和向量检索；对应多个不同术语的斜杠部分不作为快速路径
+    """
+    def __init__(self):
+        self._exact: Dict[str, List[Dict]] = {}
+        self._variants: Dict[str, List[Dict]] = {}
+        self.size = 0
+
+    @classmethod
+    def from_csv(cls, path: str = DEFAULT_GLOSSARY_PATH) -> "GlossaryIndex":
+        """从包含 economics_name, domain_name 列的 CSV 构建索引"""
+        start = time.perf_counter()
+        index = cls()
+        with open(path, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                name = (row.get("economics_name") or "").strip()
+                if name:
+                    index.add(name, row.get("domain_name") or None)
+        logger.info(
+            f"Loaded glossary index from {path}: {index.size} terms, "
+            f"{len(index._exact)} exact keys, {len(index._variants)} variant keys "
+            f"in {(time.perf_counter() - start) * 1000:.1f} ms"
+        )
+        return index
+
+    def add(self, name: str, domain_name: str = None):
+        entry = {"economics_name": name, "domain_name": domain_name}
+        key = normalize_term(name)
+        if not key:
+            return
+        entries = self._exact.setdefault(key, [])
+        if entry in entries:
+            return
+        entries.append(entry)
+        self.size += 1
+        for variant in _slash_variants(key):
+            variant_entries = self._variants.setdefault(variant, [])
+            if entry not in variant_entries:
+                variant_entries.append(entry)
+
+    def lookup(self, text: str, limit: int = 5) -> List[Dict]:
+        """
+        查找与文本归一化后完全一致的术语
+
+        Returns:
+            命中的术语列表（格式同 StdService 检索结果，distance 为 1.0），未命中时为空；
+            完整术语命中的 match_type 为 lexical，斜杠部分命中的为 lexical_variant
+        """
+        key = normalize_term(text)
+        entries, match_type = self._exact.get(key), "lexical"
+        if not entries:
+            entries, match_type = self._variants.get(key) or [], "lexical_variant"
+            if len({normalize_term(entry["economics_name"]) for entry in entries}) > 1:
+                entries = []
+        return [
+            {**entry, "distance": 1.0, "match_type": match_type}
+            for entry in entries[:limit]
+        ]
+
+def glossary_path_for(collection_name: str) -> Optional[str]:
+    """
+    返回集合对应的术语表路径，不是由术语表建库的集合返回 None
+    集合列表取环境变量 GLOSSARY_COLLECTIONS（逗号分隔），术语表路径取 GLOSSARY_PATH
+    """
+    collections = os.getenv("GLOSSARY_COLLECTIONS", DEFAULT_GLOSSARY_COLLECTIONS)
+    if collection_name not in {name.strip() for name in collections.split(",") if name.strip()}:
+        return None
+    return os.getenv("GLOSSARY_PATH", DEFAULT_GLOSSARY_PATH)
+
+@lru_cache(maxsize=None)
+def get_glossary_index(path: str = DEFAULT_GLOSSARY_PATH) -> GlossaryIndex:
+    """进程内按路径共享的术语表索引"""
+    return GlossaryIndex.from_csv(path)
@@ -0,0 +1,137 @@
+from services.ner_service import NERService
+from utils.executors import BoundedExecutor
+from collections import Counter
+from typing import Dict, Optional
+import asyncio
+import logging
+import os
+import time
+
+# 配置日志
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+class NERMicroBatcher:
+    """
+    NER 动态微批调度器
+    在最多 max_wait_ms 毫秒或 max_batch_size 条请求内收集并发的 NER 请求，
+    合并为一次批量前向计算，再把结果分发回各个等待中的调用方
+    """
+    def __init__(self,
+                 ner_service: NERService,
+                 executor: BoundedExecutor,
+                 max_batch_size: int = 16,
+                 max_wait_ms: float = 5.0,
+                 max_inflight_batches: int = 1):
+        """
+        Args:
+            ner_service: 执行推理的 NER 服务
+            executor: 运行批量推理的线程池
+            max_batch_size: 单批最多合并的请求数
+            max_wait_ms: 凑批的最长等待时间（毫秒）
+            max_inflight_batches: 同时执行的批次数上限
+        """
+        self.ner_service = ner_service
+        self.executor = executor
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.max_inflight_batches = max_inflight_batches
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._inflight: Optional[asyncio.Semaphore] = None
+
+        # 指标
+        self._batch_sizes = Counter()
+        self._total_items = 0
+        self._total_wait = 0.0
+        self._max_wait_observed = 0.0
+
+    def _ensure_started(self):
+        # 队列和任务需绑定到当前运行的事件循环，因此延迟创建
+        if self._worker is None or self._worker.done():
+            self._queue = asyncio.Queue()
+            self._inflight = asyncio.Semaphore(self.max_inflight_batches)
+            self._worker = asyncio.get_running_loop().create_task(self._run())
+
+    async def process(self, text, options, term_types) -> Dict:
+        """
+        提交一条 NER 请求并等待结果，返回格式同 NERService.process
+        """
+        self._ensure_started()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((text, options, term_types, future, time.perf_counter()))
+        return await future
+
+    async def _run(self):
+        while True:
+            batch = [await self._queue.get()]
+            deadline = time.perf_counter() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - time.perf_counter()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            # 跳过调用方已放弃等待的请求
+            batch = [item for item in batch if not item[3].done()]
+            if not batch:
+                continue
+
+            await self._inflight.acquire()
+            asyncio.get_running_loop().create_task(self._dispatch(batch))
+
+    async def _dispatch(self, batch):
+        try:
+            now = time.perf_counter()
+            waits = [now - item[4] for item in batch]
+            self._batch_sizes[len(batch)] += 1
+            self._total_items += len(batch)
+            self._total_wait += sum(waits)
+            self._max_wait_observed = max(self._max_wait_observed, max(waits))
+
+            items = [(text, options, term_types) for text, options, term_types, _, _ in batch]
+            try:
+                results = await self.executor.run(self.ner_service.process_items, items, len(items))
+            except Exception as e:
+                for *_, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                return
+
+            for (*_, future, _), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+        finally:
+            self._inflight.release()
+
+    def stats(self) -> Dict:
+        """返回批大小分布与排队等待时间指标"""
+        total_batches = sum(self._batch_sizes.values())
+        return {
+            "batches": total_batches,
+            "items": self._total_items,
+            "avg_batch_size": self._total_items / total_batches if total_batches else 0.0,
+            "batch_size_histogram": dict(sorted(self._batch_sizes.items())),
+            "avg_queue_wait_ms": self._total_wait / self._total_items * 1000 if self._total_items else 0.0,
+            "max_queue_wait_ms": self._max_wait_observed * 1000,
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0
+        }
+
+    def shutdown(self):
+        """停止调度任务"""
+        if self._worker is not None:
+            self._worker.cancel()
+            self._worker = None
+
+def create_ner_batcher(ner_service: NERService, executor: BoundedExecutor) -> NERMicroBatcher:
+    """按环境变量 NER_BATCH_MAX_SIZE / NER_BATCH_MAX_WAIT_MS 创建微批调度器"""
+    return NERMicroBatcher(
+        ner_service,
+        executor,
+        max_batch_size=int(os.getenv("NER_BATCH_MAX_SIZE", "16")),
+        max_wait_ms=float(os.getenv("NER_BATCH_MAX_WAIT_MS", "5")),
+        max_inflight_batches=int(os.getenv("NER_BATCH_MAX_INFLIGHT", "1"))
+    )
@@ -1,23 +1,172 @@
 from transformers import pipeline
+from services.dictionary_ner import get_glossary_automaton
+from bisect import bisect_left, bisect_right
 import torch
 import logging
+import os
+import re
 
 # 配置日志
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# 句子边界：句末标点后的空白或换行
+_SENTENCE_BOUNDARY_RE = re.compile(r"(?<=[.!?;。！？；])\s+|\n\s*")
+
+NER_MODEL_NAME = "AhmedTaha012/finance-ner-v0.0.9-finetuned-ner"
+# tools/export_ner_onnx.py 的默认输出目录
+DEFAULT_ONNX_NER_PATH = "models/finance-ner-onnx-int8"
+
+def create_ner_pipeline(backend="pytorch", onnx_path=DEFAULT_ONNX_NER_PATH, num_threads=None):
+    """
+    创建 token-classification pipeline
+
+    Args:
+        backend: pytorch（transformers 原始模型）或 onnx（ONNX Runtime，CPU）
+        onnx_path: ONNX 模型目录，优先加载其中的 int8 量化模型 model_quantized.onnx
+        num_threads: ONNX Runtime 算子内线程数，为 None 时由运行时决定
+
+    两种后端使用同一个 pipeline 与 aggregation_strategy，输出格式一致
+    """
+    if backend == "pytorch":
+        return pipeline("token-classification",
+                        #    model="Clinical-AI-Apollo/Medical-NER",
+                        model=NER_MODEL_NAME,
+                        aggregation_strategy='simple',
+                        device=0 if torch.cuda.is_available() else -1)
+    elif backend == "onnx":
+        from optimum.onnxruntime import ORTModelForTokenClassification
+        from transformers import AutoTokenizer
+        import onnxruntime
+
+        session_options = onnxruntime.SessionOptions()
+        if num_threads:
+            session_options.intra_op_num_threads = num_threads
+        file_name = "model_quantized.onnx" if os.path.exists(os.path.join(onnx_path, "model_quantized.onnx")) else "model.onnx"
+        model = ORTModelForTokenClassification.from_pretrained(
+            onnx_path,
+            file_name=file_name,
+            session_options=session_options,
+            provider="CPUExecutionProvider"
+        )
+        logger.info(f"Loaded ONNX NER model {os.path.join(onnx_path, file_name)}")
+        return pipeline("token-classification",
+                        model=model,
+                        tokenizer=AutoTokenizer.from_pretrained(onnx_path),
+                        aggregation_strategy='simple')
+    raise ValueError(f"Unsupported NER backend: {backend}")
+
 class NERService:
     """
     医学术语命名实体识别服务
     使用 Clinical-AI-Apollo/Medical-NER 模型进行医疗文本的实体识别
     """
-    def __init__(self):
-        # 初始化 NER 模型，使用 GPU 如果可用
-        self.pipe = pipeline("token-classification", 
-                        #    model="Clinical-AI-Apollo/Medical-NER", 
-                           model="AhmedTaha012/finance-ner-v0.0.9-finetuned-ner", 
-                           aggregation_strategy='simple',
-                           device=0 if torch.cuda.is_available() else -1)
+    def __init__(self, window_tokens=None, window_overlap_tokens=None, backend=None, onnx_path=None):
+        """
+        Args:
+            window_tokens: 长文本切窗时每个窗口的最大 token 数，默认取模型最大长度
+                （环境变量 NER_WINDOW_TOKENS）
+            window_overlap_tokens: 相邻窗口的重叠 token 数（环境变量 NER_WINDOW_OVERLAP，默认 32）
+            backend: 推理后端 pytorch / onnx（环境变量 NER_BACKEND，默认 pytorch）
+            onnx_path: ONNX 模型目录（环境变量 NER_ONNX_PATH），线程数取 NER_ONNX_THREADS
+        """
+        # 初始化 NER 模型：PyTorch 时使用 GPU 如果可用，CPU 节点可切换到 int8 量化的 ONNX 模型
+        self.backend = (backend or os.getenv("NER_BACKEND", "pytorch")).lower()
+        self.pipe = create_ner_pipeline(
+            self.backend,
+            onnx_path or os.getenv("NER_ONNX_PATH", DEFAULT_ONNX_NER_PATH),
+            int(os.getenv("NER_ONNX_THREADS", "0")) or None
+        )
+        # 术语表词典匹配引擎，options 中 dictionaryNer 单独使用、combineDictionaryNer 与模型结果合并
+        self.glossary_automaton = get_glossary_automaton()
+
+        # 超过模型最大长度的文本按句子切成带重叠的窗口分别推理，而不是被截断
+        max_length = min(self.pipe.tokenizer.model_max_length, 512) - 2
+        self.window_tokens = window_tokens or int(os.getenv("NER_WINDOW_TOKENS", max_length))
+        self.window_overlap_tokens = window_overlap_tokens or int(os.getenv("NER_WINDOW_OVERLAP", 32))
+        if not 0 <= self.window_overlap_tokens < self.window_tokens:
+            raise ValueError("NER window overlap must be smaller than the window size")
+
+    @staticmethod
+    def uses_model(options):
+        """本次请求是否需要运行 transformer 模型（只用词典引擎时不需要）"""
+        return not options.get('dictionaryNer', False)
+
+    def _run_model(self, texts, items_options, batch_size=None):
+        """
+        只对需要模型的文本做批量前向计算，其余位置返回空结果
+        长文本先切成窗口，所有文本的窗口合成一次批量推理，
+        再把实体偏移映射回原文并在窗口接缝处去重
+        """
+        positions = [idx for idx, options in enumerate(items_options) if self.uses_model(options)]
+        results = [[] for _ in texts]
+        if not positions:
+            return results
+
+        windows = {idx: self._split_windows(texts[idx]) for idx in positions}
+        flat = [(idx, window) for idx in positions for window in windows[idx]]
+        kwargs = {"batch_size": batch_size} if batch_size else {}
+        window_results = self.pipe([texts[idx][window[0]:window[1]] for idx, window in flat], **kwargs)
+
+        for (idx, (start, _, core_start, core_end)), window_result in zip(flat, window_results):
+            if isinstance(window_result, dict):
+                window_result = window_result.get('entities', [])
+            for entity in window_result:
+                entity = {**entity, 'start': entity['start'] + start, 'end': entity['end'] + start}
+                # 每个实体只归属于起点落在其核心区间的窗口，重叠区内的重复与截断实体由此去掉
+                if core_start <= entity['start'] < core_end:
+                    results[idx].append(entity)
+        for idx in positions:
+            results[idx].sort(key=lambda entity: (entity['start'], entity['end']))
+        return results
+
+    def _split_windows(self, text):
+        """
+        按句子边界把文本切成不超过 window_tokens 的窗口，相邻窗口重叠约 window_overlap_tokens
+
+        Returns:
+            (start, end, core_start, core_end) 字符区间列表；核心区间互不相交且覆盖全文，
+            边界取相邻窗口重叠区的中点
+        """
+        # token 数不会超过字符数，短文本无需分词
+        if len(text) <= self.window_tokens:
+            return [(0, len(text), 0, len(text))]
+        offsets = self.pipe.tokenizer(
+            text, add_special_tokens=False, return_offsets_mapping=True, verbose=False
+        )["offset_mapping"]
+        n_tokens = len(offsets)
+        if n_tokens <= self.window_tokens:
+            return [(0, len(text), 0, len(text))]
+
+        # 句子起点对应的 token 下标
+        token_starts = [offset[0] for offset in offsets]
+        boundaries = sorted({bisect_left(token_starts, match.end()) for match in _SENTENCE_BOUNDARY_RE.finditer(text)})
+
+        spans = []
+        start = 0
+        while True:
+            limit = start + self.window_tokens
+            if limit >= n_tokens:
+                spans.append((start, n_tokens))
+                break
+            # 窗口在预算内最后一个句子边界处结束，单句过长时在预算处硬切
+            pos = bisect_right(boundaries, limit) - 1
+            end = boundaries[pos] if pos >= 0 and boundaries[pos] > start else limit
+            spans.append((start, end))
+            # 下一个窗口从重叠范围内最早的句子边界开始，没有时按 token 回退
+            pos = bisect_left(boundaries, end - self.window_overlap_tokens)
+            if pos < len(boundaries) and start < boundaries[pos] < end:
+                start = boundaries[pos]
+            else:
+                start = max(end - self.window_overlap_tokens, start + 1)
+
+        char_spans = [(offsets[s][0], offsets[e - 1][1]) for s, e in spans]
+        windows = []
+        for k, (char_start, char_end) in enumerate(char_spans):
+            core_start = 0 if k == 0 else (char_start + char_spans[k - 1][1]) // 2
+            core_end = len(text) if k == len(char_spans) - 1 else (char_spans[k + 1][0] + char_end) // 2
+            windows.append((char_start, char_end, core_start, core_end))
+        return windows
   
     def process(self, text, options, term_types):
         """
@@ -31,9 +180,58 @@ class NERService:
         Returns:
             包含识别出的实体和原始文本的字典
         """
-        # 使用模型进行实体识别
-        result = self.pipe(text)
+        # 使用模型进行实体识别（长文本自动切窗）
+        result = self._run_model([text], [options])[0]
+        return self._postprocess(text, result, options, term_types)
+
+    def process_batch(self, texts, options, term_types, batch_size=32):
+        """
+        批量处理多段文本，按模型批次送入 pipeline 以提高吞吐
+        
+        Args:
+            texts: 输入文本列表
+            options: 处理选项，同 process
+            term_types: 需要识别的术语类型，同 process
+            batch_size: 每次前向计算的文本数
+            
+        Returns:
+            与 texts 一一对应的结果列表，每项格式同 process
+        """
+        if not texts:
+            return []
+        results = self._run_model(list(texts), [options] * len(texts), batch_size)
+        return [
+            self._postprocess(text, result, options, term_types)
+            for text, result in zip(texts, results)
+        ]
+
+    def process_items(self, items, batch_size=32):
+        """
+        批量处理选项各不相同的多个请求，共享一次批量前向计算
         
+        Args:
+            items: (text, options, term_types) 元组列表
+            batch_size: 每次前向计算的文本数
+            
+        Returns:
+            与 items 一一对应的结果列表，每项格式同 process
+        """
+        if not items:
+            return []
+        results = self._run_model(
+            [text for text, _, _ in items],
+            [options for _, options, _ in items],
+            batch_size
+        )
+        return [
+            self._postprocess(text, result, options, term_types)
+            for (text, options, term_types), result in zip(items, results)
+        ]
+
+    def _postprocess(self, text, result, options, term_types):
+        """
+        对 pipeline 的原始输出做合并、去重叠和过滤
+        """
         # 确保结果是实体列表
         if isinstance(result, dict):
             result = result.get('entities', [])
@@ -42,6 +240,10 @@ class NERService:
         # 合并相关实体（如生物结构和症状）
 
         combined_result = self._combine_entities(result, text, options)
+
+        # 词典引擎的结果与模型结果一起参与去重叠
+        if options.get('dictionaryNer', False) or options.get('combineDictionaryNer', False):
+            combined_result.extend(self.glossary_automaton.find(text))
         
         # 移除重叠实体
         non_overlapping_result = self._remove_overlapping_entities(combined_result)
@@ -64,7 +266,7 @@ class NERService:
             entity = result[i]
             entity['score'] = float(entity['score'])
 
-            if options['combineEcoStructure'] and entity['entity_group'] in ['revenue', 'loss','expense','profit']:
+            if options.get('combineEcoStructure', False) and entity['entity_group'] in ['revenue', 'loss','expense','profit']:
                 # 检查并合并生物结构
                 combined_entity = self._try_combine_with_bio_structure(result, i, text)
                 if combined_entity:
@@ -147,6 +349,9 @@ class NERService:
         for entity in entities:
             if term_types.get('allEconomicsTerms', False):
                 filtered_result.append(entity)
+            elif entity['entity_group'] == 'glossary' and term_types.get('glossary', True):
+                # 词典引擎只产出术语表中的术语，请求了该引擎即默认保留
+                filtered_result.append(entity)
             elif (term_types.get('revenue', False) and entity['entity_group'] in ['revenue', 'loss','expense','profit']) or \
                  (term_types.get('lost', False) and entity['entity_group'] == 'lost') or \
                  (term_types.get('profit', False) and entity['entity_group'] == 'profit'):
@@ -0,0 +1,93 @@
+from typing import Dict, Optional
+
+class InvalidSearchParamsError(ValueError):
+    """检索参数与集合的索引类型不匹配或取值非法"""
+
+# 服务端延迟预设：交互式调用用 fast，批量任务用 accurate
+# 每个预设同时给出各类索引的参数，按集合实际索引类型取用
+SEARCH_PRESETS: Dict[str, Dict] = {
+    "fast": {"nprobe": 8, "ef": 32, "rerank_factor": 1},
+    "balanced": {"nprobe": 32, "ef": 64, "rerank_factor": 4},
+    "accurate": {"nprobe": 128, "ef": 256, "rerank_factor": 10},
+}
+
+# 各索引类型允许的检索参数
+_IVF_PARAMS = {"nprobe", "radius"}
+ALLOWED_PARAMS: Dict[str, set] = {
+    "FLAT": {"radius"},
+    "AUTOINDEX": {"radius"},
+    "IVF_FLAT": _IVF_PARAMS,
+    "IVF_SQ8": _IVF_PARAMS,
+    "IVF_PQ": _IVF_PARAMS,
+    "HNSW": {"ef", "radius"},
+    "NUMPY_FLOAT32": {"radius"},
+    "NUMPY_FLOAT16": {"rerank_factor", "radius"},
+    "NUMPY_INT8": {"rerank_factor", "radius"},
+    "NUMPY_BINARY": {"rerank_factor", "radius"},
+}
+
+def resolve_search_params(index_type: str,
+                          limit: int,
+                          preset: Optional[str] = None,
+                          overrides: Optional[Dict] = None,
+                          defaults: Optional[Dict] = None,
+                          rerank: bool = False) -> Dict:
+    """
+    按索引类型合并并校验检索参数，优先级：overrides > preset > defaults
+
+    Args:
+        index_type: 集合的索引类型（VectorStore.index_type 的返回值）
+        limit: 返回结果数，HNSW 的 ef 不能小于它
+        preset: 延迟预设名称 fast / balanced / accurate
+        overrides: 调用方显式指定的参数
+        defaults: 服务实例的默认参数
+        rerank: 集合是否可按全精度向量重排（VectorStore.supports_rerank），为 True 时允许 rerank_factor
+
+    Returns:
+        可直接传给 VectorStore.search 的扁平参数字典
+
+    Raises:
+        InvalidSearchParamsError: 参数不适用于该索引类型或取值非法
+    """
+    allowed = ALLOWED_PARAMS.get(index_type)
+    if allowed is None:
+        # 未知索引类型不做校验，原样透传显式参数
+        return {**(defaults or {}), **(overrides or {})}
+    if rerank:
+        allowed = allowed | {"rerank_factor"}
+
+    params = {}
+    for source in (defaults, overrides):
+        for key in (source or {}):
+            if key not in allowed:
+                raise InvalidSearchParamsError(
+                    f"Search parameter '{key}' is not supported by index type {index_type}; "
+                    f"allowed: {sorted(allowed)}"
+                )
+    params.update(defaults or {})
+
+    if preset is not None:
+        if preset not in SEARCH_PRESETS:
+            raise InvalidSearchParamsError(f"Unknown search preset: {preset}")
+        params.update({k: v for k, v in SEARCH_PRESETS[preset].items() if k in allowed})
+
+    params.update(overrides or {})
+
+    if "ef" in params:
+        if overrides and "ef" in overrides and overrides["ef"] < limit:
+            raise InvalidSearchParamsError(f"ef ({overrides['ef']}) must be >= topK ({limit})")
+        params["ef"] = max(params["ef"], limit)
+    if "nprobe" in params and params["nprobe"] < 1:
+        raise InvalidSearchParamsError("nprobe must be >= 1")
+    if "rerank_factor" in params and params["rerank_factor"] < 0:
+        raise InvalidSearchParamsError("rerank_factor must be >= 0")
+    if "radius" in params and not -1.0 <= params["radius"] <= 1.0:
+        raise InvalidSearchParamsError("radius must be within [-1, 1] for cosine similarity")
+    return params
+
+def domain_filter(domain_name: Optional[str]) -> Optional[str]:
+    """构造按 domain_name 过滤的标量表达式"""
+    if not domain_name:
+        return None
+    escaped = domain_name.replace("\\", "\\\\").replace('"', '\\"')
+    return f'domain_name == "{escaped}"'
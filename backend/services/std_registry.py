@@ -0,0 +1,190 @@
+from collections import OrderedDict
+from contextlib import contextmanager
+from services.std_service import StdService
+from services.glossary_index import glossary_path_for
+from typing import Dict, Iterator, Tuple
+import os
+import threading
+import logging
+
+# 配置日志
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+class StdServiceRegistry:
+    """
+    进程级标准化服务注册表
+    按 (provider, model, collection_name) 缓存已预热的 StdService 实例，
+    避免每个请求重新加载嵌入模型、重新连接 Milvus 并反复 load/release 集合。
+    请求通过 acquire 持有实例并计数；被淘汰的实例在最后一个持有它的请求结束后关闭
+    """
+    def __init__(self, max_size: int = 4):
+        """
+        初始化注册表
+
+        Args:
+            max_size: 同时保留的服务实例上限，超出后按最近最少使用淘汰
+        """
+        if max_size < 1:
+            raise ValueError("max_size must be at least 1")
+        self.max_size = max_size
+        self._services: "OrderedDict[Tuple[str, str, str], StdService]" = OrderedDict()
+        self._lock = threading.Lock()
+        # 每个 key 一把创建锁：同一配置只加载一次，不同配置的加载互不阻塞
+        self._creating: Dict[Tuple[str, str, str], threading.Lock] = {}
+        # 正在处理中的请求对每个实例的引用计数，以及已淘汰但仍被引用、等待关闭的实例
+        self._in_use: Dict[int, int] = {}
+        self._retired: Dict[int, Tuple[Tuple[str, str, str], StdService]] = {}
+
+    @staticmethod
+    def _make_key(provider: str, model: str, collection_name: str) -> Tuple[str, str, str]:
+        return (provider.lower(), model, collection_name)
+
+    def get(self,
+            provider: str = "huggingface",
+            model: str = "BAAI/bge-m3",
+            collection_name: str = "economics_only_name") -> StdService:
+        """
+        获取（必要时创建）对应配置的标准化服务实例
+        不增加引用计数，返回的实例被淘汰后可能随时关闭，只用于预热；
+        处理请求时使用 acquire
+
+        Args:
+            provider: 嵌入模型提供商
+            model: 嵌入模型名称
+            collection_name: 集合名称
+
+        Returns:
+            已预热的标准化服务实例
+        """
+        return self._get(self._make_key(provider, model, collection_name), hold=False)
+
+    @contextmanager
+    def acquire(self,
+                provider: str = "huggingface",
+                model: str = "BAAI/bge-m3",
+                collection_name: str = "economics_only_name") -> Iterator[StdService]:
+        """
+        在 with 块内持有标准化服务实例，参数同 get
+        实例在块内被淘汰时，等块结束（最后一个持有者释放）后再关闭
+        """
+        key = self._make_key(provider, model, collection_name)
+        service = self._get(key, hold=True)
+        try:
+            yield service
+        finally:
+            with self._lock:
+                # shutdown 会清空计数并直接关闭实例，此后结束的请求不再计数
+                remaining = self._in_use.get(id(service), 0) - 1
+                if remaining > 0:
+                    self._in_use[id(service)] = remaining
+                    retired = None
+                else:
+                    self._in_use.pop(id(service), None)
+                    retired = self._retired.pop(id(service), None)
+            if retired is not None:
+                self._close(*retired)
+
+    def _get(self, key: Tuple[str, str, str], hold: bool) -> StdService:
+        with self._lock:
+            service = self._lookup(key, hold)
+            if service is not None:
+                return service
+            key_lock = self._creating.setdefault(key, threading.Lock())
+
+        with key_lock:
+            try:
+                # 等锁期间可能已由其他线程创建完成
+                with self._lock:
+                    service = self._lookup(key, hold)
+                    if service is not None:
+                        return service
+
+                logger.info(f"Creating StdService for {key}")
+                provider, model, collection_name = key
+                service = StdService(
+                    provider=provider,
+                    model=model,
+                    collection_name=collection_name,
+                    glossary_path=glossary_path_for(collection_name)
+                )
+
+                evicted = []
+                with self._lock:
+                    self._services[key] = service
+                    if hold:
+                        self._in_use[id(service)] = 1
+                    while len(self._services) > self.max_size:
+                        evicted_key, evicted_service = self._services.popitem(last=False)
+                        logger.info(f"Evicted StdService for {evicted_key}")
+                        if id(evicted_service) in self._in_use:
+                            # 仍有请求在使用，由最后一个持有者关闭
+                            self._retired[id(evicted_service)] = (evicted_key, evicted_service)
+                        else:
+                            evicted.append((evicted_key, evicted_service))
+            finally:
+                # 创建失败时也要移除创建锁，下次请求重新尝试
+                with self._lock:
+                    self._creating.pop(key, None)
+        for evicted_key, evicted_service in evicted:
+            self._close(evicted_key, evicted_service)
+        return service
+
+    def _lookup(self, key: Tuple[str, str, str], hold: bool):
+        """在持有 self._lock 时查找缓存实例，命中时更新 LRU 顺序并按需计数"""
+        service = self._services.get(key)
+        if service is not None:
+            self._services.move_to_end(key)
+            if hold:
+                self._in_use[id(service)] = self._in_use.get(id(service), 0) + 1
+        return service
+
+    def _close(self, key: Tuple[str, str, str], service: StdService):
+        """关闭被淘汰的实例；其他缓存实例仍在使用同一集合时不释放集合"""
+        with self._lock:
+            shared = any(
+                other_key[2] == key[2]
+                for other_key in list(self._services) + [retired_key for retired_key, _ in self._retired.values()]
+            )
+        try:
+            service.close(release_collection=not shared)
+            logger.info(f"Closed StdService for {key}")
+        except Exception as e:
+            logger.error(f"Error closing StdService for {key}: {str(e)}")
+
+    def stats(self) -> Dict:
+        """返回当前注册表状态及各实例的查询向量缓存与三元组索引统计"""
+        with self._lock:
+            services = list(self._services.items())
+        return {
+            "max_size": self.max_size,
+            "size": len(services),
+            "services": [
+                {
+                    "key": list(key),
+                    "embedding_cache": service.embedding_func.stats()
+                    if hasattr(service.embedding_func, "stats") else None,
+                    "trigram_index": service.trigram_index.stats() if service.trigram_index else None
+                }
+                for key, service in services
+            ]
+        }
+
+    def shutdown(self):
+        """关闭所有缓存的服务实例，释放集合和连接"""
+        with self._lock:
+            services = list(self._services.items()) + list(self._retired.values())
+            self._services.clear()
+            self._retired.clear()
+            self._in_use.clear()
+        for key, service in services:
+            try:
+                service.close()
+                logger.info(f"Closed StdService for {key}")
+            except Exception as e:
+                logger.error(f"Error closing StdService for {key}: {str(e)}")
+
+# 进程级单例，供 main.py 与 AbbrService 共用
+std_service_registry = StdServiceRegistry(
+    max_size=int(os.getenv("STD_SERVICE_POOL_SIZE", "4"))
+)
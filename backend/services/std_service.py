@@ -1,9 +1,15 @@
-from pymilvus import MilvusClient
 from dotenv import load_dotenv
 from utils.embedding_factory import EmbeddingFactory
 from utils.embedding_config import EmbeddingProvider, EmbeddingConfig
+from utils.vector_store import DEFAULT_DB_DIR, VectorStore, create_vector_store
+from utils.sparse_encoder import BM25SparseEncoder
+from utils.dim_reduction import DimensionReducer
+from services.glossary_index import get_glossary_index
+from services.trigram_index import get_trigram_index
+from services.search_params import InvalidSearchParamsError, resolve_search_params, domain_filter
+from utils.executors import sparse_search_executor
 import os
-from typing import List, Dict
+from typing import Callable, List, Dict, Optional
 import logging
 
 # Configure logging
@@ -21,20 +27,39 @@ class StdService:
                  provider="huggingface",
                  model="BAAI/bge-m3",
                 #  db_path="db/snomed_bge_m3.db",
-                 collection_name="economics_only_name"):
+                 collection_name="economics_only_name",
+                 glossary_path: Optional[str] = None,
+                 vector_store: Optional[VectorStore] = None,
+                 search_params: Optional[Dict] = None,
+                 sparse_encoder_path: Optional[str] = None,
+                 fuzzy_direct_threshold: float = 0.75,
+                 fuzzy_seed_threshold: float = 0.4,
+                 projection_path: Optional[str] = None):
         """
         初始化标准化服务
         
         Args:
-            provider: 嵌入模型提供商 (openai/bedrock/huggingface)
+            provider: 嵌入模型提供商 (openai/bedrock/huggingface/huggingface-onnx)
             model: 使用的模型名称
             collection_name: 集合名称
+            glossary_path: 术语表 CSV 路径，用于精确匹配与三元组快速路径，只应对由该术语表建库的集合开启
+                （见 glossary_index.glossary_path_for）；为 None 时只走向量检索
+            vector_store: 向量存储后端，为 None 时按环境变量 VECTOR_STORE_BACKEND 创建
+            search_params: 默认检索参数，如 {"nprobe": 32} 或压缩向量集合的 {"rerank_factor": 4}，
+                会按集合的索引类型校验
+            sparse_encoder_path: 建库时保存的 BM25 编码器路径，默认
+                $SPARSE_ENCODER_DIR（未设置时为 backend/db/sparse）/<collection_name>_bm25.json；集合带稀疏向量且编码器存在时才支持混合检索
+            fuzzy_direct_threshold: 三元组相似度不低于该值时直接返回模糊匹配结果，跳过向量检索
+            fuzzy_seed_threshold: 三元组相似度不低于该值的候选与向量检索结果融合
+            projection_path: 建库时保存的 PCA 投影文件，默认 $PROJECTION_DIR（未设置时为 backend/db/projections）/<collection_name>_pca.npz；
+                集合元数据中记录了降维方式时，查询向量按同样方式降维
         """
         # 根据 provider 字符串匹配正确的枚举值
         provider_mapping = {
             'openai': EmbeddingProvider.OPENAI,
             'bedrock': EmbeddingProvider.BEDROCK,
-            'huggingface': EmbeddingProvider.HUGGINGFACE
+            'huggingface': EmbeddingProvider.HUGGINGFACE,
+            'huggingface-onnx': EmbeddingProvider.HUGGINGFACE_ONNX
         }
         
         # 创建 embedding 函数
@@ -48,59 +73,283 @@ class StdService:
         )
         self.embedding_func = EmbeddingFactory.create_embedding_function(config)
         
-        # 连接 Milvus
-        self.client = MilvusClient("tcp://localhost:19530")
+        # 连接向量存储（默认 Milvus 服务端）
+        self.vector_store = vector_store or create_vector_store()
         self.collection_name = collection_name
-        self.client.load_collection(self.collection_name)
+        self.vector_store.load(self.collection_name)
+        self.index_type = self.vector_store.index_type(self.collection_name)
+        self.supports_rerank = self.vector_store.supports_rerank(self.collection_name)
+        self.search_params = resolve_search_params(self.index_type, limit=1, defaults=search_params, rerank=self.supports_rerank)
 
-    def search_similar_terms(self, query: str, limit: int = 5) -> List[Dict]:
+        # 降维集合：查询向量使用与建库一致的截断或 PCA 投影
+        self.reducer = None
+        projection = self.vector_store.get_metadata(self.collection_name).get("projection")
+        if projection:
+            projection_path = projection_path or os.path.join(
+                os.getenv("PROJECTION_DIR", os.path.join(DEFAULT_DB_DIR, "projections")), f"{collection_name}_pca.npz"
+            )
+            self.reducer = DimensionReducer.from_metadata(projection, projection_path)
+            logger.info(f"Collection {collection_name} uses {projection['method']} projection to {projection['dim']} dims")
+
+        # 术语表归一化哈希索引，精确命中时跳过向量检索
+        self.glossary_index = get_glossary_index(glossary_path) if glossary_path else None
+        # 术语名三元组索引，用于拼写错误实体的候选生成
+        self.trigram_index = get_trigram_index(glossary_path) if glossary_path else None
+        self.fuzzy_direct_threshold = fuzzy_direct_threshold
+        self.fuzzy_seed_threshold = fuzzy_seed_threshold
+
+        # 稀疏（BM25）检索，混合模式下与稠密检索并发执行
+        self.sparse_encoder = None
+        sparse_encoder_path = sparse_encoder_path or os.path.join(
+            os.getenv("SPARSE_ENCODER_DIR", os.path.join(DEFAULT_DB_DIR, "sparse")), f"{collection_name}_bm25.json"
+        )
+        if self.vector_store.has_sparse(self.collection_name) and os.path.exists(sparse_encoder_path):
+            self.sparse_encoder = BM25SparseEncoder.load(sparse_encoder_path)
+            logger.info(f"Hybrid search enabled for {collection_name} ({len(self.sparse_encoder.vocabulary)} terms)")
+
+    # 搜索结果中需要返回的标量字段
+    OUTPUT_FIELDS = ["economics_name", "domain_name"]
+
+    # 混合检索时每路召回 limit * HYBRID_CANDIDATE_FACTOR 个候选参与融合
+    HYBRID_CANDIDATE_FACTOR = 2
+    # 倒数排名融合常数
+    RRF_K = 60
+
+    def search_similar_terms(self,
+                             query: str,
+                             limit: int = 5,
+                             search_preset: Optional[str] = None,
+                             search_params: Optional[Dict] = None,
+                             domain_name: Optional[str] = None,
+                             hybrid: bool = False,
+                             fuzzy: bool = True) -> List[Dict]:
         """
-        搜索与查询文本相似的医学术语
+        搜索与查询文本相似的经济学术语
         
         Args:
             query: 查询文本
             limit: 返回结果的最大数量
+            search_preset: 延迟预设 fast / balanced / accurate
+            search_params: 显式指定的索引检索参数（nprobe / ef / radius / rerank_factor），覆盖预设
+            domain_name: 只返回该领域的术语
+            hybrid: 同时做稠密与 BM25 稀疏检索并按倒数排名融合
+            fuzzy: 使用三元组索引处理拼写错误：高相似度时直接返回，否则把候选与检索结果融合
             
         Returns:
             包含相似术语信息的列表，每个术语包含：
             - economics_name: 经济学术语名称
             - domain_name: 领域名称
-            - distance: 相似度距离
+            - distance: 相似度距离；混合检索时为融合得分
+            - match_type: lexical（术语表精确命中）、lexical_variant（斜杠写法的单个部分命中）、
+              fuzzy（三元组高相似度直接命中）、
+              vector（向量检索）、hybrid（融合检索）或 fuzzy_candidate（融合进检索结果的三元组候选）
+            
+        Raises:
+            InvalidSearchParamsError: 检索参数不适用于集合的索引类型时
+        """
+        params = self._resolve_params(limit, search_preset, search_params, hybrid)
+
+        lexical_hits = self._lexical_lookup(query, limit, domain_name)
+        if lexical_hits:
+            return lexical_hits
+
+        fuzzy_hits = self._fuzzy_lookup(query, limit, domain_name) if fuzzy else []
+        if fuzzy_hits and fuzzy_hits[0]["distance"] >= self.fuzzy_direct_threshold:
+            return fuzzy_hits
+
+        if hybrid:
+            embed = lambda texts: [self.embedding_func.embed_query(texts[0])]
+            hits = self._hybrid_search([query], embed, limit, params, domain_name)[0]
+        else:
+            # 获取查询的向量表示
+            query_embedding = self.embedding_func.embed_query(query)
+            hits = self._vector_search([query_embedding], limit, params, domain_name)[0]
+        return self._seed_with_fuzzy(hits, fuzzy_hits, limit)
+
+    def search_similar_terms_batch(self,
+                                   queries: List[str],
+                                   limit: int = 5,
+                                   search_preset: Optional[str] = None,
+                                   search_params: Optional[Dict] = None,
+                                   domain_name: Optional[str] = None,
+                                   hybrid: bool = False,
+                                   fuzzy: bool = True) -> List[List[Dict]]:
         """
-        # 获取查询的向量表示
-        query_embedding = self.embedding_func.embed_query(query)
+        批量搜索多个查询文本的相似术语
+        对查询去重并先查术语表精确匹配，其余查询只做一次 embed_documents
+        前向计算和一次多向量检索，再把结果按原顺序映射回每个查询
         
-        # 设置搜索参数
-        search_params = {
-            "collection_name": self.collection_name,
-            "data": [query_embedding],
-            "limit": limit,
-            "output_fields": [
-                "economics_name", "domain_name"
-            ],
-            # "filter": "domain_id == 'Condition'"
+        Args:
+            queries: 查询文本列表，可包含重复项
+            limit / search_preset / search_params / domain_name / hybrid / fuzzy: 同 search_similar_terms
+            
+        Returns:
+            与 queries 一一对应的结果列表，每项格式同 search_similar_terms
+        """
+        if not queries:
+            return []
+        params = self._resolve_params(limit, search_preset, search_params, hybrid)
+
+        # 保序去重，重复实体只计算一次
+        unique_queries = list(dict.fromkeys(queries))
+        results_by_query, fuzzy_by_query = {}, {}
+        for query in unique_queries:
+            lexical_hits = self._lexical_lookup(query, limit, domain_name)
+            if lexical_hits:
+                results_by_query[query] = lexical_hits
+                continue
+            fuzzy_hits = self._fuzzy_lookup(query, limit, domain_name) if fuzzy else []
+            if fuzzy_hits and fuzzy_hits[0]["distance"] >= self.fuzzy_direct_threshold:
+                results_by_query[query] = fuzzy_hits
+            else:
+                fuzzy_by_query[query] = fuzzy_hits
+
+        vector_queries = [query for query in unique_queries if query not in results_by_query]
+        if vector_queries:
+            if hybrid:
+                search_result = self._hybrid_search(vector_queries, self.embedding_func.embed_documents, limit, params, domain_name)
+            else:
+                query_embeddings = self.embedding_func.embed_documents(vector_queries)
+                search_result = self._vector_search(query_embeddings, limit, params, domain_name)
+            for query, hits in zip(vector_queries, search_result):
+                results_by_query[query] = self._seed_with_fuzzy(hits, fuzzy_by_query[query], limit)
+
+        return [list(results_by_query[query]) for query in queries]
+
+    def _resolve_params(self, limit: int, search_preset: Optional[str], search_params: Optional[Dict], hybrid: bool) -> Dict:
+        """校验检索参数；混合检索要求集合带稀疏向量，且稠密一路按融合候选数解析参数"""
+        if hybrid:
+            if self.sparse_encoder is None:
+                raise InvalidSearchParamsError(
+                    f"Hybrid search is not available for collection {self.collection_name}: "
+                    "rebuild it with sparse vectors (create_milvus_db.py --sparse)"
+                )
+            limit *= self.HYBRID_CANDIDATE_FACTOR
+        return resolve_search_params(self.index_type, limit, search_preset, search_params, self.search_params, self.supports_rerank)
+
+    def _lexical_lookup(self, query: str, limit: int, domain_name: Optional[str]) -> List[Dict]:
+        """术语表精确匹配快速路径"""
+        if self.glossary_index is None:
+            return []
+        hits = self.glossary_index.lookup(query, limit)
+        if domain_name:
+            hits = [hit for hit in hits if hit["domain_name"] == domain_name]
+        return hits
+
+    def _fuzzy_lookup(self, query: str, limit: int, domain_name: Optional[str]) -> List[Dict]:
+        """三元组索引候选生成，只返回不低于融合阈值的候选"""
+        if self.trigram_index is None:
+            return []
+        return self.trigram_index.candidates(query, limit, self.fuzzy_seed_threshold, domain_name)
+
+    def _seed_with_fuzzy(self, hits: List[Dict], fuzzy_hits: List[Dict], limit: int) -> List[Dict]:
+        """
+        把三元组候选按倒数排名与检索结果融合（以术语名和领域为键）
+        两路都命中的术语保留检索结果并附上 fuzzy_similarity，只有三元组命中的记为 fuzzy_candidate
+        """
+        if not fuzzy_hits:
+            return hits
+        fused = {}
+        for rank, hit in enumerate(hits, start=1):
+            key = (hit["economics_name"], hit["domain_name"])
+            fused[key] = ({**hit}, 1.0 / (self.RRF_K + rank))
+        for rank, hit in enumerate(fuzzy_hits, start=1):
+            key = (hit["economics_name"], hit["domain_name"])
+            entry, score = fused.get(key) or ({**hit, "match_type": "fuzzy_candidate"}, 0.0)
+            entry["fuzzy_similarity"] = hit["distance"]
+            fused[key] = (entry, score + 1.0 / (self.RRF_K + rank))
+        ranked = sorted(fused.values(), key=lambda item: item[1], reverse=True)
+        return [entry for entry, _ in ranked[:limit]]
+
+    def _project(self, embeddings: List[List[float]]):
+        """按集合的降维方式处理查询向量"""
+        if self.reducer is None:
+            return embeddings
+        return self.reducer.transform(embeddings).tolist()
+
+    def _vector_search(self, embeddings: List[List[float]], limit: int, params: Dict, domain_name: Optional[str]) -> List[List[Dict]]:
+        """在向量存储中检索并格式化结果"""
+        search_result = self.vector_store.search(
+            self.collection_name,
+            self._project(embeddings),
+            limit=limit,
+            output_fields=self.OUTPUT_FIELDS,
+            filter=domain_filter(domain_name),
+            search_params=params,
+        )
+        return [[self._format_hit(hit) for hit in hits] for hits in search_result]
+
+    def _hybrid_search(self,
+                       queries: List[str],
+                       embed: Callable[[List[str]], List[List[float]]],
+                       limit: int,
+                       params: Dict,
+                       domain_name: Optional[str]) -> List[List[Dict]]:
+        """
+        稠密与稀疏检索并发执行后做倒数排名融合（RRF）
+        稀疏编码与检索提交到进程共用的稀疏检索线程池，当前线程同时完成查询嵌入与稠密检索
+        """
+        depth = limit * self.HYBRID_CANDIDATE_FACTOR
+        filter = domain_filter(domain_name)
+        sparse_future = sparse_search_executor.submit(
+            lambda: self.vector_store.sparse_search(
+                self.collection_name,
+                self.sparse_encoder.encode_queries(queries),
+                limit=depth,
+                output_fields=self.OUTPUT_FIELDS,
+                filter=filter,
+            )
+        )
+        dense_result = self.vector_store.search(
+            self.collection_name,
+            self._project(embed(queries)),
+            limit=depth,
+            output_fields=self.OUTPUT_FIELDS,
+            filter=filter,
+            search_params=params,
+        )
+        sparse_result = sparse_future.result()
+        return [
+            self._fuse(dense_hits, sparse_hits, limit)
+            for dense_hits, sparse_hits in zip(dense_result, sparse_result)
+        ]
+
+    def _fuse(self, dense_hits: List[Dict], sparse_hits: List[Dict], limit: int) -> List[Dict]:
+        """按 sum(1 / (RRF_K + rank)) 融合两路结果，保留各路原始得分"""
+        fused = {}
+        for source, hits in (("dense_distance", dense_hits), ("sparse_score", sparse_hits)):
+            for rank, hit in enumerate(hits, start=1):
+                entry = fused.setdefault(hit["id"], {
+                    **self._format_hit(hit),
+                    "distance": 0.0,
+                    "dense_distance": None,
+                    "sparse_score": None,
+                    "match_type": "hybrid",
+                })
+                entry["distance"] += 1.0 / (self.RRF_K + rank)
+                entry[source] = float(hit["distance"])
+        return sorted(fused.values(), key=lambda entry: entry["distance"], reverse=True)[:limit]
+
+    @staticmethod
+    def _format_hit(hit) -> Dict:
+        """把向量检索命中转换为接口返回格式"""
+        return {
+            "economics_name": hit['entity'].get('economics_name'),
+            "domain_name": hit['entity'].get('domain_name'),
+            "distance": float(hit['distance']),
+            "match_type": "vector"
         }
-        
-        # 搜索相似项
-        search_result = self.client.search(**search_params)
-
-        results = []
-        for hit in search_result[0]:
-            results.append({
-                # "concept_id": hit['entity'].get('concept_id'),
-                "economics_name": hit['entity'].get('economcis_name'),
-                "domain_name": hit['entity'].get('domain_name'),
-                # "vocabulary_id": hit['entity'].get('vocabulary_id'),
-                # "concept_class_id": hit['entity'].get('concept_class_id'),
-                # "standard_concept": hit['entity'].get('standard_concept'),
-                # "concept_code": hit['entity'].get('concept_ce'),
-                # "synonyms": hit['entity'].get('synonyms'),
-                "distance": float(hit['distance'])
-            })
-
-        return results
-
-    def __del__(self):
-        """清理资源，释放集合"""
-        if hasattr(self, 'client') and hasattr(self, 'collection_name'):
-            self.client.release_collection(self.collection_name)
\ No newline at end of file
+
+    def close(self, release_collection: bool = True):
+        """
+        释放集合并关闭向量存储连接
+
+        由服务注册表在实例被淘汰或进程退出时显式调用，不再依赖 __del__；
+        其他实例仍在使用同一集合时传 release_collection=False，只关闭本实例的连接
+        """
+        if hasattr(self, 'vector_store') and hasattr(self, 'collection_name'):
+            try:
+                if release_collection:
+                    self.vector_store.release(self.collection_name)
+            finally:
+                self.vector_store.close()
@@ -0,0 +1,116 @@
+import argparse
+import json
+import logging
+import os
+import platform
+import re
+import sys
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from services.std_service import StdService
+from utils.vector_store import create_vector_store
+
+# 设置日志
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# 对比纯稠密检索与稠密 + BM25 混合检索的召回率和延迟
+# 集合需由 create_milvus_db.py --sparse 建立；术语表精确匹配快速路径在此关闭，
+# 只评估检索本身。查询集：
+#   abbreviation: "Asset-Backed Security - ABS" 形式术语的缩写部分，期望命中整条术语
+#   name: 随机抽样的小写术语名，期望命中自身
+
+_ABBR_RE = re.compile(r"^(.+?)\s+-\s+([A-Za-z0-9/+\-]{2,10})$")
+
+def build_queries(df: pd.DataFrame, n: int, rng) -> dict:
+    abbreviations = [
+        (match.group(2), name)
+        for name in df["economics_name"]
+        for match in [_ABBR_RE.match(name)]
+        if match
+    ]
+    names = df["economics_name"].tolist()
+    sampled = rng.choice(len(names), size=min(n, len(names)), replace=False)
+    picked = rng.choice(len(abbreviations), size=min(n, len(abbreviations)), replace=False)
+    return {
+        "abbreviation": [abbreviations[idx] for idx in picked],
+        "name": [(names[idx].lower(), names[idx]) for idx in sampled],
+    }
+
+def evaluate(service: StdService, queries, hybrid: bool, limit: int) -> dict:
+    latencies, top1, top_k = [], [], []
+    for query, expected in queries:
+        start = time.perf_counter()
+        hits = service.search_similar_terms(query, limit=limit, hybrid=hybrid)
+        latencies.append(time.perf_counter() - start)
+        names = [hit["economics_name"] for hit in hits]
+        top1.append(names[:1] == [expected])
+        top_k.append(expected in names)
+    return {
+        "recall@1": float(np.mean(top1)),
+        f"recall@{limit}": float(np.mean(top_k)),
+        "latency_p50_ms": float(np.percentile(latencies, 50) * 1000),
+        "latency_p99_ms": float(np.percentile(latencies, 99) * 1000),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark dense vs. hybrid (dense + BM25) glossary search")
+    parser.add_argument("--backend", default=None, help="Vector store backend: milvus / milvus-lite / numpy")
+    parser.add_argument("--uri", default=None, help="Milvus URI, Milvus Lite file or numpy store directory")
+    parser.add_argument("--collection", default="economics_only_name", help="Collection built with --sparse")
+    parser.add_argument("--sparse-encoder", default=None, help="BM25 encoder saved by create_milvus_db.py")
+    parser.add_argument("--glossary", default="backend/data/EconomicsGlossary.csv")
+    parser.add_argument("--queries", type=int, default=300, help="Queries per query set")
+    parser.add_argument("--limit", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default="hybrid_benchmark.json", help="Machine-readable JSON report")
+    args = parser.parse_args()
+
+    df = pd.read_csv(args.glossary, dtype=str, low_memory=False).fillna("NA")
+    query_sets = build_queries(df, args.queries, np.random.default_rng(args.seed))
+
+    service = StdService(
+        collection_name=args.collection,
+        glossary_path=None,
+        vector_store=create_vector_store(args.backend, args.uri),
+        sparse_encoder_path=args.sparse_encoder,
+    )
+    if service.sparse_encoder is None:
+        raise SystemExit(f"Collection {args.collection} has no sparse vectors or the BM25 encoder was not found")
+
+    # 预热模型与集合，避免首次调用计入延迟
+    service.search_similar_terms("warm up", limit=args.limit, hybrid=True)
+
+    report = {
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "collection": args.collection,
+        "index_type": service.index_type,
+        "limit": args.limit,
+        "host": {"platform": platform.platform(), "cpu_count": os.cpu_count()},
+        "results": [],
+    }
+    for set_name, queries in query_sets.items():
+        dense = evaluate(service, queries, hybrid=False, limit=args.limit)
+        hybrid = evaluate(service, queries, hybrid=True, limit=args.limit)
+        result = {
+            "query_set": set_name,
+            "queries": len(queries),
+            "dense": dense,
+            "hybrid": hybrid,
+            "recall@1_gain": hybrid["recall@1"] - dense["recall@1"],
+            "latency_p50_overhead_ms": hybrid["latency_p50_ms"] - dense["latency_p50_ms"],
+        }
+        report["results"].append(result)
+        logging.info(json.dumps(result))
+
+    service.close()
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+    logging.info(f"Report written to {args.output}")
+
+if __name__ == "__main__":
+    main()
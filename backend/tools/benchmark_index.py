@@ -0,0 +1,168 @@
+import argparse
+import json
+import logging
+import os
+import platform
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from utils.vector_store import CollectionSpec, DEFAULT_NUMPY_DIR, create_vector_store
+
+# 设置日志
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# 在真实术语表向量上比较不同索引配置的召回率、延迟、吞吐、构建时间与内存
+# 向量来自 create_milvus_db.py --backend numpy 生成的 vectors.npy，
+# 查询为随机抽样的术语向量，真值为排除查询自身后的精确检索结果
+
+# 索引配置与各自的检索参数扫描范围
+INDEX_CONFIGS = [
+    {"index_type": "FLAT", "params": {}, "search": [{}]},
+    *[
+        {
+            "index_type": index_type,
+            "params": {"nlist": nlist},
+            "search": [{"nprobe": nprobe} for nprobe in (8, 32, 128) if nprobe <= nlist],
+        }
+        for index_type in ("IVF_FLAT", "IVF_SQ8")
+        for nlist in (128, 512)
+    ],
+    *[
+        {
+            "index_type": "HNSW",
+            "params": {"M": m, "efConstruction": 200},
+            "search": [{"ef": ef} for ef in (32, 64, 128)],
+        }
+        for m in (16, 32)
+    ],
+]
+
+def estimate_memory(index_type: str, params: dict, n: int, dim: int) -> int:
+    """按索引结构估算常驻内存（字节），Milvus Lite 不提供索引内存统计"""
+    if index_type == "IVF_SQ8":
+        return n * dim + params["nlist"] * dim * 4
+    if index_type == "IVF_FLAT":
+        return n * dim * 4 + params["nlist"] * dim * 4
+    if index_type == "HNSW":
+        return n * dim * 4 + n * params["M"] * 2 * 8
+    return n * dim * 4
+
+def exact_neighbours(vectors: np.ndarray, query_ids: np.ndarray, k: int):
+    """全精度精确检索真值（排除查询自身）"""
+    scores = vectors[query_ids] @ vectors.T
+    scores[np.arange(len(query_ids)), query_ids] = -np.inf
+    top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    order = np.argsort(-np.take_along_axis(scores, top, axis=1), axis=1)
+    return np.take_along_axis(top, order, axis=1)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark vector index configurations on the glossary collection")
+    parser.add_argument("--vectors", default=os.path.join(DEFAULT_NUMPY_DIR, "economics_only_name", "vectors.npy"), help="float32 .npy matrix of glossary vectors")
+    parser.add_argument("--backend", default="milvus-lite", help="Vector store backend to benchmark (milvus-lite / milvus)")
+    parser.add_argument("--uri", default="backend/db/index_benchmark.db", help="Milvus Lite file or Milvus URI")
+    parser.add_argument("--queries", type=int, default=500, help="Number of sampled query vectors")
+    parser.add_argument("--concurrency", type=int, default=8, help="Concurrent clients for the QPS measurement")
+    parser.add_argument("--index-types", nargs="+", default=None, help="Only run these index types")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default="index_benchmark.json", help="Machine-readable JSON report")
+    args = parser.parse_args()
+
+    vectors = np.load(args.vectors).astype(np.float32)
+    vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+    n, dim = vectors.shape
+    rng = np.random.default_rng(args.seed)
+    query_ids = rng.choice(n, size=min(args.queries, n), replace=False)
+    queries = vectors[query_ids].tolist()
+    ground_truth = exact_neighbours(vectors, query_ids, 5)
+    logging.info(f"Loaded {n} x {dim} vectors, {len(query_ids)} queries")
+
+    store = create_vector_store(args.backend, args.uri)
+    rows = [{"vector": vector, "row": str(idx)} for idx, vector in enumerate(vectors)]
+    collection_name = "index_benchmark"
+
+    report = {
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "backend": args.backend,
+        "vectors": int(n),
+        "dim": int(dim),
+        "queries": len(query_ids),
+        "concurrency": args.concurrency,
+        "host": {"platform": platform.platform(), "cpu_count": os.cpu_count()},
+        "results": [],
+    }
+
+    for config in INDEX_CONFIGS:
+        if args.index_types and config["index_type"] not in args.index_types:
+            continue
+        name = f"{config['index_type']}{json.dumps(config['params'], sort_keys=True)}"
+        if store.has_collection(collection_name):
+            store.drop_collection(collection_name)
+
+        try:
+            start = time.perf_counter()
+            store.create_collection(collection_name, CollectionSpec(
+                dim=dim,
+                scalar_fields={"row": 20},
+                metric_type="COSINE",
+                index_type=config["index_type"],
+                index_params=config["params"],
+            ))
+            for batch_start in range(0, n, 1024):
+                store.insert(collection_name, rows[batch_start:batch_start + 1024])
+            store.flush(collection_name)
+            store.load(collection_name)
+            build_seconds = time.perf_counter() - start
+        except Exception as e:
+            logging.error(f"Failed to build {name}: {e}")
+            report["results"].append({"index_type": config["index_type"], "params": config["params"], "error": str(e)})
+            continue
+        logging.info(f"Built {name} in {build_seconds:.2f}s")
+
+        for search in config["search"]:
+            def run_query(query):
+                hits = store.search(collection_name, [query], limit=6, output_fields=["row"], search_params=search)[0]
+                return [int(hit["entity"]["row"]) for hit in hits]
+
+            # 单并发逐条测延迟与召回
+            latencies, found = [], []
+            for query, query_id in zip(queries, query_ids):
+                start = time.perf_counter()
+                ids = run_query(query)
+                latencies.append(time.perf_counter() - start)
+                found.append([idx for idx in ids if idx != query_id][:5])
+
+            # 固定并发测吞吐
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+                list(pool.map(run_query, queries))
+            qps = len(queries) / (time.perf_counter() - start)
+
+            result = {
+                "index_type": config["index_type"],
+                "params": config["params"],
+                "search_params": search,
+                "recall@1": float(np.mean([len(f[:1]) > 0 and f[0] == gt[0] for f, gt in zip(found, ground_truth)])),
+                "recall@5": float(np.mean([len(set(f[:5]) & set(gt[:5])) / 5 for f, gt in zip(found, ground_truth)])),
+                "latency_p50_ms": float(np.percentile(latencies, 50) * 1000),
+                "latency_p99_ms": float(np.percentile(latencies, 99) * 1000),
+                "qps": qps,
+                "build_seconds": build_seconds,
+                "estimated_memory_bytes": estimate_memory(config["index_type"], config["params"], n, dim),
+            }
+            report["results"].append(result)
+            logging.info(json.dumps(result))
+
+        store.drop_collection(collection_name)
+
+    store.close()
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+    logging.info(f"Report written to {args.output}")
+
+if __name__ == "__main__":
+    main()
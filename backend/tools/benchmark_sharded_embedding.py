@@ -0,0 +1,92 @@
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from utils.sharded_embedding import ShardedEmbeddingFunction
+
+# 设置日志
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# 多进程分片嵌入（create_milvus_db*.py --embed-workers）的扩展性：
+# 对同一批抽样文档，依次用 1..N 个工作进程（默认每个进程平分 CPU 核数）按建库时的块大小嵌入，
+# 报告端到端 rows/s、相对单进程的加速比与并行效率，并检查各配置的向量与单进程一致
+
+def main():
+    parser = argparse.ArgumentParser(description="Report rows/sec scaling of sharded multi-process embedding")
+    parser.add_argument("--csv", default="backend/data/EconomicsGlossary.csv")
+    parser.add_argument("--columns", nargs="+", default=["economics_name"], help="Columns joined with spaces into each document")
+    parser.add_argument("--samples", type=int, default=8192, help="Number of sampled rows (kept in CSV order)")
+    parser.add_argument("--provider", default="sentence-transformers", choices=["sentence-transformers", "huggingface-onnx"])
+    parser.add_argument("--model", default="BAAI/bge-m3")
+    parser.add_argument("--workers", type=int, nargs="+", default=None, help="Worker counts to test (default: 1, 2, 4, ... up to the CPU count)")
+    parser.add_argument("--threads-per-worker", type=int, default=None, help="Fixed threads per worker (default: CPU cores / workers)")
+    parser.add_argument("--pin-cores", action="store_true")
+    parser.add_argument("--length-buckets", action="store_true")
+    parser.add_argument("--chunk-size", type=int, default=4096, help="Rows per embedding call, as in the ingestion pipeline")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default=None, help="Write the JSON report to this file")
+    args = parser.parse_args()
+
+    df = pd.read_csv(args.csv, dtype=str, usecols=args.columns).fillna("")
+    docs = df[args.columns].agg(" ".join, axis=1).str.strip().tolist()
+    rng = np.random.default_rng(args.seed)
+    picked = np.sort(rng.choice(len(docs), size=min(args.samples, len(docs)), replace=False))
+    docs = [docs[idx] for idx in picked]
+
+    cpu_count = os.cpu_count() or 1
+    worker_counts = args.workers or sorted({1, *(2 ** p for p in range(1, cpu_count.bit_length()) if 2 ** p <= cpu_count), cpu_count})
+    spec = {"provider": args.provider, "model_name": args.model, "length_buckets": args.length_buckets}
+
+    runs, reference = [], None
+    for workers in worker_counts:
+        embedding_function = ShardedEmbeddingFunction(spec, workers, args.threads_per_worker, args.pin_cores)
+        try:
+            # 预热：等所有进程加载完模型
+            embedding_function(docs[:workers * 4])
+            start = time.perf_counter()
+            vectors = np.concatenate([
+                embedding_function(docs[chunk_start:chunk_start + args.chunk_size])
+                for chunk_start in range(0, len(docs), args.chunk_size)
+            ])
+            seconds = time.perf_counter() - start
+        finally:
+            embedding_function.close()
+        if reference is None:
+            reference = vectors
+        cosine = np.sum(reference * vectors, axis=1) / np.maximum(
+            np.linalg.norm(reference, axis=1) * np.linalg.norm(vectors, axis=1), 1e-12
+        )
+        run = {
+            "workers": workers,
+            "threads_per_worker": embedding_function.threads_per_worker,
+            "seconds": seconds,
+            "rows_per_second": len(docs) / seconds,
+            "min_cosine_vs_first": float(cosine.min()),
+        }
+        runs.append(run)
+        logging.info(json.dumps(run))
+
+    base = runs[0]["rows_per_second"]
+    for run in runs:
+        run["speedup"] = run["rows_per_second"] / base
+        run["efficiency"] = run["speedup"] / (run["workers"] / runs[0]["workers"])
+
+    print(f"{'workers':>7} {'threads':>7} {'rows/s':>9} {'speedup':>8} {'eff.':>6}")
+    for run in runs:
+        print(f"{run['workers']:>7} {run['threads_per_worker']:>7} {run['rows_per_second']:>9.1f} "
+              f"{run['speedup']:>8.2f} {run['efficiency']:>6.2f}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"csv": args.csv, "rows": len(docs), "cpu_count": cpu_count, "runs": runs}, f, indent=2)
+        logging.info(f"Report written to {args.output}")
+
+if __name__ == "__main__":
+    main()
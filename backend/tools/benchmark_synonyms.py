@@ -0,0 +1,116 @@
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+
+import pandas as pd
+from dotenv import load_dotenv
+load_dotenv()
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from utils.synonym_provider import Neo4jSynonymProvider, OfflineSynonymProvider
+
+# 设置日志
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# 对比 create_milvus_db_with_graph.py 取同义词的几种方式的查询次数与耗时：
+#   per_row: 原来的做法，每行调用两次 get_concept_descriptions（构造文档、构造写入行各一次），
+#            每次先查概念是否存在再查描述，共 4 次 Neo4j 往返
+#   neo4j_batched: 每批概念一次 UNWIND 查询，运行期间记住结果
+#   offline: 直接读取 descrip_new.csv / RF2 描述文件，不连接图数据库
+# 同时检查各方式得到的同义词文本是否一致
+
+LEGACY_CONCEPT_QUERY = """
+    MATCH (c:ObjectConcept {id: $concept_code})
+    RETURN c.id as id, c.FSN as fsn
+"""
+LEGACY_DESCRIPTION_QUERY = """
+    MATCH (c:ObjectConcept {id: $concept_code})-[:HAS_DESCRIPTION]->(d:Description)
+    RETURN d.term as term, d.descriptionType as type, d.active as active
+    ORDER BY d.descriptionType
+"""
+
+def legacy_lookup(driver, codes):
+    queries, synonyms = 0, {}
+    for code in codes:
+        for _ in range(2):
+            with driver.session() as session:
+                concept = session.run(LEGACY_CONCEPT_QUERY, concept_code=code).single()
+                queries += 1
+                if not concept:
+                    synonyms[code] = []
+                    continue
+                result = session.run(LEGACY_DESCRIPTION_QUERY, concept_code=code)
+                queries += 1
+                synonyms[code] = [record["term"] for record in result]
+    return synonyms, queries
+
+def batched_lookup(provider, codes, batch_size):
+    synonyms = {}
+    for start in range(0, len(codes), batch_size):
+        batch = codes[start:start + batch_size]
+        # 与建库脚本一样，每批在构造文档与写入行时各取一次，第二次命中运行内缓存
+        synonyms.update(provider.get_many(batch))
+        provider.get_many(batch)
+    return synonyms
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare per-row, batched and offline synonym lookups")
+    parser.add_argument("--input", default="backend/data/SNOMED_5000.csv")
+    parser.add_argument("--descriptions", default="backend/data/descrip_new.csv", help="Description file for the offline provider")
+    parser.add_argument("--batch-size", type=int, default=1024)
+    parser.add_argument("--modes", nargs="+", default=["per_row", "neo4j_batched", "offline"],
+                        choices=["per_row", "neo4j_batched", "offline"])
+    parser.add_argument("--output", default=None, help="Write the JSON report to this file")
+    args = parser.parse_args()
+
+    codes = pd.read_csv(args.input, dtype=str, usecols=["concept_code"])["concept_code"].fillna("NA").tolist()
+    driver = None
+    if {"per_row", "neo4j_batched"} & set(args.modes):
+        from neo4j import GraphDatabase
+
+        driver = GraphDatabase.driver(
+            os.getenv("NEO4J_URI", "bolt://localhost:7687"),
+            auth=(os.getenv("NEO4J_USER", "neo4j"), os.getenv("NEO4J_PASSWORD", "neo4j"))
+        )
+
+    report = {"input": args.input, "rows": len(codes), "modes": {}}
+    results = {}
+    for mode in args.modes:
+        start = time.perf_counter()
+        if mode == "per_row":
+            synonyms, queries = legacy_lookup(driver, codes)
+        elif mode == "neo4j_batched":
+            provider = Neo4jSynonymProvider(driver)
+            synonyms = batched_lookup(provider, codes, args.batch_size)
+            queries = provider.queries
+        else:
+            provider = OfflineSynonymProvider(args.descriptions, codes)
+            synonyms = batched_lookup(provider, codes, args.batch_size)
+            queries = 0
+        seconds = time.perf_counter() - start
+        results[mode] = {code: " ".join(terms) for code, terms in synonyms.items()}
+        report["modes"][mode] = {"queries": queries, "seconds": round(seconds, 3), "rows_per_second": round(len(codes) / seconds, 1)}
+        logging.info(f"{mode}: {json.dumps(report['modes'][mode])}")
+
+    reference = args.modes[0]
+    for mode in args.modes[1:]:
+        mismatched = [code for code in results[reference] if results[reference][code] != results[mode].get(code)]
+        report["modes"][mode]["synonym_mismatches_vs_" + reference] = len(mismatched)
+        if mismatched:
+            logging.warning(f"{mode} differs from {reference} for {len(mismatched)} concepts, e.g. {mismatched[:5]}")
+    if driver is not None:
+        driver.close()
+
+    print(f"{'mode':<14} {'queries':>8} {'seconds':>9} {'rows/s':>10}")
+    for mode, entry in report["modes"].items():
+        print(f"{mode:<14} {entry['queries']:>8} {entry['seconds']:>9.3f} {entry['rows_per_second']:>10.1f}")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        logging.info(f"Report written to {args.output}")
+
+if __name__ == "__main__":
+    main()
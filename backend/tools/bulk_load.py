@@ -0,0 +1,78 @@
+import argparse
+import json
+import logging
+import os
+import shutil
+import sys
+import time
+
+from dotenv import load_dotenv
+load_dotenv()
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from utils.vector_store import DEFAULT_DB_DIR, create_vector_store
+from utils.bulk_artifacts import read_manifest, spec_from_manifest
+
+# 设置日志
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# 把 create_milvus_db*.py --export-dir 写出的列式产物导入向量存储，不加载嵌入模型：
+#   numpy: 向量矩阵直接硬链接 / 拼接为集合的 vectors.npy，检索时 mmap
+#   milvus: 传 --remote-prefix（产物同步到 Milvus 对象存储后的路径）时走服务端批量导入，否则按大批量 insert
+# 同一份产物可以依次导入多个节点；产物附带的 PCA 投影与 BM25 编码器会复制到查询端读取的位置
+
+def main():
+    parser = argparse.ArgumentParser(description="Load a bulk-import artifact into a vector store without re-embedding")
+    parser.add_argument("--artifact", required=True, help="Artifact directory written with --export-dir")
+    parser.add_argument("--backend", default=None, help="Vector store backend: milvus / milvus-lite / numpy (default: $VECTOR_STORE_BACKEND or milvus)")
+    parser.add_argument("--uri", default=None, help="Milvus URI, Milvus Lite file or numpy store directory")
+    parser.add_argument("--collection", required=True, help="Collection name")
+    parser.add_argument("--replace", action="store_true", help="Drop the collection first if it exists")
+    parser.add_argument("--remote-prefix", default=None, help="Path of the artifact in Milvus object storage, enables server-side bulk insert")
+    parser.add_argument("--projection-path", default=None, help="Where to restore the PCA projection (default: backend/db/projections/<collection>_pca.npz)")
+    parser.add_argument("--sparse-encoder", default=None, help="Where to restore the BM25 encoder (default: backend/db/sparse/<collection>_bm25.json)")
+    parser.add_argument("--batch-size", type=int, default=10000, help="Rows per insert when the backend falls back to row inserts")
+    args = parser.parse_args()
+
+    manifest = read_manifest(args.artifact)
+    spec = spec_from_manifest(manifest)
+    store = create_vector_store(args.backend, args.uri)
+    collection_name = args.collection
+
+    if store.has_collection(collection_name):
+        if not args.replace:
+            raise SystemExit(f"Collection {collection_name} already exists; pass --replace to rebuild it from the artifact")
+        store.drop_collection(collection_name)
+        logging.info(f"Dropped collection {collection_name}")
+
+    targets = {
+        "projection": args.projection_path or os.path.join(DEFAULT_DB_DIR, "projections", f"{collection_name}_pca.npz"),
+        "sparse_encoder": args.sparse_encoder or os.path.join(DEFAULT_DB_DIR, "sparse", f"{collection_name}_bm25.json"),
+    }
+    for name, file_name in manifest.get("files", {}).items():
+        target = targets[name]
+        os.makedirs(os.path.dirname(target) or ".", exist_ok=True)
+        shutil.copyfile(os.path.join(args.artifact, file_name), target)
+        logging.info(f"Restored {name} to {target}")
+
+    store.create_collection(collection_name, spec)
+    if manifest.get("metadata"):
+        store.set_metadata(collection_name, manifest["metadata"])
+
+    start = time.perf_counter()
+    rows = store.bulk_load(collection_name, args.artifact, args.remote_prefix, args.batch_size)
+    seconds = time.perf_counter() - start
+    logging.info(json.dumps({
+        "collection": collection_name,
+        "rows": rows,
+        "expected_rows": manifest["rows"],
+        "partitions": len(manifest["partitions"]),
+        "seconds": round(seconds, 3),
+        "rows_per_second": round(rows / seconds, 1) if seconds else None,
+    }))
+    if rows != manifest["rows"]:
+        logging.warning(f"Loaded {rows} rows but the artifact has {manifest['rows']}")
+    store.close()
+
+if __name__ == "__main__":
+    main()
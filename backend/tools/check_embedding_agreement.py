@@ -0,0 +1,88 @@
+import argparse
+import csv
+import json
+import logging
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from utils.embedding_config import EmbeddingConfig, EmbeddingProvider
+from utils.embedding_factory import EmbeddingFactory
+
+# 设置日志
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# 检查 huggingface-onnx 提供商与参考模型（HuggingFaceEmbeddings）的向量是否兼容：
+# 逐条余弦一致度，以及在抽样术语上两者的 top-k 近邻重合度，同时对比编码耗时。
+# 一致度足够高时，ONNX 提供商可以直接查询用参考模型建好的集合
+
+def embed(embeddings, texts, batch_size):
+    start = time.perf_counter()
+    vectors = []
+    for batch_start in range(0, len(texts), batch_size):
+        vectors.extend(embeddings.embed_documents(texts[batch_start:batch_start + batch_size]))
+    elapsed = time.perf_counter() - start
+    vectors = np.asarray(vectors, dtype=np.float32)
+    return vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12), elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description="Check cosine agreement between the ONNX and reference embedding models")
+    parser.add_argument("--model", default="BAAI/bge-m3")
+    parser.add_argument("--glossary", default="backend/data/EconomicsGlossary.csv")
+    parser.add_argument("--samples", type=int, default=1000, help="Number of sampled glossary terms")
+    parser.add_argument("--k", type=int, default=10, help="Neighbour overlap cut-off")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--min-cosine", type=float, default=0.99, help="Fail if the mean cosine agreement is lower")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default="embedding_agreement.json", help="Machine-readable JSON report")
+    args = parser.parse_args()
+
+    with open(args.glossary, newline="", encoding="utf-8") as f:
+        names = [row["economics_name"] for row in csv.DictReader(f) if row.get("economics_name")]
+    rng = np.random.default_rng(args.seed)
+    texts = [names[idx] for idx in rng.choice(len(names), size=min(args.samples, len(names)), replace=False)]
+
+    # 直接比较底层模型，不经过查询向量缓存
+    reference = EmbeddingFactory._create_base_embedding_function(
+        EmbeddingConfig(provider=EmbeddingProvider.HUGGINGFACE, model_name=args.model)
+    )
+    candidate = EmbeddingFactory._create_base_embedding_function(
+        EmbeddingConfig(provider=EmbeddingProvider.HUGGINGFACE_ONNX, model_name=args.model)
+    )
+    ref_vectors, ref_seconds = embed(reference, texts, args.batch_size)
+    cand_vectors, cand_seconds = embed(candidate, texts, args.batch_size)
+
+    cosine = np.sum(ref_vectors * cand_vectors, axis=1)
+    k = min(args.k, len(texts) - 1)
+    ref_neighbours = np.argsort(-(ref_vectors @ ref_vectors.T), axis=1)[:, 1:k + 1]
+    cand_neighbours = np.argsort(-(cand_vectors @ cand_vectors.T), axis=1)[:, 1:k + 1]
+    overlap = [len(set(r) & set(c)) / k for r, c in zip(ref_neighbours, cand_neighbours)]
+
+    report = {
+        "model": args.model,
+        "samples": len(texts),
+        "cosine_mean": float(cosine.mean()),
+        "cosine_min": float(cosine.min()),
+        "cosine_p01": float(np.percentile(cosine, 1)),
+        f"neighbour_overlap@{k}": float(np.mean(overlap)),
+        "reference_texts_per_s": len(texts) / ref_seconds,
+        "onnx_texts_per_s": len(texts) / cand_seconds,
+        "speedup": ref_seconds / cand_seconds,
+        "worst": [
+            {"text": texts[idx], "cosine": float(cosine[idx])}
+            for idx in np.argsort(cosine)[:5]
+        ],
+    }
+    logging.info(json.dumps(report, indent=2, ensure_ascii=False))
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    logging.info(f"Report written to {args.output}")
+
+    if report["cosine_mean"] < args.min_cosine:
+        raise SystemExit(f"Mean cosine agreement {report['cosine_mean']:.4f} is below {args.min_cosine}")
+
+if __name__ == "__main__":
+    main()
@@ -1,50 +1,236 @@
 from pymilvus import model
-from pymilvus import MilvusClient
+import numpy as np
 import pandas as pd
 from tqdm import tqdm
 import logging
+import argparse
+import json
+import os
+import sys
 from dotenv import load_dotenv
 load_dotenv()
 import torch    
-from pymilvus import MilvusClient, DataType, FieldSchema, CollectionSchema
-from pymilvus import Collection
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from utils.vector_store import CollectionSpec, DEFAULT_DB_DIR, create_vector_store
+from utils.sparse_encoder import BM25SparseEncoder
+from utils.dim_reduction import DimensionReducer
+from utils.ingest_pipeline import run_pipeline, log_stage_stats
+from utils.length_batching import LengthBucketedEmbeddingFunction, tokenizer_lengths
+from utils.sharded_embedding import ShardedEmbeddingFunction, embedding_model_id as model_id_for
+from utils.embedding_artifacts import EmbeddingArtifactStore, CachedEmbeddingFunction
+from utils.bulk_artifacts import BulkArtifactWriter
+from utils.reindex import KEY_FIELD, HASH_FIELD, HASH_LENGTH, term_key, content_hash, diff_terms
 
 # 设置日志
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+parser = argparse.ArgumentParser(description="Build the economics glossary vector collection")
+parser.add_argument("--backend", default=None, help="Vector store backend: milvus / milvus-lite / numpy (default: $VECTOR_STORE_BACKEND or milvus)")
+parser.add_argument("--uri", default=None, help="Milvus URI, Milvus Lite file or numpy store directory")
+parser.add_argument("--collection", default="economics_only_name", help="Collection name")
+parser.add_argument("--vector-dtype", default="float32", choices=["float32", "float16", "int8", "binary"], help="Vector storage precision (binary is only supported by the numpy store)")
+parser.add_argument("--embedding-provider", default="sentence-transformers", choices=["sentence-transformers", "huggingface-onnx"],
+                    help="Dense embedding backend; huggingface-onnx serves the same model through ONNX Runtime (int8 by default)")
+parser.add_argument("--sparse", action="store_true", help="Also write BM25 sparse vectors for hybrid search")
+parser.add_argument("--sparse-encoder", default=None, help="Where to save the fitted BM25 encoder (default: backend/db/sparse/<collection>_bm25.json)")
+parser.add_argument("--dim", type=int, default=None, help="Reduced vector dimension (default: the model's full dimension)")
+parser.add_argument("--reduction", default="truncate", choices=["truncate", "pca"], help="How to reduce to --dim: truncate + renormalize, or a PCA projection fitted on the glossary")
+parser.add_argument("--pca-samples", type=int, default=4096, help="Glossary terms used to fit the PCA projection")
+parser.add_argument("--projection-path", default=None, help="Where to save the PCA projection (default: backend/db/projections/<collection>_pca.npz)")
+parser.add_argument("--input", default="backend/data/EconomicsGlossary.csv", help="Glossary CSV with economics_name and domain_name columns")
+parser.add_argument("--chunk-size", type=int, default=1024, help="Rows per CSV chunk / embedding batch")
+parser.add_argument("--queue-size", type=int, default=4, help="Max batches buffered between pipeline stages")
+parser.add_argument("--insert-workers", type=int, default=1, help="Concurrent insert workers")
+parser.add_argument("--embedding-cache", default="backend/db/embedding_artifacts", help="On-disk embedding artifact cache shared by ingestion runs")
+parser.add_argument("--embedding-cache-dtype", default="float32", choices=["float32", "float16"], help="Storage precision for newly created cache entries")
+parser.add_argument("--no-embedding-cache", action="store_true", help="Always call the embedding model")
+parser.add_argument("--length-buckets", action="store_true", help="Sort each chunk by token length and embed it in token-budgeted batches")
+parser.add_argument("--max-batch-tokens", type=int, default=16384, help="Padded-token budget per embedding batch with --length-buckets")
+parser.add_argument("--max-batch-size", type=int, default=256, help="Max documents per embedding batch with --length-buckets")
+parser.add_argument("--embed-workers", type=int, default=1, help="Embedding worker processes (CPU); each chunk is split into this many row ranges")
+parser.add_argument("--threads-per-worker", type=int, default=None, help="Threads per embedding worker (default: CPU cores / workers)")
+parser.add_argument("--pin-cores", action="store_true", help="Pin each embedding worker to its own set of CPU cores (Linux)")
+parser.add_argument("--dry-run", action="store_true", help="Only report which terms would be added, re-embedded or deleted")
+parser.add_argument("--rebuild", action="store_true", help="Drop the collection and rebuild it from scratch")
+parser.add_argument("--export-dir", default=None, help="Write a bulk-import artifact (columnar .npy files) instead of inserting; load it with tools/bulk_load.py")
+parser.add_argument("--partition-rows", type=int, default=100000, help="Rows per artifact partition with --export-dir")
+args = parser.parse_args()
+
+MODEL_NAME = 'BAAI/bge-m3'
+# 向量来源标识（提供商 + 模型 + ONNX 精度），参与内容哈希、嵌入产物缓存与集合元数据
+embedding_model_id = model_id_for(args.embedding_provider, MODEL_NAME)
+
+# 文件路径
+file_path = args.input
+# db_path = "backend/db/snomed_bge_m3.db"
+
+# 多进程分片：每个 CSV 块按行切成 N 段，由 N 个各自加载模型的进程并行嵌入后按顺序拼回；
+# 工作进程以 fork 方式启动，必须在连接向量存储（Milvus 的 gRPC 通道会启动后台线程）
+# 和流水线线程启动之前创建，否则子进程会继承处于不一致状态的锁和连接
+sharded_embedding_function = None
+if args.embed_workers > 1 and not args.dry_run:
+    sharded_embedding_function = ShardedEmbeddingFunction(
+        {
+            "provider": args.embedding_provider,
+            "model_name": MODEL_NAME,
+            "length_buckets": args.length_buckets,
+            "max_batch_tokens": args.max_batch_tokens,
+            "max_batch_size": args.max_batch_size,
+        },
+        workers=args.embed_workers,
+        threads_per_worker=args.threads_per_worker,
+        pin_cores=args.pin_cores
+    )
+
+# 连接到向量存储（默认 Milvus 服务端）；导出批量导入产物时不连接，所有术语都按新增处理
+store = None if args.export_dir else create_vector_store(args.backend, args.uri)
+
+collection_name = args.collection
+# collection_name = "concepts_with_synonym"
+
+def read_chunks(columns=None):
+    """分块读取 CSV，内存中只保留当前块，适用于 SNOMED 规模的输入"""
+    for chunk in pd.read_csv(file_path,
+                             dtype=str,
+                             usecols=columns,
+                             chunksize=args.chunk_size,
+                             ):
+        yield chunk.fillna("NA")
+
+def build_docs(chunk: pd.DataFrame) -> list:
+    """按列向量化构造待嵌入文档"""
+    docs = chunk['economics_name']
+    # docs = docs + ", Full Name: " + chunk['Full Name'].where(chunk['Full Name'] != "NA", "")
+    # docs = docs + ", Synonyms: " + chunk['Synonyms'].where(chunk['Synonyms'] != "NA", "")
+    return docs.tolist()
+
+def keyed_chunks(columns=None):
+    """分块读取并为每行计算术语稳定键（术语名 + 领域）与内容哈希（模型标识 + 文档 + 写入的标量字段）"""
+    for chunk in read_chunks(columns):
+        docs = build_docs(chunk)
+        names, domains = chunk['economics_name'].tolist(), chunk['domain_name'].tolist()
+        yield chunk.assign(**{
+            KEY_FIELD: [term_key(name, domain) for name, domain in zip(names, domains)],
+            HASH_FIELD: [
+                content_hash(embedding_model_id, doc, name, domain, file_path)
+                for doc, name, domain in zip(docs, names, domains)
+            ],
+        })
+
+# 增量建库：对比术语表与集合中已有行的键和哈希，只嵌入写入新增/变更的术语，删除旧行与已移除的术语
+if args.rebuild and store is not None and store.has_collection(collection_name) and not args.dry_run:
+    store.drop_collection(collection_name)
+    logging.info(f"Dropped collection {collection_name} for a full rebuild")
+exists = store is not None and store.has_collection(collection_name) and not args.rebuild
+if exists and "reindex" not in store.get_metadata(collection_name):
+    raise SystemExit(f"Collection {collection_name} was built without term keys and content hashes; re-run with --rebuild")
+# 换了提供商或 ONNX 精度时已有向量与新向量不可比，不能只嵌入变更的术语
+built_model_id = store.get_metadata(collection_name)["reindex"].get("model_id") if exists else None
+if exists and built_model_id != embedding_model_id:
+    raise SystemExit(f"Collection {collection_name} was built with {built_model_id or 'an unrecorded embedding model'}, not {embedding_model_id}; re-run with --rebuild")
+
+incoming, csv_duplicates = {}, 0
+for chunk in keyed_chunks():
+    for key, digest in zip(chunk[KEY_FIELD], chunk[HASH_FIELD]):
+        if key in incoming:
+            csv_duplicates += 1
+        else:
+            incoming[key] = digest
+existing = store.scan(collection_name, [KEY_FIELD, HASH_FIELD]) if exists else []
+diff = diff_terms(incoming, existing)
+summary = {"collection": collection_name, "terms": len(incoming), "csv_duplicates": csv_duplicates, **diff.summary()}
+logging.info(f"Diff against {collection_name}: {json.dumps(summary)}")
+
+if args.dry_run:
+    pending = diff.to_embed
+    examples = {"new": [], "changed": []}
+    changed = set(diff.changed)
+    for chunk in keyed_chunks():
+        for key, name, domain in zip(chunk[KEY_FIELD], chunk['economics_name'], chunk['domain_name']):
+            status = "changed" if key in changed else "new"
+            if key in pending and len(examples[status]) < 10:
+                examples[status].append(f"{name} ({domain})")
+    print(json.dumps({**summary, "examples": examples}, ensure_ascii=False, indent=2))
+    raise SystemExit(0)
+
+if not diff.to_embed and not diff.stale_ids:
+    logging.info(f"Collection {collection_name} is up to date")
+    if sharded_embedding_function is not None:
+        sharded_embedding_function.close()
+    raise SystemExit(0)
+
 # 初始化 OpenAI 嵌入函数
-embedding_function = model.dense.SentenceTransformerEmbeddingFunction(
+if sharded_embedding_function is not None:
+    embedding_function = sharded_embedding_function
+elif args.embedding_provider == "huggingface-onnx":
+    # 与服务端 huggingface-onnx 提供商共用同一个导出目录与配置（EMBEDDING_ONNX_PATH / EMBEDDING_ONNX_INT8 / EMBEDDING_ONNX_THREADS）
+    from utils.embedding_config import EmbeddingConfig, EmbeddingProvider
+    from utils.embedding_factory import EmbeddingFactory
+
+    onnx_config = EmbeddingConfig(provider=EmbeddingProvider.HUGGINGFACE_ONNX, model_name=MODEL_NAME)
+    onnx_embeddings = EmbeddingFactory._create_base_embedding_function(onnx_config)
+    embedding_function = lambda docs: np.asarray(onnx_embeddings.embed_documents(docs), dtype=np.float32)
+else:
+    embedding_function = model.dense.SentenceTransformerEmbeddingFunction(
             # model_name='nvidia/NV-Embed-v2', 
             # model_name='dunzhang/stella_en_1.5B_v5',
             # model_name='all-mpnet-base-v2',
             # model_name='intfloat/multilingual-e5-large-instruct',
             # model_name='Alibaba-NLP/gte-Qwen2-1.5B-instruct',
-            model_name='BAAI/bge-m3',
+            model_name=MODEL_NAME,
             # model_name='jinaai/jina-embeddings-v3',
             device='cuda:0' if torch.cuda.is_available() else 'cpu',
             trust_remote_code=True
         )
 # embedding_function = model.dense.OpenAIEmbeddingFunction(model_name='text-embedding-3-large')
 
-# 文件路径
-file_path = "backend/data/EconomicsGlossary.csv"
-# db_path = "backend/db/snomed_bge_m3.db"
-
-# 连接到 Milvus
-client = MilvusClient("tcp://localhost:19530")
-
-collection_name = "economics_only_name"
-# collection_name = "concepts_with_synonym"
-
-
-
-logging.info("Loading data from CSV")
-
-
-df = pd.read_csv(file_path, 
-                 dtype=str, 
-                low_memory=False,
-                 ).fillna("NA")
+# 按长度分桶：批次由本地按 token 预算切好，模型对每次传入的列表只做一次前向计算
+# （多进程分片时在各工作进程内分桶）
+bucketed_embedding_function = None
+if args.length_buckets and sharded_embedding_function is None:
+    if args.embedding_provider == "huggingface-onnx":
+        model_batch_size = onnx_embeddings.batch_size
+        tokenizer, max_length = onnx_embeddings.tokenizer, onnx_embeddings.max_length
+        onnx_embeddings.batch_size = args.max_batch_size
+    else:
+        model_batch_size = embedding_function.batch_size
+        tokenizer, max_length = embedding_function.model.tokenizer, embedding_function.model.max_seq_length
+        embedding_function.batch_size = args.max_batch_size
+    bucketed_embedding_function = LengthBucketedEmbeddingFunction(
+        embedding_function,
+        tokenizer_lengths(tokenizer, max_length),
+        max_tokens=args.max_batch_tokens,
+        max_batch_size=args.max_batch_size,
+        baseline_batch_size=model_batch_size
+    )
+    embedding_function = bucketed_embedding_function
+
+# 按 (模型, 文档文本哈希) 复用之前运行算过的全维度向量，换索引类型或集合名重建时只剩写入耗时
+cached_embedding_function = None
+if not args.no_embedding_cache:
+    cached_embedding_function = CachedEmbeddingFunction(
+        embedding_function,
+        EmbeddingArtifactStore(args.embedding_cache, embedding_model_id, args.embedding_cache_dtype)
+    )
+    embedding_function = cached_embedding_function
+
+def sample_docs(k: int, seed: int = 42) -> list:
+    """对整个文件做一次流式水塘抽样，得到 k 篇文档用于拟合 PCA"""
+    rng = np.random.default_rng(seed)
+    reservoir, seen = [], 0
+    for chunk in read_chunks(['economics_name']):
+        for doc in build_docs(chunk):
+            if len(reservoir) < k:
+                reservoir.append(doc)
+            else:
+                j = rng.integers(0, seen + 1)
+                if j < k:
+                    reservoir[j] = doc
+            seen += 1
+    return reservoir
+
+logging.info(f"Streaming data from {file_path} in chunks of {args.chunk_size} rows")
 
 
 # 获取向量维度（使用一个样本文档）
@@ -52,118 +238,163 @@ sample_doc = "Sample Text"
 sample_embedding = embedding_function([sample_doc])[0]
 vector_dim = len(sample_embedding)
 
-# 构造Schema
-fields = [
-    FieldSchema(name="id", dtype=DataType.INT64, is_primary=True, auto_id=True),
-    FieldSchema(name="vector", dtype=DataType.FLOAT_VECTOR, dim=vector_dim), # BGE-m3 最重要
-    # FieldSchema(name="economics_id", dtype=DataType.VARCHAR, max_length=50),
-    FieldSchema(name="economics_name", dtype=DataType.VARCHAR,is_nullable=True, max_length=500),
-    FieldSchema(name="domain_name", dtype=DataType.VARCHAR, is_nullable=True, max_length=200),
-    # FieldSchema(name="vocabulary_id", dtype=DataType.VARCHAR, max_length=20),
-    # FieldSchema(name="economics_class_id", dtype=DataType.VARCHAR, max_length=20),
-    # FieldSchema(name="standard_concept", dtype=DataType.VARCHAR, max_length=200),
-    # FieldSchema(name="concept_code", dtype=DataType.VARCHAR, max_length=50),
-    # FieldSchema(name="valid_start_date", dtype=DataType.VARCHAR, max_length=10),
-    # FieldSchema(name="valid_end_date", dtype=DataType.VARCHAR, max_length=10),
-    # FieldSchema(name="full_name", dtype=DataType.VARCHAR, max_length=500), # FSN
-    # FieldSchema(name="synonyms", dtype=DataType.VARCHAR, max_length=1000), # 同义词
-    # FieldSchema(name="definitions", dtype=DataType.VARCHAR, max_length=1000), # 定义
-    FieldSchema(name="input_file", dtype=DataType.VARCHAR, max_length=500),
-]
-schema = CollectionSchema(fields, 
-                          "Economics Glossary", 
-                          enable_dynamic_field=True)
-
-# 
-# collection_name = "concepts_only_name"
-
-
-if not client.has_collection(collection_name):
-    client.create_collection(
-        collection_name=collection_name,
-        schema=schema,
-        # dimension=vector_dim
-    )
-    logging.info(f"Created new collection: {collection_name}")
-
-# # 在创建集合后添加索引
-index_params = client.prepare_index_params()
-index_params.add_index(
-    field_name="vector",  # 指定要为哪个字段创建索引，这里是向量字段
-    index_type="AUTOINDEX",  # 使用自动索引类型，Milvus会根据数据特性选择最佳索引
+# 降维：截断或在术语表抽样上拟合 PCA，之后所有嵌入（含示例查询）都经过同一投影
+projection = None
+existing_projection = store.get_metadata(collection_name).get("projection") if exists else None
+projection_path = args.projection_path or os.path.join(DEFAULT_DB_DIR, "projections", f"{collection_name}_pca.npz")
+if args.dim is not None and args.dim < vector_dim:
+    if existing_projection:
+        # 向已有集合追加数据时沿用建库时的投影，不重新拟合
+        if (existing_projection["method"], existing_projection["dim"]) != (args.reduction, args.dim):
+            raise SystemExit(f"Collection {collection_name} was built with {existing_projection['method']} to {existing_projection['dim']} dims")
+        reducer = DimensionReducer.from_metadata(existing_projection, projection_path)
+        projection = existing_projection
+    elif args.reduction == "pca":
+        sample_names = sample_docs(args.pca_samples)
+        reducer = DimensionReducer.fit_pca(embedding_function(sample_names), args.dim)
+        projection = reducer.metadata(vector_dim, reducer.save(projection_path))
+        logging.info(f"Fitted PCA projection {vector_dim} -> {args.dim} on {len(sample_names)} terms, saved to {projection_path}")
+    else:
+        reducer = DimensionReducer("truncate", args.dim)
+        projection = reducer.metadata(vector_dim)
+    full_embedding_function = embedding_function
+    embedding_function = lambda docs: reducer.transform(full_embedding_function(docs))
+    vector_dim = args.dim
+elif existing_projection:
+    raise SystemExit(f"Collection {collection_name} was built with {existing_projection['method']} to {existing_projection['dim']} dims; pass the same --dim/--reduction")
+
+# 构造集合定义
+spec = CollectionSpec(
+    dim=vector_dim, # BGE-m3 最重要
+    scalar_fields={
+        # "economics_id": 50,
+        "economics_name": 500,
+        "domain_name": 200,
+        # "full_name": 500, # FSN
+        # "synonyms": 1000, # 同义词
+        # "definitions": 1000, # 定义
+        "input_file": 500,
+        KEY_FIELD: HASH_LENGTH,  # 增量建库用的术语稳定键
+        HASH_FIELD: HASH_LENGTH,  # 增量建库用的内容哈希
+    },
+    description="Economics Glossary",
     metric_type="COSINE",  # 使用余弦相似度作为向量相似度度量方式
-    # params={"nlist": 1024}  # 索引参数：nlist表示聚类中心的数量，值越大检索精度越高但速度越慢
-)
-
-client.create_index(
-    collection_name=collection_name,
-    index_params=index_params
+    index_type="AUTOINDEX",  # 使用自动索引类型，Milvus会根据数据特性选择最佳索引
+    # index_params={"nlist": 1024}  # 索引参数：nlist表示聚类中心的数量，值越大检索精度越高但速度越慢
+    vector_dtype=args.vector_dtype,  # 向量存储精度，压缩存储时检索结果用全精度向量重排
+    sparse=args.sparse,  # 混合检索用的 BM25 稀疏向量字段
 )
 
-# 批量处理
-batch_size = 1024
-
-for start_idx in tqdm(range(0, len(df), batch_size), desc="Processing batches"):
-    end_idx = min(start_idx + batch_size, len(df))
-    batch_df = df.iloc[start_idx:end_idx]
-
-    # 准备文档
-    # docs = [f"Term: {row['concept_name']}; Synonyms: {row['Synonyms']}" for _, row in batch_df.iterrows()]
-    docs = []
-    for _, row in batch_df.iterrows():
-        doc_parts = [row['economics_name']]
-
-        # if row['Full Name'] != "NA" and row['Full Name'] != row['concept_name']:
-        #     doc_parts.append(",Full Name: " + row['Full Name'])
-
-        # if row['Synonyms'] != "NA" and row['Synonyms'] != row['concept_name']:
-        #     doc_parts.append(", Synonyms: " + row['Synonyms'])
-
-        # if row['Definitions'] != "NA" and row['Definitions'] not in [row['concept_name'], row.get('Full Name', '')]:
-        #     doc_parts.append(", Definitions: " + row['Definitions'])
-
-        docs.append(" ".join(doc_parts))
-
-    # 生成嵌入
-    try:
-        embeddings = embedding_function(docs)
-        logging.info(f"Generated embeddings for batch {start_idx // batch_size + 1}")
-    except Exception as e:
-        logging.error(f"Error generating embeddings for batch {start_idx // batch_size + 1}: {e}")
-        continue
-
-    # 准备数据
-    data = [
+# BM25 需要全量语料的文档频率，建库时先流式扫描一遍术语名拟合，再在流水线中逐批编码；
+# 增量更新沿用建库时的编码器，已有行的权重保持一致（语料变化较大时用 --rebuild 重新拟合）
+sparse_encoder = None
+if args.sparse:
+    sparse_encoder_path = args.sparse_encoder or os.path.join(DEFAULT_DB_DIR, "sparse", f"{collection_name}_bm25.json")
+    if exists and os.path.exists(sparse_encoder_path):
+        sparse_encoder = BM25SparseEncoder.load(sparse_encoder_path)
+        logging.info(f"Reusing BM25 encoder from {sparse_encoder_path}")
+    else:
+        sparse_encoder = BM25SparseEncoder().fit(
+            doc for chunk in read_chunks(['economics_name']) for doc in build_docs(chunk)
+        )
+        sparse_encoder.save(sparse_encoder_path)
+        logging.info(f"Saved BM25 encoder ({len(sparse_encoder.vocabulary)} terms) to {sparse_encoder_path}")
+
+writer = None
+if not exists:
+    # 查询端（StdService）按集合元数据中的投影记录对查询向量做同样的降维；
+    # reindex 标记集合的每行都带有术语键与内容哈希，可以增量更新
+    metadata = {"reindex": {"model": MODEL_NAME, "model_id": embedding_model_id}}
+    if projection:
+        metadata["projection"] = projection
+    if args.export_dir:
+        # 产物带上集合定义、元数据以及 PCA 投影 / BM25 编码器文件，导入端不需要模型与原始 CSV
+        files = {}
+        if projection and projection["method"] == "pca":
+            files["projection"] = projection_path
+        if sparse_encoder is not None:
+            files["sparse_encoder"] = sparse_encoder_path
+        writer = BulkArtifactWriter(args.export_dir, spec, metadata, files, args.partition_rows)
+        logging.info(f"Exporting bulk artifact for {collection_name} to {args.export_dir}")
+    else:
+        store.create_collection(collection_name, spec)
+        store.set_metadata(collection_name, metadata)
+        logging.info(f"Created new collection: {collection_name}")
+
+# 流水线：分块读取 -> 构造文档并嵌入 -> 写入，三个阶段并发执行，阶段之间为有界队列；
+# 读取阶段只放行新增与变更的术语（术语表中重复的术语只取第一次出现）
+pending = diff.to_embed
+
+def source():
+    for chunk in keyed_chunks():
+        selected = []
+        for key in chunk[KEY_FIELD]:
+            selected.append(key in pending)
+            pending.discard(key)
+        chunk = chunk[selected]
+        if len(chunk):
+            yield {"size": len(chunk), "chunk": chunk}
+
+def embed_stage(batch):
+    chunk = batch["chunk"]
+    docs = build_docs(chunk)
+    embeddings = embedding_function(docs)
+    rows = [
         {
-            # "id": idx + start_idx,
-            "vector": embeddings[idx],
-            # "concept_id": str(row['concept_id']),
-            "economics_name": str(row['economics_name']),
-            "domain_name": str(row['domain_name']),
-            # "vocabulary_id": str(row['vocabulary_id']),
-            # "concept_class_id": str(row['concept_class_id']),
-            # "standard_concept": str(row['standard_concept']),
-            # "concept_code": str(row['concept_code']),
-            # "valid_start_date": str(row['valid_start_date']),
-            # "valid_end_date": str(row['valid_end_date']),
-            # # "invalid_reason": str(row['invalid_reason']),
-            # "full_name": str(row['Full Name']),
-            # "synonyms": str(row['Synonyms']),
-            # "definitions": str(row['Definitions']),
-            "input_file": file_path
-        } for idx, (_, row) in enumerate(batch_df.iterrows())
-    ]
-
-    # 插入数据 - 1024个向量条目，即1024个医疗术语（标准概念）
-    try:
-        res = client.insert(
-            collection_name=collection_name,
-            data=data
+            "vector": vector,
+            "economics_name": name,
+            "domain_name": domain,
+            "input_file": file_path,
+            KEY_FIELD: key,
+            HASH_FIELD: digest
+        }
+        for vector, name, domain, key, digest in zip(
+            embeddings, chunk['economics_name'].tolist(), chunk['domain_name'].tolist(),
+            chunk[KEY_FIELD].tolist(), chunk[HASH_FIELD].tolist()
         )
-        logging.info(f"Inserted batch {start_idx // batch_size + 1}, result: {res}")
-    except Exception as e:
-        logging.error(f"Error inserting batch {start_idx // batch_size + 1}: {e}")
-
+    ]
+    if sparse_encoder is not None:
+        for row, sparse_vector in zip(rows, sparse_encoder.encode_documents(docs)):
+            row["sparse_vector"] = sparse_vector
+    return {"size": batch["size"], "rows": rows}
+
+progress = tqdm(desc="Exported rows" if writer is not None else "Inserted rows", unit="rows")
+
+def insert_stage(batch):
+    if writer is not None:
+        res = writer.write(batch["rows"])
+    else:
+        res = store.insert(collection_name, batch["rows"])
+    progress.update(res)
+    return batch
+
+stage_stats, elapsed = run_pipeline(
+    source(),
+    [("embed", embed_stage, 1), ("insert", insert_stage, args.insert_workers)],
+    queue_size=args.queue_size
+)
+progress.close()
+log_stage_stats(stage_stats, elapsed)
+if cached_embedding_function is not None:
+    logging.info(f"Embedding cache: {json.dumps(cached_embedding_function.stats())}")
+if bucketed_embedding_function is not None:
+    logging.info(f"Length-bucketed batching: {json.dumps(bucketed_embedding_function.stats())}")
+
+if writer is not None:
+    manifest = writer.close()
+    logging.info(f"Exported {manifest['rows']} rows in {len(manifest['partitions'])} partitions to {args.export_dir}")
+    if sharded_embedding_function is not None:
+        sharded_embedding_function.close()
+    raise SystemExit(0)
+
+# 新行写入之后再删除旧行，检索端不会短暂查不到变更的术语；
+# 写入有失败时保留旧行，下次运行会按哈希把它们识别为重复或变更行再清理
+if any(stage.errors for stage in stage_stats):
+    logging.warning(f"Some batches failed; keeping {len(diff.stale_ids)} stale rows until the next run")
+elif diff.stale_ids:
+    logging.info(f"Deleted {store.delete(collection_name, diff.stale_ids)} stale rows")
+
+store.flush(collection_name)
 logging.info("Insert process completed.")
 
 # 示例查询
@@ -173,25 +404,17 @@ query_embeddings = embedding_function([query])
 
 
 # 搜索余弦相似度最高的
-search_result = client.search(
-    collection_name=collection_name,
-    data=[query_embeddings[0].tolist()],
+store.load(collection_name)
+search_result = store.search(
+    collection_name,
+    [query_embeddings[0].tolist()],
     limit=5,
     output_fields=["economics_name", 
                 #    "synonyms", 
                    "domain_name", 
                    ]
 )
-logging.info(f"Search result for 'A-Shares': {search_result}")
+logging.info(f"Search result for '{query}': {search_result}")
 
-# 查询所有匹配的实体
-query_result = client.query(
-    collection_name=collection_name,
-    filter="concept_name == 'Dyspnea'",
-    output_fields=["economics_name", 
-                #    "synonyms", 
-                #    "concept_class_id", 
-                   ],
-    limit=5
-)
-logging.info(f"Query result for economics_name == 'A-B Split': {query_result}")
+if sharded_embedding_function is not None:
+    sharded_embedding_function.close()
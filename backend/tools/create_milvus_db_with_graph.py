@@ -1,134 +1,181 @@
 from pymilvus import model
-from pymilvus import MilvusClient
 import pandas as pd
 from tqdm import tqdm
 import logging
+import argparse
 from dotenv import load_dotenv
 load_dotenv()
 import torch    
-from pymilvus import MilvusClient, DataType, FieldSchema, CollectionSchema
-from neo4j import GraphDatabase
 import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from utils.vector_store import CollectionSpec, create_vector_store
+from utils.length_batching import LengthBucketedEmbeddingFunction, tokenizer_lengths
+from utils.sharded_embedding import ShardedEmbeddingFunction
+from utils.embedding_artifacts import EmbeddingArtifactStore, CachedEmbeddingFunction
+from utils.bulk_artifacts import BulkArtifactWriter
+from utils.synonym_provider import Neo4jSynonymProvider, OfflineSynonymProvider
 
 # 设置日志
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
-# 初始化 Neo4j 连接
-neo4j_uri = os.getenv("NEO4J_URI", "bolt://localhost:7687")
-neo4j_user = os.getenv("NEO4J_USER", "neo4j")
-neo4j_password = os.getenv("NEO4J_PASSWORD", "neo4j")  # 默认值，实际应该从.env读取
-neo4j_driver = GraphDatabase.driver(neo4j_uri, auth=(neo4j_user, neo4j_password))
-
-# 测试Neo4j连接和查询
-try:
-    with neo4j_driver.session() as session:
-        # 测试基本连接
-        result = session.run("MATCH (n) RETURN count(n) as count")
-        count = result.single()["count"]
-        logging.info(f"Successfully connected to Neo4j. Total nodes in database: {count}")
-        
-        # 测试ObjectConcept节点
-        result = session.run("MATCH (c:ObjectConcept) RETURN count(c) as count")
-        concept_count = result.single()["count"]
-        logging.info(f"Total ObjectConcept nodes: {concept_count}")
-        
-        # 检查ObjectConcept节点的属性
-        result = session.run("""
-            MATCH (c:ObjectConcept)
-            RETURN keys(c) as properties
-            LIMIT 1
-        """)
-        properties = result.single()["properties"]
-        logging.info(f"ObjectConcept node properties: {properties}")
-        
-        # 测试Description节点
-        result = session.run("MATCH (d:Description) RETURN count(d) as count")
-        desc_count = result.single()["count"]
-        logging.info(f"Total Description nodes: {desc_count}")
-        
-        # 测试HAS_DESCRIPTION关系
-        result = session.run("MATCH ()-[r:HAS_DESCRIPTION]->() RETURN count(r) as count")
-        rel_count = result.single()["count"]
-        logging.info(f"Total HAS_DESCRIPTION relationships: {rel_count}")
+parser = argparse.ArgumentParser(description="Build the SNOMED concept collection with Neo4j synonyms")
+parser.add_argument("--backend", default="milvus-lite", help="Vector store backend: milvus / milvus-lite / numpy")
+parser.add_argument("--uri", default=None, help="Milvus URI, Milvus Lite file or numpy store directory (default: $VECTOR_STORE_URI or the backend's location under backend/db)")
+parser.add_argument("--collection", default="concepts_with_synonym", help="Collection name")
+parser.add_argument("--vector-dtype", default="float32", choices=["float32", "float16", "int8", "binary"], help="Vector storage precision (binary is only supported by the numpy store)")
+parser.add_argument("--embedding-cache", default="backend/db/embedding_artifacts", help="On-disk embedding artifact cache shared by ingestion runs")
+parser.add_argument("--embedding-cache-dtype", default="float32", choices=["float32", "float16"], help="Storage precision for newly created cache entries")
+parser.add_argument("--no-embedding-cache", action="store_true", help="Always call the embedding model")
+parser.add_argument("--length-buckets", action="store_true", help="Sort each batch by token length and embed it in token-budgeted batches")
+parser.add_argument("--max-batch-tokens", type=int, default=16384, help="Padded-token budget per embedding batch with --length-buckets")
+parser.add_argument("--max-batch-size", type=int, default=256, help="Max documents per embedding batch with --length-buckets")
+parser.add_argument("--embed-workers", type=int, default=1, help="Embedding worker processes (CPU); each batch is split into this many row ranges")
+parser.add_argument("--threads-per-worker", type=int, default=None, help="Threads per embedding worker (default: CPU cores / workers)")
+parser.add_argument("--pin-cores", action="store_true", help="Pin each embedding worker to its own set of CPU cores (Linux)")
+parser.add_argument("--input", default="backend/data/SNOMED_3.csv", help="SNOMED concept CSV")
+parser.add_argument("--synonyms", default="neo4j", choices=["neo4j", "offline"],
+                    help="Where concept descriptions come from: the Neo4j graph, or the description file build.cypher loads")
+parser.add_argument("--descriptions", default="backend/data/descrip_new.csv",
+                    help="descrip_new.csv or an RF2 sct2_Description_*.txt file for --synonyms offline")
+parser.add_argument("--export-dir", default=None, help="Write a bulk-import artifact (columnar .npy files) instead of inserting; load it with tools/bulk_load.py")
+parser.add_argument("--partition-rows", type=int, default=100000, help="Rows per artifact partition with --export-dir")
+args = parser.parse_args()
+
+# 文件路径
+file_path = args.input
+
+# 多进程分片：每批文档按行切成 N 段，由 N 个各自加载模型的进程并行嵌入后按顺序拼回；
+# 工作进程以 fork 方式启动，必须在打开 Neo4j 连接与向量存储（Milvus gRPC 通道）之前创建
+sharded_embedding_function = None
+if args.embed_workers > 1:
+    sharded_embedding_function = ShardedEmbeddingFunction(
+        {
+            "provider": "sentence-transformers",
+            "model_name": 'BAAI/bge-m3',
+            "length_buckets": args.length_buckets,
+            "max_batch_tokens": args.max_batch_tokens,
+            "max_batch_size": args.max_batch_size,
+        },
+        workers=args.embed_workers,
+        threads_per_worker=args.threads_per_worker,
+        pin_cores=args.pin_cores
+    )
+
+# 同义词来源：Neo4j 图数据库（每批一次 UNWIND 查询），或直接读取导入图数据库的描述文件，无需图服务
+if args.synonyms == "neo4j":
+    from neo4j import GraphDatabase
+
+    # 初始化 Neo4j 连接
+    neo4j_uri = os.getenv("NEO4J_URI", "bolt://localhost:7687")
+    neo4j_user = os.getenv("NEO4J_USER", "neo4j")
+    neo4j_password = os.getenv("NEO4J_PASSWORD", "neo4j")  # 默认值，实际应该从.env读取
+    neo4j_driver = GraphDatabase.driver(neo4j_uri, auth=(neo4j_user, neo4j_password))
+
+    # 测试Neo4j连接和查询
+    try:
+        with neo4j_driver.session() as session:
+            # 测试基本连接
+            result = session.run("MATCH (n) RETURN count(n) as count")
+            count = result.single()["count"]
+            logging.info(f"Successfully connected to Neo4j. Total nodes in database: {count}")
         
-        # 测试一个具体的概念
-        test_concept = "267036007"  # Dyspnea
-        result = session.run("""
-            MATCH (c:ObjectConcept {id: $id})-[:HAS_DESCRIPTION]->(d:Description)
-            RETURN c.id as concept_id, c.FSN as fsn, d.term as term
-        """, id=test_concept)
-        test_results = list(result)
-        logging.info(f"Test query results for concept {test_concept}:")
-        for record in test_results:
-            logging.info(f"  Concept: {record['concept_id']}, FSN: {record['fsn']}, Term: {record['term']}")
+            # 测试ObjectConcept节点
+            result = session.run("MATCH (c:ObjectConcept) RETURN count(c) as count")
+            concept_count = result.single()["count"]
+            logging.info(f"Total ObjectConcept nodes: {concept_count}")
         
-except Exception as e:
-    logging.error(f"Failed to connect to Neo4j: {e}")
-    raise
-
-def get_concept_descriptions(concept_id, concept_code):
-    with neo4j_driver.session() as session:
-        # 首先检查概念是否存在
-        concept_check = session.run("""
-            MATCH (c:ObjectConcept {id: $concept_code})
-            RETURN c.id as id, c.FSN as fsn
-        """, concept_code=concept_code)
-        concept = concept_check.single()
+            # 检查ObjectConcept节点的属性
+            result = session.run("""
+                MATCH (c:ObjectConcept)
+                RETURN keys(c) as properties
+                LIMIT 1
+            """)
+            properties = result.single()["properties"]
+            logging.info(f"ObjectConcept node properties: {properties}")
         
-        if not concept:
-            logging.warning(f"Concept {concept_id} (code: {concept_code}) not found in Neo4j")
-            return []
-            
-        logging.info(f"Found concept: {concept['id']} with FSN: {concept['fsn']}")
+            # 测试Description节点
+            result = session.run("MATCH (d:Description) RETURN count(d) as count")
+            desc_count = result.single()["count"]
+            logging.info(f"Total Description nodes: {desc_count}")
         
-        # 修改查询以获取所有描述
-        result = session.run("""
-            MATCH (c:ObjectConcept {id: $concept_code})-[:HAS_DESCRIPTION]->(d:Description)
-            RETURN d.term as term, d.descriptionType as type, d.active as active
-            ORDER BY d.descriptionType
-        """, concept_code=concept_code)
+            # 测试HAS_DESCRIPTION关系
+            result = session.run("MATCH ()-[r:HAS_DESCRIPTION]->() RETURN count(r) as count")
+            rel_count = result.single()["count"]
+            logging.info(f"Total HAS_DESCRIPTION relationships: {rel_count}")
         
-        # 获取所有结果
-        descriptions = [(record["term"], record["type"], record["active"]) for record in result]
+            # 测试一个具体的概念
+            test_concept = "267036007"  # Dyspnea
+            result = session.run("""
+                MATCH (c:ObjectConcept {id: $id})-[:HAS_DESCRIPTION]->(d:Description)
+                RETURN c.id as concept_id, c.FSN as fsn, d.term as term
+            """, id=test_concept)
+            test_results = list(result)
+            logging.info(f"Test query results for concept {test_concept}:")
+            for record in test_results:
+                logging.info(f"  Concept: {record['concept_id']}, FSN: {record['fsn']}, Term: {record['term']}")
         
-        # 添加日志
-        if descriptions:
-            logging.info(f"Found {len(descriptions)} descriptions for concept {concept['id']}:")
-            for term, type_, active in descriptions:
-                logging.info(f"  - Term: {term}, Type: {type_}, Active: {active}")
-        else:
-            logging.warning(f"No descriptions found for concept {concept['id']}")
-            
-        # 只返回术语文本
-        return [desc[0] for desc in descriptions]
+    except Exception as e:
+        logging.error(f"Failed to connect to Neo4j: {e}")
+        raise
+
+    synonym_provider = Neo4jSynonymProvider(neo4j_driver)
+else:
+    # 只读取输入 CSV 中出现的概念的描述
+    concept_codes = pd.read_csv(file_path, dtype=str, usecols=["concept_code"])["concept_code"].dropna()
+    synonym_provider = OfflineSynonymProvider(args.descriptions, concept_codes)
 
 # 初始化 OpenAI 嵌入函数
-embedding_function = model.dense.SentenceTransformerEmbeddingFunction(
-            # model_name='nvidia/NV-Embed-v2', 
-            # model_name='dunzhang/stella_en_1.5B_v5',
-            # model_name='all-mpnet-base-v2',
-            # model_name='intfloat/multilingual-e5-large-instruct',
-            # model_name='Alibaba-NLP/gte-Qwen2-1.5B-instruct',
-            model_name='BAAI/bge-m3',
-            # model_name='jinaai/jina-embeddings-v3',
-            device='cuda:0' if torch.cuda.is_available() else 'cpu',
-            trust_remote_code=True
-        )
+if sharded_embedding_function is not None:
+    embedding_function = sharded_embedding_function
+else:
+    embedding_function = model.dense.SentenceTransformerEmbeddingFunction(
+                # model_name='nvidia/NV-Embed-v2', 
+                # model_name='dunzhang/stella_en_1.5B_v5',
+                # model_name='all-mpnet-base-v2',
+                # model_name='intfloat/multilingual-e5-large-instruct',
+                # model_name='Alibaba-NLP/gte-Qwen2-1.5B-instruct',
+                model_name='BAAI/bge-m3',
+                # model_name='jinaai/jina-embeddings-v3',
+                device='cuda:0' if torch.cuda.is_available() else 'cpu',
+                trust_remote_code=True
+            )
 # embedding_function = model.dense.OpenAIEmbeddingFunction(model_name='text-embedding-3-large')
 
-# 文件路径
-file_path = "backend/data/SNOMED_3.csv"
-db_path = "backend/db/snomed_bge_m3.db"
+# 按长度分桶：概念名拼接同义词后的文档长短差异很大，按 token 预算切批可以少算大量补齐
+# （多进程分片时在各工作进程内分桶）
+bucketed_embedding_function = None
+if args.length_buckets and sharded_embedding_function is None:
+    model_batch_size = embedding_function.batch_size
+    embedding_function.batch_size = args.max_batch_size
+    bucketed_embedding_function = LengthBucketedEmbeddingFunction(
+        embedding_function,
+        tokenizer_lengths(embedding_function.model.tokenizer, embedding_function.model.max_seq_length),
+        max_tokens=args.max_batch_tokens,
+        max_batch_size=args.max_batch_size,
+        baseline_batch_size=model_batch_size
+    )
+    embedding_function = bucketed_embedding_function
+
+# 按 (模型, 文档文本哈希) 复用之前运行算过的向量，与 create_milvus_db.py 共用同一个目录
+cached_embedding_function = None
+if not args.no_embedding_cache:
+    cached_embedding_function = CachedEmbeddingFunction(
+        embedding_function,
+        EmbeddingArtifactStore(args.embedding_cache, "sentence-transformers:BAAI/bge-m3", args.embedding_cache_dtype)
+    )
+    embedding_function = cached_embedding_function
 
-# 连接到 Milvus
-client = MilvusClient(db_path)
+# 连接到向量存储（默认 Milvus Lite 本地文件）；导出批量导入产物时不连接
+store = None if args.export_dir else create_vector_store(args.backend, args.uri)
 
-collection_name = "concepts_with_synonym"
+collection_name = args.collection
 
 # 如果集合存在，先删除它
-if client.has_collection(collection_name):
+if store is not None and store.has_collection(collection_name):
     logging.info(f"Dropping existing collection: {collection_name}")
-    client.drop_collection(collection_name)
+    store.drop_collection(collection_name)
 
 # 加载数据
 logging.info("Loading data from CSV")
@@ -142,50 +189,40 @@ sample_doc = "Sample Text"
 sample_embedding = embedding_function([sample_doc])[0]
 vector_dim = len(sample_embedding)
 
-# 构造Schema
-fields = [
-    FieldSchema(name="id", dtype=DataType.INT64, is_primary=True, auto_id=True),
-    FieldSchema(name="vector", dtype=DataType.FLOAT_VECTOR, dim=vector_dim), # BGE-m3 最重要
-    FieldSchema(name="concept_id", dtype=DataType.VARCHAR, max_length=50),
-    FieldSchema(name="concept_name", dtype=DataType.VARCHAR, max_length=200),
-    FieldSchema(name="domain_id", dtype=DataType.VARCHAR, max_length=20),
-    FieldSchema(name="vocabulary_id", dtype=DataType.VARCHAR, max_length=20),
-    FieldSchema(name="concept_class_id", dtype=DataType.VARCHAR, max_length=20),
-    FieldSchema(name="standard_concept", dtype=DataType.VARCHAR, max_length=1),
-    FieldSchema(name="concept_code", dtype=DataType.VARCHAR, max_length=50),
-    FieldSchema(name="valid_start_date", dtype=DataType.VARCHAR, max_length=10),
-    FieldSchema(name="valid_end_date", dtype=DataType.VARCHAR, max_length=10),
-    # FieldSchema(name="full_name", dtype=DataType.VARCHAR, max_length=500), # FSN
-    FieldSchema(name="synonyms", dtype=DataType.VARCHAR, max_length=1000),
-    # FieldSchema(name="definitions", dtype=DataType.VARCHAR, max_length=1000), # 定义
-    FieldSchema(name="input_file", dtype=DataType.VARCHAR, max_length=500),
-]
-schema = CollectionSchema(fields, 
-                          "SNOMED-CT Concepts", 
-                          enable_dynamic_field=True)
-
-# 如果集合不存在，创建集合
-if not client.has_collection(collection_name):
-    client.create_collection(
-        collection_name=collection_name,
-        schema=schema,
-        # dimension=vector_dim
-    )
-    logging.info(f"Created new collection: {collection_name}")
-
-# # 在创建集合后添加索引
-index_params = client.prepare_index_params()
-index_params.add_index(
-    field_name="vector",  # 指定要为哪个字段创建索引，这里是向量字段
-    index_type="AUTOINDEX",  # 使用自动索引类型，Milvus会根据数据特性选择最佳索引
+# 构造集合定义
+spec = CollectionSpec(
+    dim=vector_dim, # BGE-m3 最重要
+    scalar_fields={
+        "concept_id": 50,
+        "concept_name": 200,
+        "domain_id": 20,
+        "vocabulary_id": 20,
+        "concept_class_id": 20,
+        "standard_concept": 1,
+        "concept_code": 50,
+        "valid_start_date": 10,
+        "valid_end_date": 10,
+        # "full_name": 500, # FSN
+        "synonyms": 1000,
+        # "definitions": 1000, # 定义
+        "input_file": 500,
+    },
+    description="SNOMED-CT Concepts",
     metric_type="COSINE",  # 使用余弦相似度作为向量相似度度量方式
-    params={"nlist": 1024}  # 索引参数：nlist表示聚类中心的数量，值越大检索精度越高但速度越慢
+    index_type="AUTOINDEX",  # 使用自动索引类型，Milvus会根据数据特性选择最佳索引
+    index_params={"nlist": 1024},  # 索引参数：nlist表示聚类中心的数量，值越大检索精度越高但速度越慢
+    vector_dtype=args.vector_dtype,  # 向量存储精度，压缩存储时检索结果用全精度向量重排
 )
 
-client.create_index(
-    collection_name=collection_name,
-    index_params=index_params
-)
+# 导出模式把每批写入列式产物（向量 + SNOMED 各列），可用 tools/bulk_load.py 导入多个节点而不必重新嵌入
+writer = None
+if args.export_dir:
+    writer = BulkArtifactWriter(args.export_dir, spec, partition_rows=args.partition_rows)
+    logging.info(f"Exporting bulk artifact for {collection_name} to {args.export_dir}")
+# 如果集合不存在，创建集合
+elif not store.has_collection(collection_name):
+    store.create_collection(collection_name, spec)
+    logging.info(f"Created new collection: {collection_name}")
 
 # 批量处理
 batch_size = 1024
@@ -194,23 +231,15 @@ for start_idx in tqdm(range(0, len(df), batch_size), desc="Processing batches"):
     end_idx = min(start_idx + batch_size, len(df))
     batch_df = df.iloc[start_idx:end_idx]
 
-    # 准备文档
-    docs = []
-    for _, row in batch_df.iterrows():
-        concept_id = row['concept_id']
-        concept_code = row['concept_code']
-        concept_name = row['concept_name']
-        
-        # 从Neo4j获取同义词
-        synonyms = get_concept_descriptions(concept_id, concept_code)
-        synonyms_text = " ".join(synonyms) if synonyms else ""
-        
-        # 组合概念名称和同义词 - 这就好比是图数据库资源和普通文本资源的组合检索呀！！！！
-        doc_parts = [concept_name]
-        if synonyms_text:
-            doc_parts.append(synonyms_text)
-            
-        docs.append(" ".join(doc_parts))
+    # 一次取整批概念的同义词，文档与写入的行共用
+    synonyms = synonym_provider.get_many(batch_df['concept_code'].tolist())
+    synonyms_texts = [" ".join(synonyms[code]) for code in batch_df['concept_code']]
+
+    # 组合概念名称和同义词 - 这就好比是图数据库资源和普通文本资源的组合检索呀！！！！
+    docs = [
+        f"{concept_name} {synonyms_text}" if synonyms_text else concept_name
+        for concept_name, synonyms_text in zip(batch_df['concept_name'], synonyms_texts)
+    ]
 
     # 生成嵌入
     try:
@@ -221,42 +250,47 @@ for start_idx in tqdm(range(0, len(df), batch_size), desc="Processing batches"):
         continue
 
     # 准备数据
-    data = []
-    for idx, (_, row) in enumerate(batch_df.iterrows()):
-        concept_id = row['concept_id']
-        concept_code = row['concept_code']
-        synonyms = get_concept_descriptions(concept_id, concept_code)
-        synonyms_text = " ".join(synonyms) if synonyms else ""
-        
-        data.append({
-            "vector": embeddings[idx],
-            "concept_id": str(row['concept_id']),
-            "concept_name": str(row['concept_name']),
-            "domain_id": str(row['domain_id']),
-            "vocabulary_id": str(row['vocabulary_id']),
-            "concept_class_id": str(row['concept_class_id']),
-            "standard_concept": str(row['standard_concept']),
-            "concept_code": str(row['concept_code']),
-            "valid_start_date": str(row['valid_start_date']),
-            "valid_end_date": str(row['valid_end_date']),
+    columns = ["concept_id", "concept_name", "domain_id", "vocabulary_id", "concept_class_id",
+               "standard_concept", "concept_code", "valid_start_date", "valid_end_date"]
+    data = [
+        {
+            "vector": vector,
+            **dict(zip(columns, values)),
             "synonyms": synonyms_text,
             "input_file": file_path
-        })
+        }
+        for vector, values, synonyms_text in zip(
+            embeddings, batch_df[columns].itertuples(index=False, name=None), synonyms_texts
+        )
+    ]
 
     # 插入数据 - 1024个向量条目，即1024个医疗术语（标准概念）
     try:
-        res = client.insert(
-            collection_name=collection_name,
-            data=data
-        )
-        logging.info(f"Inserted batch {start_idx // batch_size + 1}, result: {res}")
+        res = writer.write(data) if writer is not None else store.insert(collection_name, data)
+        logging.info(f"Inserted batch {start_idx // batch_size + 1}, rows: {res}")
     except Exception as e:
         logging.error(f"Error inserting batch {start_idx // batch_size + 1}: {e}")
 
-logging.info("Insert process completed.")
+if writer is not None:
+    manifest = writer.close()
+    logging.info(f"Exported {manifest['rows']} rows in {len(manifest['partitions'])} partitions to {args.export_dir}")
+else:
+    store.flush(collection_name)
+    logging.info("Insert process completed.")
+if cached_embedding_function is not None:
+    logging.info(f"Embedding cache: {cached_embedding_function.stats()}")
+if bucketed_embedding_function is not None:
+    logging.info(f"Length-bucketed batching: {bucketed_embedding_function.stats()}")
+
+logging.info(f"Synonym lookups: {synonym_provider.stats()}")
 
-# 关闭Neo4j连接
-neo4j_driver.close()
+# 关闭同义词来源（Neo4j 连接）
+synonym_provider.close()
+
+if writer is not None:
+    if sharded_embedding_function is not None:
+        sharded_embedding_function.close()
+    raise SystemExit(0)
 
 # 示例查询
 # query = "somatic hallucination"
@@ -265,19 +299,14 @@ query_embeddings = embedding_function([query])
 
 
 # 搜索余弦相似度最高的
-search_result = client.search(
-    collection_name=collection_name,
-    data=[query_embeddings[0].tolist()],
+store.load(collection_name)
+search_result = store.search(
+    collection_name,
+    [query_embeddings[0].tolist()],
     limit=5,
     output_fields=["concept_name", "synonyms", "concept_class_id"]
 )
 logging.info(f"Search result for '{query}': {search_result}")
 
-# 查询所有匹配的实体
-query_result = client.query(
-    collection_name=collection_name,
-    filter="concept_name == 'Dyspnea'",
-    output_fields=["concept_name", "synonyms", "concept_class_id"],
-    limit=5
-)
-logging.info(f"Query result for concept_name == 'Dyspnea': {query_result}")
+if sharded_embedding_function is not None:
+    sharded_embedding_function.close()
@@ -0,0 +1,91 @@
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from utils.dim_reduction import DimensionReducer
+from utils.vector_store import DEFAULT_NUMPY_DIR
+
+# 设置日志
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# 对比截断与 PCA 降到不同维度后的 recall@k、内存与检索耗时
+# 输入为 create_milvus_db.py --backend numpy 建好的全维度 float32 集合，
+# 以集合内随机抽样的术语向量作为查询，真值为全维度精确检索（排除查询自身）；
+# PCA 在与查询不相交的术语样本上拟合，与建库时的做法一致
+parser = argparse.ArgumentParser(description="Report recall@k vs. dimension for truncated and PCA-reduced embeddings")
+parser.add_argument("--uri", default=DEFAULT_NUMPY_DIR, help="Numpy store directory holding the full-dimension collection")
+parser.add_argument("--collection", default="economics_only_name", help="Collection name")
+parser.add_argument("--dims", type=int, nargs="+", default=[64, 128, 256, 384, 512, 768])
+parser.add_argument("--methods", nargs="+", default=["truncate", "pca"], choices=["truncate", "pca"])
+parser.add_argument("--queries", type=int, default=500, help="Number of sampled query vectors")
+parser.add_argument("--pca-samples", type=int, default=4096, help="Terms used to fit the PCA projection")
+parser.add_argument("--k", type=int, nargs="+", default=[1, 5, 10], help="Recall cut-offs")
+parser.add_argument("--seed", type=int, default=42)
+parser.add_argument("--output", default=None, help="Write the JSON report to this file")
+args = parser.parse_args()
+
+vectors = np.asarray(np.load(os.path.join(args.uri, args.collection, "vectors.npy"), mmap_mode="r"), dtype=np.float32)
+n, full_dim = vectors.shape
+logging.info(f"Loaded {n} x {full_dim} vectors from {args.collection}")
+
+rng = np.random.default_rng(args.seed)
+permutation = rng.permutation(n)
+query_ids = permutation[:min(args.queries, n)]
+fit_ids = permutation[len(query_ids):len(query_ids) + args.pca_samples]
+max_k = max(args.k)
+
+def neighbours(matrix: np.ndarray, queries: np.ndarray):
+    """精确检索并去掉查询自身，返回 (近邻下标, 每条查询耗时毫秒)"""
+    start = time.perf_counter()
+    scores = queries @ matrix.T
+    scores[np.arange(len(query_ids)), query_ids] = -np.inf
+    top = np.argpartition(-scores, max_k - 1, axis=1)[:, :max_k]
+    order = np.argsort(-np.take_along_axis(scores, top, axis=1), axis=1)
+    elapsed = time.perf_counter() - start
+    return np.take_along_axis(top, order, axis=1), elapsed / len(query_ids) * 1000
+
+ground_truth, full_ms = neighbours(vectors, vectors[query_ids])
+report = {
+    "collection": args.collection,
+    "vectors": int(n),
+    "full_dim": int(full_dim),
+    "queries": len(query_ids),
+    "modes": [{
+        "method": "full", "dim": int(full_dim), "bytes_per_vector": full_dim * 4,
+        "search_ms_per_query": full_ms, **{f"recall@{k}": 1.0 for k in args.k}
+    }],
+}
+
+for method in args.methods:
+    for dim in sorted(d for d in args.dims if d < full_dim):
+        if method == "pca":
+            reducer = DimensionReducer.fit_pca(vectors[fit_ids], dim)
+        else:
+            reducer = DimensionReducer("truncate", dim)
+        reduced = reducer.transform(vectors)
+        found, ms = neighbours(reduced, reduced[query_ids])
+        mode = {"method": method, "dim": dim, "bytes_per_vector": dim * 4, "search_ms_per_query": ms}
+        for k in args.k:
+            mode[f"recall@{k}"] = float(np.mean([
+                len(set(approx[:k]) & set(exact[:k])) / k
+                for approx, exact in zip(found, ground_truth)
+            ]))
+        report["modes"].append(mode)
+        logging.info(json.dumps(mode))
+
+header = f"{'method':<9} {'dim':>5} {'B/vec':>6} " + " ".join(f"{'R@' + str(k):>7}" for k in args.k) + f" {'ms/q':>7}"
+print(header)
+for mode in report["modes"]:
+    recalls = " ".join(f"{mode[f'recall@{k}']:>7.3f}" for k in args.k)
+    print(f"{mode['method']:<9} {mode['dim']:>5} {mode['bytes_per_vector']:>6} {recalls} {mode['search_ms_per_query']:>7.3f}")
+
+if args.output:
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    logging.info(f"Report written to {args.output}")
@@ -0,0 +1,55 @@
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from utils.embedding_artifacts import artifact_stats, collect_garbage
+
+# 设置日志
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# 管理建库脚本共享的向量目录（--embedding-cache）：
+# stats 列出每个模型的条目数与磁盘占用，gc 删除不再使用的模型
+
+def print_stats(entries):
+    print(f"{'model':<48} {'dtype':<8} {'dim':>5} {'entries':>9} {'MB':>9} last used")
+    for entry in entries:
+        last_used = time.strftime("%Y-%m-%d %H:%M", time.localtime(entry["last_used"])) if entry["last_used"] else "-"
+        print(f"{entry['model']:<48} {entry['dtype']:<8} {entry['dim'] or '-':>5} {entry['entries']:>9} "
+              f"{entry['bytes'] / 1024 / 1024:>9.1f} {last_used}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect and garbage-collect the ingestion embedding artifact cache")
+    parser.add_argument("--root", default="backend/db/embedding_artifacts", help="Artifact cache directory")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    stats_parser = subparsers.add_parser("stats", help="Show entries and disk usage per model")
+    stats_parser.add_argument("--json", action="store_true", help="Print machine-readable JSON")
+
+    gc_parser = subparsers.add_parser("gc", help="Delete artifacts of stale models")
+    gc_parser.add_argument("--keep", nargs="+", default=None, help="Models to keep, e.g. sentence-transformers:BAAI/bge-m3; all others are removed")
+    gc_parser.add_argument("--older-than-days", type=float, default=None, help="Only remove models unused for this many days")
+    gc_parser.add_argument("--dry-run", action="store_true", help="Only list what would be removed")
+    args = parser.parse_args()
+
+    if args.command == "stats":
+        entries = artifact_stats(args.root)
+        if args.json:
+            print(json.dumps(entries, indent=2, ensure_ascii=False))
+        else:
+            print_stats(entries)
+        return
+
+    if args.keep is None and args.older_than_days is None:
+        raise SystemExit("Refusing to remove every model: pass --keep and/or --older-than-days")
+    removed = collect_garbage(args.root, args.keep, args.older_than_days, args.dry_run)
+    freed = sum(entry["bytes"] for entry in removed)
+    action = "Would remove" if args.dry_run else "Removed"
+    logging.info(f"{action} {len(removed)} model(s), {freed / 1024 / 1024:.1f} MB")
+    print_stats(removed)
+
+if __name__ == "__main__":
+    main()
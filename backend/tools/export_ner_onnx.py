@@ -0,0 +1,144 @@
+import argparse
+import json
+import logging
+import os
+import platform
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from services.ner_service import NER_MODEL_NAME, DEFAULT_ONNX_NER_PATH, create_ner_pipeline
+
+# 设置日志
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# 把金融 NER 模型导出为 ONNX 并做动态 int8 量化，
+# 然后与 PyTorch pipeline 对比实体输出一致性以及延迟、吞吐。
+# 服务端使用：NER_BACKEND=onnx NER_ONNX_PATH=<输出目录>
+
+SAMPLE_TEXTS = [
+    "The company reported revenue of $4.2 billion, up 12% year over year, while operating loss narrowed to $310 million.",
+    "Net profit attributable to shareholders fell 8% as interest expense rose on higher borrowing costs.",
+    "Gross margin expanded to 41%, driven by lower cost of goods sold and favorable currency effects.",
+    "Impairment losses on goodwill of $1.1 billion were recorded in the fourth quarter.",
+    "Selling, general and administrative expenses increased to $950 million due to restructuring charges.",
+    "Free cash flow was $2.3 billion and the board approved a share buyback program.",
+    "Revenue from subscriptions grew faster than hardware sales, offsetting the decline in licensing income.",
+    "The bank's net interest income rose while provisions for credit losses remained elevated.",
+]
+
+def export(output_dir: str, model_name: str, quantization: str):
+    """导出 ONNX 并做动态 int8 量化，tokenizer 一并保存"""
+    from optimum.onnxruntime import ORTModelForTokenClassification, ORTQuantizer
+    from optimum.onnxruntime.configuration import AutoQuantizationConfig
+    from transformers import AutoTokenizer
+
+    start = time.perf_counter()
+    model = ORTModelForTokenClassification.from_pretrained(model_name, export=True)
+    model.save_pretrained(output_dir)
+    AutoTokenizer.from_pretrained(model_name).save_pretrained(output_dir)
+    logging.info(f"Exported {model_name} to {output_dir} in {time.perf_counter() - start:.1f}s")
+
+    if quantization == "none":
+        return
+    start = time.perf_counter()
+    quantizer = ORTQuantizer.from_pretrained(output_dir, file_name="model.onnx")
+    qconfig = getattr(AutoQuantizationConfig, quantization)(is_static=False, per_channel=False)
+    quantizer.quantize(save_dir=output_dir, quantization_config=qconfig)
+    logging.info(
+        f"Quantized to int8 ({quantization}) in {time.perf_counter() - start:.1f}s: "
+        f"{os.path.getsize(os.path.join(output_dir, 'model.onnx')) / 1e6:.1f} MB -> "
+        f"{os.path.getsize(os.path.join(output_dir, 'model_quantized.onnx')) / 1e6:.1f} MB"
+    )
+
+def parity(reference, candidate, texts) -> dict:
+    """以 PyTorch 输出为基准，按 (entity_group, start, end) 比较实体并统计得分差"""
+    ref_results = reference(texts)
+    cand_results = candidate(texts)
+    matched, ref_total, cand_total, score_deltas = 0, 0, 0, []
+    for ref_entities, cand_entities in zip(ref_results, cand_results):
+        ref_spans = {(e["entity_group"], e["start"], e["end"]): float(e["score"]) for e in ref_entities}
+        cand_spans = {(e["entity_group"], e["start"], e["end"]): float(e["score"]) for e in cand_entities}
+        ref_total += len(ref_spans)
+        cand_total += len(cand_spans)
+        for span in ref_spans.keys() & cand_spans.keys():
+            matched += 1
+            score_deltas.append(abs(ref_spans[span] - cand_spans[span]))
+    precision = matched / cand_total if cand_total else 1.0
+    recall = matched / ref_total if ref_total else 1.0
+    return {
+        "reference_entities": ref_total,
+        "candidate_entities": cand_total,
+        "precision": precision,
+        "recall": recall,
+        "f1": 2 * precision * recall / (precision + recall) if precision + recall else 0.0,
+        "max_score_delta": float(max(score_deltas, default=0.0)),
+        "mean_score_delta": float(np.mean(score_deltas)) if score_deltas else 0.0,
+    }
+
+def benchmark(pipe, texts, batch_size: int, rounds: int) -> dict:
+    """单条请求延迟与批量吞吐"""
+    pipe(texts[:1])  # 预热
+    latencies = []
+    for _ in range(rounds):
+        for text in texts:
+            start = time.perf_counter()
+            pipe(text)
+            latencies.append(time.perf_counter() - start)
+    batch_texts = texts * rounds
+    start = time.perf_counter()
+    pipe(batch_texts, batch_size=batch_size)
+    elapsed = time.perf_counter() - start
+    return {
+        "latency_p50_ms": float(np.percentile(latencies, 50) * 1000),
+        "latency_p99_ms": float(np.percentile(latencies, 99) * 1000),
+        "throughput_texts_per_s": len(batch_texts) / elapsed,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the finance NER model to int8 ONNX and compare it with PyTorch")
+    parser.add_argument("--model", default=NER_MODEL_NAME)
+    parser.add_argument("--output-dir", default=os.path.join("backend", DEFAULT_ONNX_NER_PATH))
+    parser.add_argument("--quantization", default="avx2", choices=["avx2", "avx512", "avx512_vnni", "arm64", "none"],
+                        help="Dynamic int8 quantization target (none keeps the fp32 ONNX model)")
+    parser.add_argument("--skip-export", action="store_true", help="Only run the parity and latency comparison")
+    parser.add_argument("--texts", default=None, help="Evaluation texts, one per line (default: built-in samples)")
+    parser.add_argument("--threads", type=int, default=None, help="ONNX Runtime intra-op threads")
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--output", default="ner_onnx_report.json", help="Machine-readable JSON report")
+    args = parser.parse_args()
+
+    if not args.skip_export:
+        export(args.output_dir, args.model, args.quantization)
+
+    texts = SAMPLE_TEXTS
+    if args.texts:
+        with open(args.texts, encoding="utf-8") as f:
+            texts = [line.strip() for line in f if line.strip()]
+
+    pytorch_pipe = create_ner_pipeline("pytorch")
+    onnx_pipe = create_ner_pipeline("onnx", args.output_dir, args.threads)
+
+    report = {
+        "model": args.model,
+        "onnx_path": args.output_dir,
+        "quantization": args.quantization,
+        "texts": len(texts),
+        "host": {"platform": platform.platform(), "cpu_count": os.cpu_count()},
+        "parity": parity(pytorch_pipe, onnx_pipe, texts),
+        "pytorch": benchmark(pytorch_pipe, texts, args.batch_size, args.rounds),
+        "onnx": benchmark(onnx_pipe, texts, args.batch_size, args.rounds),
+    }
+    report["speedup_p50"] = report["pytorch"]["latency_p50_ms"] / report["onnx"]["latency_p50_ms"]
+    report["speedup_throughput"] = report["onnx"]["throughput_texts_per_s"] / report["pytorch"]["throughput_texts_per_s"]
+    logging.info(json.dumps(report, indent=2))
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+    logging.info(f"Report written to {args.output}")
+
+if __name__ == "__main__":
+    main()
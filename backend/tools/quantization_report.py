@@ -0,0 +1,98 @@
+import argparse
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from utils.quantization import VECTOR_DTYPES, DEFAULT_RERANK_FACTORS
+from utils.vector_store import CollectionSpec, DEFAULT_NUMPY_DIR, NumpyVectorStore
+
+# 设置日志
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# 对比各种向量存储精度的 recall@k 与内存占用
+# 输入为 create_milvus_db.py --backend numpy 建好的 float32 集合，
+# 以集合内随机抽样的术语向量作为查询，真值为全精度精确检索（排除查询自身）
+parser = argparse.ArgumentParser(description="Report recall@k vs. memory for quantized vector storage")
+parser.add_argument("--uri", default=DEFAULT_NUMPY_DIR, help="Numpy store directory holding the float32 collection")
+parser.add_argument("--collection", default="economics_only_name", help="Collection name")
+parser.add_argument("--queries", type=int, default=500, help="Number of sampled query vectors")
+parser.add_argument("--k", type=int, nargs="+", default=[1, 5, 10], help="Recall cut-offs")
+parser.add_argument("--seed", type=int, default=42)
+parser.add_argument("--output", default=None, help="Write the JSON report to this file")
+args = parser.parse_args()
+
+vectors = np.load(os.path.join(args.uri, args.collection, "vectors.npy"), mmap_mode="r")
+n, dim = vectors.shape
+logging.info(f"Loaded {n} x {dim} vectors from {args.collection}")
+
+rng = np.random.default_rng(args.seed)
+query_ids = rng.choice(n, size=min(args.queries, n), replace=False)
+queries = np.asarray(vectors[query_ids], dtype=np.float32)
+max_k = max(args.k)
+
+def neighbours(hits, query_id):
+    """去掉查询自身后的近邻 id 列表"""
+    return [hit["id"] for hit in hits if hit["id"] != query_id][:max_k]
+
+report = {"collection": args.collection, "vectors": int(n), "dim": int(dim), "queries": len(query_ids), "modes": []}
+ground_truth = None
+
+with tempfile.TemporaryDirectory() as tmp_dir:
+    store = NumpyVectorStore(tmp_dir)
+    rows = [{"vector": vector, "name": str(idx)} for idx, vector in enumerate(np.asarray(vectors))]
+
+    for vector_dtype in VECTOR_DTYPES:
+        store.create_collection(vector_dtype, CollectionSpec(dim=dim, scalar_fields={"name": 20}, vector_dtype=vector_dtype))
+        store.insert(vector_dtype, rows)
+        store.flush(vector_dtype)
+        store.load(vector_dtype)
+
+        collection_dir = os.path.join(tmp_dir, vector_dtype)
+        codes_path = os.path.join(collection_dir, "codes.npy")
+        full_path = os.path.join(collection_dir, "vectors.npy")
+        resident_bytes = os.path.getsize(codes_path) if os.path.exists(codes_path) else os.path.getsize(full_path)
+
+        rerank_options = [None] if vector_dtype == "float32" else [0, DEFAULT_RERANK_FACTORS[vector_dtype]]
+        for rerank_factor in rerank_options:
+            search_params = None if rerank_factor is None else {"rerank_factor": rerank_factor}
+            start = time.perf_counter()
+            results = store.search(vector_dtype, queries, max_k + 1, [], search_params=search_params)
+            elapsed = time.perf_counter() - start
+            found = [neighbours(hits, query_id) for hits, query_id in zip(results, query_ids)]
+            if ground_truth is None:
+                ground_truth = found
+
+            mode = {
+                "vector_dtype": vector_dtype,
+                "rerank_factor": rerank_factor,
+                "resident_bytes": int(resident_bytes),
+                "bytes_per_vector": resident_bytes / n,
+                "search_ms_per_query": elapsed / len(query_ids) * 1000,
+            }
+            for k in args.k:
+                mode[f"recall@{k}"] = float(np.mean([
+                    len(set(approx[:k]) & set(exact[:k])) / k
+                    for approx, exact in zip(found, ground_truth)
+                ]))
+            report["modes"].append(mode)
+            logging.info(json.dumps(mode))
+
+        store.drop_collection(vector_dtype)
+
+header = f"{'dtype':<8} {'rerank':>6} {'MB':>8} " + " ".join(f"{'R@' + str(k):>7}" for k in args.k) + f" {'ms/q':>7}"
+print(header)
+for mode in report["modes"]:
+    rerank = "-" if mode["rerank_factor"] is None else str(mode["rerank_factor"])
+    recalls = " ".join(f"{mode[f'recall@{k}']:>7.3f}" for k in args.k)
+    print(f"{mode['vector_dtype']:<8} {rerank:>6} {mode['resident_bytes'] / 1e6:>8.2f} {recalls} {mode['search_ms_per_query']:>7.3f}")
+
+if args.output:
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    logging.info(f"Report written to {args.output}")
@@ -0,0 +1,151 @@
+from dataclasses import asdict
+from typing import Dict, Iterator, List, Optional, Tuple
+import json
+import logging
+import os
+import shutil
+import threading
+
+import numpy as np
+
+from utils.vector_store import CollectionSpec
+
+logger = logging.getLogger(__name__)
+
+FORMAT_VERSION = 1
+MANIFEST = "manifest.json"
+
+class BulkArtifactWriter:
+    """
+    把建库结果写成可批量导入的列式文件，而不是逐批插入向量库
+    目录结构与 Milvus 的 NumPy 批量导入格式一致：每个分区一个子目录，
+    vector.npy 为归一化的 float32 矩阵（二维，可直接 mmap），每个标量字段一个字符串 .npy；
+    稀疏集合另存 CSR 形式的 sparse_vector.npz。manifest.json 记录集合定义、集合元数据与分区列表，
+    同一份产物可以导入多台机器而不必重新嵌入
+    """
+    def __init__(self,
+                 directory: str,
+                 spec: CollectionSpec,
+                 metadata: Optional[Dict] = None,
+                 files: Optional[Dict[str, str]] = None,
+                 partition_rows: int = 100000):
+        """
+        Args:
+            directory: 输出目录，不能已有产物
+            spec: 集合定义
+            metadata: 集合级元数据（如降维投影），导入时原样写回
+            files: 需要随产物一起分发的附属文件，{名称: 源路径}，如 PCA 投影与 BM25 编码器
+            partition_rows: 每个分区的行数
+        """
+        if os.path.exists(os.path.join(directory, MANIFEST)):
+            raise FileExistsError(f"Bulk artifact already exists: {directory}")
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.spec = spec
+        self.metadata = metadata or {}
+        self.partition_rows = partition_rows
+        self.files = {}
+        for name, path in (files or {}).items():
+            target = name + os.path.splitext(path)[1]
+            shutil.copyfile(path, os.path.join(directory, target))
+            self.files[name] = target
+        self._buffer: List[Dict] = []
+        self._partitions: List[Dict] = []
+        self._lock = threading.Lock()
+
+    def write(self, rows: List[Dict]) -> int:
+        """缓存若干行（格式同 VectorStore.insert），攒够 partition_rows 行写出一个分区"""
+        with self._lock:
+            self._buffer.extend(rows)
+            while len(self._buffer) >= self.partition_rows:
+                self._write_partition(self._buffer[:self.partition_rows])
+                self._buffer = self._buffer[self.partition_rows:]
+        return len(rows)
+
+    def _write_partition(self, rows: List[Dict]):
+        name = f"part-{len(self._partitions):05d}"
+        directory = os.path.join(self.directory, name)
+        os.makedirs(directory, exist_ok=True)
+        vectors = np.asarray([row["vector"] for row in rows], dtype=np.float32)
+        if self.spec.metric_type == "COSINE":
+            vectors = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        np.save(os.path.join(directory, "vector.npy"), vectors)
+        for field_name in self.spec.scalar_fields:
+            values = ["" if row.get(field_name) is None else str(row[field_name]) for row in rows]
+            np.save(os.path.join(directory, f"{field_name}.npy"), np.array(values, dtype=str))
+        if self.spec.sparse:
+            sparse_vectors = [row.get("sparse_vector") or {} for row in rows]
+            lengths = [len(vector) for vector in sparse_vectors]
+            np.savez(
+                os.path.join(directory, "sparse_vector.npz"),
+                indptr=np.concatenate([[0], np.cumsum(lengths)]).astype(np.int64),
+                indices=np.fromiter((int(k) for vector in sparse_vectors for k in vector), dtype=np.int64, count=sum(lengths)),
+                values=np.fromiter((v for vector in sparse_vectors for v in vector.values()), dtype=np.float32, count=sum(lengths))
+            )
+        self._partitions.append({"name": name, "rows": len(rows)})
+        logger.info(f"Wrote bulk partition {name} ({len(rows)} rows)")
+
+    def close(self) -> Dict:
+        """写出剩余的行与 manifest.json，返回 manifest"""
+        with self._lock:
+            if self._buffer:
+                self._write_partition(self._buffer)
+                self._buffer = []
+            manifest = {
+                "format": FORMAT_VERSION,
+                "spec": asdict(self.spec),
+                "metadata": self.metadata,
+                "files": self.files,
+                "partitions": self._partitions,
+                "rows": sum(partition["rows"] for partition in self._partitions),
+            }
+            tmp_path = os.path.join(self.directory, MANIFEST + ".tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(manifest, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, os.path.join(self.directory, MANIFEST))
+        return manifest
+
+def read_manifest(directory: str) -> Dict:
+    with open(os.path.join(directory, MANIFEST), encoding="utf-8") as f:
+        manifest = json.load(f)
+    if manifest.get("format") != FORMAT_VERSION:
+        raise ValueError(f"Unsupported bulk artifact format: {manifest.get('format')}")
+    return manifest
+
+def spec_from_manifest(manifest: Dict) -> CollectionSpec:
+    return CollectionSpec(**manifest["spec"])
+
+def read_partition(directory: str, partition: Dict, scalar_fields: List[str]) -> Tuple[np.ndarray, Dict[str, List[str]], Optional[Tuple]]:
+    """
+    读取一个分区：向量以只读 mmap 打开；标量字段为字符串列表；
+    稀疏向量为 (indptr, indices, values)，非稀疏产物为 None
+    """
+    partition_dir = os.path.join(directory, partition["name"])
+    vectors = np.load(os.path.join(partition_dir, "vector.npy"), mmap_mode="r")
+    fields = {name: np.load(os.path.join(partition_dir, f"{name}.npy")).tolist() for name in scalar_fields}
+    sparse = None
+    sparse_path = os.path.join(partition_dir, "sparse_vector.npz")
+    if os.path.exists(sparse_path):
+        with np.load(sparse_path) as data:
+            sparse = (data["indptr"], data["indices"], data["values"])
+    return vectors, fields, sparse
+
+def iter_rows(directory: str, batch_size: int = 10000) -> Iterator[List[Dict]]:
+    """按批把产物还原成 VectorStore.insert 的行格式，供不支持批量导入的后端使用"""
+    manifest = read_manifest(directory)
+    scalar_fields = list(manifest["spec"]["scalar_fields"])
+    for partition in manifest["partitions"]:
+        vectors, fields, sparse = read_partition(directory, partition, scalar_fields)
+        for start in range(0, partition["rows"], batch_size):
+            end = min(start + batch_size, partition["rows"])
+            rows = [
+                {"vector": np.asarray(vectors[idx]), **{name: fields[name][idx] for name in scalar_fields}}
+                for idx in range(start, end)
+            ]
+            if sparse is not None:
+                indptr, indices, values = sparse
+                for row, idx in zip(rows, range(start, end)):
+                    row["sparse_vector"] = dict(zip(
+                        indices[indptr[idx]:indptr[idx + 1]].tolist(), values[indptr[idx]:indptr[idx + 1]].tolist()
+                    ))
+            yield rows
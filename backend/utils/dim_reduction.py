@@ -0,0 +1,84 @@
+from typing import Dict, Optional
+import hashlib
+import os
+
+import numpy as np
+
+REDUCTION_METHODS = ("truncate", "pca")
+
+class DimensionReducer:
+    """
+    向量降维
+    truncate：保留前 dim 维后重新归一化（Matryoshka 式截断）；
+    pca：减去均值后投影到在术语表向量上拟合的前 dim 个主成分，再归一化。
+    建库与查询必须使用同一个降维器，集合元数据中记录其方法、维度与 PCA 文件校验和
+    """
+    def __init__(self, method: str, dim: int, mean: Optional[np.ndarray] = None, components: Optional[np.ndarray] = None):
+        if method not in REDUCTION_METHODS:
+            raise ValueError(f"Unsupported reduction method: {method}")
+        if method == "pca" and (mean is None or components is None):
+            raise ValueError("PCA reduction needs a fitted mean and components")
+        self.method = method
+        self.dim = dim
+        self.mean = mean
+        self.components = components
+
+    @classmethod
+    def fit_pca(cls, vectors, dim: int) -> "DimensionReducer":
+        """在（归一化后的）样本向量上拟合 PCA 投影"""
+        vectors = _normalize(np.asarray(vectors, dtype=np.float32))
+        if dim > min(vectors.shape):
+            raise ValueError(f"PCA dimension {dim} exceeds the sample size or input dimension {vectors.shape}")
+        mean = vectors.mean(axis=0)
+        _, _, vt = np.linalg.svd(vectors - mean, full_matrices=False)
+        return cls("pca", dim, mean.astype(np.float32), vt[:dim].astype(np.float32))
+
+    def transform(self, vectors) -> np.ndarray:
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if self.method == "truncate":
+            reduced = vectors[:, :self.dim]
+        else:
+            reduced = (_normalize(vectors) - self.mean) @ self.components.T
+        return _normalize(reduced)
+
+    def save(self, path: str) -> str:
+        """保存 PCA 参数，返回文件的 sha256 以写入集合元数据"""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, "wb") as f:
+            np.savez(f, mean=self.mean, components=self.components)
+        return file_sha256(path)
+
+    @classmethod
+    def from_metadata(cls, projection: Dict, path: Optional[str] = None) -> "DimensionReducer":
+        """
+        按集合元数据中的 projection 记录恢复降维器
+
+        Raises:
+            ValueError: PCA 文件缺失或与建库时的校验和不一致
+        """
+        if projection["method"] == "truncate":
+            return cls("truncate", projection["dim"])
+        if not path or not os.path.exists(path):
+            raise ValueError(f"PCA projection file not found: {path}")
+        if file_sha256(path) != projection["sha256"]:
+            raise ValueError(f"PCA projection file {path} does not match the collection it was built for")
+        with np.load(path) as data:
+            return cls("pca", projection["dim"], data["mean"], data["components"])
+
+    def metadata(self, source_dim: int, sha256: Optional[str] = None) -> Dict:
+        projection = {"method": self.method, "dim": self.dim, "source_dim": source_dim}
+        if sha256:
+            projection["sha256"] = sha256
+        return projection
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    return vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
@@ -0,0 +1,241 @@
+from typing import Callable, Dict, List, Optional
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+import threading
+import time
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+ARTIFACT_DTYPES = ("float32", "float16")
+DIGEST_SIZE = 16
+
+def text_digest(text: str) -> bytes:
+    """文档文本的内容地址（不做归一化，嵌入结果取决于原始文本）"""
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=DIGEST_SIZE).digest()
+
+def _model_dir_name(model: str) -> str:
+    return re.sub(r"[^A-Za-z0-9._-]+", "__", model)
+
+class EmbeddingArtifactStore:
+    """
+    建库用的持久化向量存储，按 (模型, 文档文本哈希) 寻址
+    每个模型一个目录：vectors.bin 为按行追加的 float32/float16 原始向量，
+    keys.bin 为与之逐行对应的 16 字节文本哈希（旁路索引），meta.json 记录模型、维度、精度与最近使用时间。
+    两个文件都只追加，追加时持有文件锁，多个建库进程可以共享同一个目录；
+    存储精度以目录首次创建时为准
+    """
+    def __init__(self, root: str, model: str, dtype: str = "float32"):
+        if dtype not in ARTIFACT_DTYPES:
+            raise ValueError(f"Unsupported artifact dtype: {dtype}")
+        self.model = model
+        self.directory = os.path.join(root, _model_dir_name(model))
+        os.makedirs(self.directory, exist_ok=True)
+        self._meta_path = os.path.join(self.directory, "meta.json")
+        self._keys_path = os.path.join(self.directory, "keys.bin")
+        self._vectors_path = os.path.join(self.directory, "vectors.bin")
+        self._lock = threading.Lock()
+        self._index: Dict[bytes, int] = {}
+        self._count = 0
+        self._vectors: Optional[np.ndarray] = None
+
+        with self._file_lock():
+            if os.path.exists(self._meta_path):
+                with open(self._meta_path, encoding="utf-8") as f:
+                    self.meta = json.load(f)
+                if self.meta["model"] != model:
+                    raise ValueError(f"Artifact directory {self.directory} belongs to model {self.meta['model']}")
+            else:
+                # 维度在第一次写入时确定
+                self.meta = {"model": model, "dtype": dtype, "dim": None, "created": time.time()}
+                _write_json(self._meta_path, self.meta)
+            self.dtype = np.dtype(self.meta["dtype"])
+            self._refresh()
+
+    def _file_lock(self):
+        return _FileLock(os.path.join(self.directory, ".lock"))
+
+    def _refresh(self):
+        """读入其他进程追加的行；只认两个文件都已完整写入的行，截掉中断写入留下的残余"""
+        if self.meta["dim"] is None:
+            with open(self._meta_path, encoding="utf-8") as f:
+                self.meta = json.load(f)
+            self.dtype = np.dtype(self.meta["dtype"])
+            if self.meta["dim"] is None:
+                return
+        row_bytes = self.meta["dim"] * self.dtype.itemsize
+        n_keys = os.path.getsize(self._keys_path) // DIGEST_SIZE if os.path.exists(self._keys_path) else 0
+        n_vectors = os.path.getsize(self._vectors_path) // row_bytes if os.path.exists(self._vectors_path) else 0
+        count = min(n_keys, n_vectors)
+        if count > self._count:
+            with open(self._keys_path, "rb") as f:
+                f.seek(self._count * DIGEST_SIZE)
+                data = f.read((count - self._count) * DIGEST_SIZE)
+            for row in range(count - self._count):
+                self._index.setdefault(data[row * DIGEST_SIZE:(row + 1) * DIGEST_SIZE], self._count + row)
+            self._count = count
+            self._vectors = None
+        for path, size in ((self._keys_path, count * DIGEST_SIZE), (self._vectors_path, count * row_bytes)):
+            if os.path.exists(path) and os.path.getsize(path) > size:
+                os.truncate(path, size)
+
+    def _matrix(self) -> np.ndarray:
+        if self._vectors is None:
+            self._vectors = np.memmap(self._vectors_path, dtype=self.dtype, mode="r", shape=(self._count, self.meta["dim"]))
+        return self._vectors
+
+    def get_many(self, digests: List[bytes]) -> Dict[bytes, np.ndarray]:
+        """按文本哈希读取已存的向量（float32），未命中的不出现在结果中"""
+        with self._lock:
+            rows = {digest: self._index[digest] for digest in digests if digest in self._index}
+            if not rows:
+                return {}
+            matrix = self._matrix()
+            return {digest: np.asarray(matrix[row], dtype=np.float32) for digest, row in rows.items()}
+
+    def put_many(self, digests: List[bytes], vectors: np.ndarray):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        with self._lock, self._file_lock():
+            self._refresh()
+            if self.meta["dim"] is None:
+                self.meta["dim"] = int(vectors.shape[1])
+            elif vectors.shape[1] != self.meta["dim"]:
+                raise ValueError(f"Vector dimension {vectors.shape[1]} does not match stored dimension {self.meta['dim']}")
+            new_rows = {}
+            for digest, vector in zip(digests, vectors):
+                if digest not in self._index and digest not in new_rows:
+                    new_rows[digest] = vector
+            if new_rows:
+                # 先写向量再写键，中断时多出的向量行会在下次 _refresh 时被截掉
+                with open(self._vectors_path, "ab") as f:
+                    f.write(np.asarray(list(new_rows.values()), dtype=self.dtype).tobytes())
+                with open(self._keys_path, "ab") as f:
+                    f.write(b"".join(new_rows))
+                for row, digest in enumerate(new_rows):
+                    self._index[digest] = self._count + row
+                self._count += len(new_rows)
+                self._vectors = None
+            self.meta["last_used"] = time.time()
+            _write_json(self._meta_path, self.meta)
+
+    def __len__(self) -> int:
+        return self._count
+
+class CachedEmbeddingFunction:
+    """
+    包装建库脚本的嵌入函数（输入文档列表，输出向量矩阵）：
+    先按文本哈希查 EmbeddingArtifactStore，只对未命中的文档调用模型，再把结果写回
+    """
+    def __init__(self, embedding_function: Callable[[List[str]], np.ndarray], store: EmbeddingArtifactStore):
+        self.embedding_function = embedding_function
+        self.store = store
+        self.hits = 0
+        self.misses = 0
+        self.embed_seconds = 0.0
+
+    def __call__(self, docs: List[str]) -> np.ndarray:
+        digests = [text_digest(doc) for doc in docs]
+        found = self.store.get_many(digests)
+        missing = list(dict.fromkeys(digest for digest in digests if digest not in found))
+        if missing:
+            missing_docs = {digest: doc for digest, doc in zip(digests, docs) if digest not in found}
+            start = time.perf_counter()
+            computed = np.asarray(self.embedding_function([missing_docs[digest] for digest in missing]), dtype=np.float32)
+            self.embed_seconds += time.perf_counter() - start
+            self.store.put_many(missing, computed)
+            found.update(zip(missing, computed))
+        self.hits += len(digests) - len(missing)
+        self.misses += len(missing)
+        return np.stack([found[digest] for digest in digests])
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "model": self.store.model,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "embed_seconds": round(self.embed_seconds, 2),
+            "stored_vectors": len(self.store),
+        }
+
+def artifact_stats(root: str) -> List[Dict]:
+    """列出目录下每个模型的条目数、维度、精度、磁盘占用与最近使用时间"""
+    stats = []
+    if not os.path.isdir(root):
+        return stats
+    for name in sorted(os.listdir(root)):
+        meta_path = os.path.join(root, name, "meta.json")
+        if not os.path.exists(meta_path):
+            continue
+        with open(meta_path, encoding="utf-8") as f:
+            meta = json.load(f)
+        keys_path = os.path.join(root, name, "keys.bin")
+        size = sum(
+            os.path.getsize(os.path.join(root, name, filename))
+            for filename in os.listdir(os.path.join(root, name))
+        )
+        stats.append({
+            "model": meta["model"],
+            "directory": name,
+            "dtype": meta["dtype"],
+            "dim": meta["dim"],
+            "entries": os.path.getsize(keys_path) // DIGEST_SIZE if os.path.exists(keys_path) else 0,
+            "bytes": size,
+            "last_used": meta.get("last_used", meta.get("created")),
+        })
+    return stats
+
+def collect_garbage(root: str,
+                    keep_models: Optional[List[str]] = None,
+                    older_than_days: Optional[float] = None,
+                    dry_run: bool = False) -> List[Dict]:
+    """
+    删除过期模型的向量目录
+
+    Args:
+        keep_models: 要保留的模型，不在其中的全部删除
+        older_than_days: 只删除超过该天数未使用的模型
+        dry_run: 只返回将被删除的目录，不实际删除
+
+    Returns:
+        被删除（或将被删除）的模型统计
+    """
+    now = time.time()
+    removed = []
+    for entry in artifact_stats(root):
+        if keep_models is not None and entry["model"] in keep_models:
+            continue
+        if older_than_days is not None and now - (entry["last_used"] or 0) < older_than_days * 86400:
+            continue
+        removed.append(entry)
+        if not dry_run:
+            shutil.rmtree(os.path.join(root, entry["directory"]))
+            logger.info(f"Removed embedding artifacts for {entry['model']} ({entry['bytes']} bytes)")
+    return removed
+
+class _FileLock:
+    """进程间互斥的排他文件锁"""
+    def __init__(self, path: str):
+        self.path = path
+
+    def __enter__(self):
+        self._file = open(self.path, "a")
+        fcntl.flock(self._file, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        fcntl.flock(self._file, fcntl.LOCK_UN)
+        self._file.close()
+
+def _write_json(path: str, data):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
@@ -0,0 +1,215 @@
+from array import array
+from collections import OrderedDict
+from langchain_core.embeddings import Embeddings
+from typing import Dict, List, Optional
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+def normalize_text(text: str) -> str:
+    """统一 Unicode 形式并折叠空白，作为缓存键与实际向量化的文本"""
+    return _WHITESPACE_RE.sub(" ", unicodedata.normalize("NFC", text)).strip()
+
+def _to_blob(vector: List[float]) -> bytes:
+    return array("f", vector).tobytes()
+
+def _from_blob(blob: bytes) -> List[float]:
+    vector = array("f")
+    vector.frombytes(blob)
+    return vector.tolist()
+
+class SQLiteEmbeddingStore:
+    """
+    基于 SQLite 的持久化向量缓存
+    以 float32 二进制保存向量，使用 WAL 模式供多个 uvicorn worker 共享，
+    总大小超过上限时按最近访问时间淘汰
+    """
+    def __init__(self, path: str, max_bytes: int = 512 * 1024 * 1024):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS embeddings (
+                key TEXT PRIMARY KEY,
+                vector BLOB NOT NULL,
+                last_access REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_access ON embeddings(last_access)")
+        self._conn.commit()
+
+    def get_many(self, keys: List[str]) -> Dict[str, List[float]]:
+        if not keys:
+            return {}
+        found = {}
+        with self._lock:
+            # SQLite 单条语句的参数个数有限，分段查询
+            for start in range(0, len(keys), 500):
+                part = keys[start:start + 500]
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(part))})",
+                    part
+                ).fetchall()
+                found.update((key, _from_blob(blob)) for key, blob in rows)
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_access = ? WHERE key = ?",
+                    [(now, key) for key in found]
+                )
+                self._conn.commit()
+        return found
+
+    def put_many(self, items: Dict[str, List[float]]):
+        if not items:
+            return
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector, last_access) VALUES (?, ?, ?)",
+                [(key, _to_blob(vector), now) for key, vector in items.items()]
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        total, count = self._conn.execute(
+            "SELECT COALESCE(SUM(LENGTH(vector)), 0), COUNT(*) FROM embeddings"
+        ).fetchone()
+        if total <= self.max_bytes or count == 0:
+            return
+        # 按平均条目大小估算需要淘汰的条数，一次删除最久未访问的部分
+        excess = total - self.max_bytes
+        n_evict = min(count, int(excess / (total / count)) + 1)
+        self._conn.execute(
+            "DELETE FROM embeddings WHERE key IN "
+            "(SELECT key FROM embeddings ORDER BY last_access LIMIT ?)",
+            (n_evict,)
+        )
+        logger.info(f"Evicted {n_evict} entries from embedding cache {self.path}")
+
+    def size_bytes(self) -> int:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings"
+            ).fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+_stores: Dict[str, SQLiteEmbeddingStore] = {}
+_stores_lock = threading.Lock()
+
+def get_embedding_store(path: str, max_bytes: int) -> SQLiteEmbeddingStore:
+    """同一路径的持久化缓存在进程内只打开一次，由所有模型共享"""
+    with _stores_lock:
+        store = _stores.get(path)
+        if store is None:
+            store = SQLiteEmbeddingStore(path, max_bytes=max_bytes)
+            _stores[path] = store
+        return store
+
+class CachedEmbeddings(Embeddings):
+    """
+    两级查询向量缓存
+    包装任意 LangChain Embeddings：先查进程内 LRU，再查可选的持久化存储，
+    都未命中时才调用底层模型，并回填两级缓存
+    """
+    def __init__(self,
+                 embeddings: Embeddings,
+                 model_id: str,
+                 max_entries: int = 10000,
+                 store: Optional[SQLiteEmbeddingStore] = None):
+        """
+        Args:
+            embeddings: 被包装的嵌入函数
+            model_id: 提供商、模型名称及精度组成的模型标识（EmbeddingConfig.model_id），作为缓存键前缀
+            max_entries: 进程内 LRU 的条目上限
+            store: 持久化缓存层，为 None 时只使用内存缓存
+        """
+        self.embeddings = embeddings
+        self.key_prefix = f"{model_id}\x1f"
+        self.max_entries = max_entries
+        self.store = store
+        self._memory: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        normalized = [normalize_text(text) for text in texts]
+        keys = [self.key_prefix + text for text in normalized]
+        vectors: Dict[str, List[float]] = {}
+
+        with self._lock:
+            for key in keys:
+                vector = self._memory.get(key)
+                if vector is not None:
+                    self._memory.move_to_end(key)
+                    vectors[key] = vector
+            self.memory_hits += len(vectors)
+
+        missing = [key for key in dict.fromkeys(keys) if key not in vectors]
+        if missing and self.store is not None:
+            found = self.store.get_many(missing)
+            with self._lock:
+                self.disk_hits += len(found)
+            vectors.update(found)
+            self._remember(found)
+            missing = [key for key in missing if key not in found]
+
+        if missing:
+            with self._lock:
+                self.misses += len(missing)
+            prefix_len = len(self.key_prefix)
+            computed = dict(zip(
+                missing,
+                self.embeddings.embed_documents([key[prefix_len:] for key in missing])
+            ))
+            vectors.update(computed)
+            self._remember(computed)
+            if self.store is not None:
+                self.store.put_many(computed)
+
+        return [vectors[key] for key in keys]
+
+    def _remember(self, items: Dict[str, List[float]]):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            for key, vector in items.items():
+                self._memory[key] = vector
+                self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    def stats(self) -> Dict:
+        """返回命中率与缓存大小统计"""
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_ratio": (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+            "memory_entries": len(self._memory),
+            "disk_bytes": self.store.size_bytes() if self.store is not None else None
+        }
@@ -1,14 +1,31 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from enum import Enum
 from typing import Optional
+import os
 
 class EmbeddingProvider(Enum):
     BEDROCK = "bedrock"
     OPENAI = "openai"
     HUGGINGFACE = "huggingface"
+    HUGGINGFACE_ONNX = "huggingface-onnx"
 
 @dataclass
 class EmbeddingConfig:
     provider: EmbeddingProvider
     model_name: str  # 直接使用字符串，而不是枚举
     aws_region: Optional[str] = None
+    # 查询向量缓存：进程内 LRU 条目数（0 表示关闭缓存）与可选的持久化 SQLite 文件
+    cache_max_entries: int = field(default_factory=lambda: int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "10000")))
+    cache_path: Optional[str] = field(default_factory=lambda: os.getenv("EMBEDDING_CACHE_PATH") or None)
+    cache_max_bytes: int = field(default_factory=lambda: int(os.getenv("EMBEDDING_CACHE_MAX_BYTES", str(512 * 1024 * 1024))))
+    # huggingface-onnx：导出目录（默认 models/onnx/<模型名>）、是否使用 int8 量化模型与 ONNX Runtime 线程数
+    onnx_path: Optional[str] = field(default_factory=lambda: os.getenv("EMBEDDING_ONNX_PATH") or None)
+    onnx_quantize: bool = field(default_factory=lambda: os.getenv("EMBEDDING_ONNX_INT8", "true").lower() in ("1", "true", "yes"))
+    onnx_threads: Optional[int] = field(default_factory=lambda: int(os.getenv("EMBEDDING_ONNX_THREADS", "0")) or None)
+
+    @property
+    def model_id(self) -> str:
+        """向量来源的唯一标识，查询向量缓存按它分键；ONNX 提供商区分是否 int8 量化，与建库产物缓存的标识一致"""
+        if self.provider == EmbeddingProvider.HUGGINGFACE_ONNX:
+            return f"{self.provider.value}:{self.model_name}:{'int8' if self.onnx_quantize else 'fp32'}"
+        return f"{self.provider.value}:{self.model_name}"
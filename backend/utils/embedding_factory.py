@@ -6,10 +6,27 @@ from langchain_openai import OpenAIEmbeddings
 import boto3
 import os
 from utils.embedding_config import EmbeddingProvider, EmbeddingConfig
+from utils.embedding_cache import CachedEmbeddings, get_embedding_store
+from utils.onnx_embeddings import OnnxEmbeddings
 
 class EmbeddingFactory:
     @staticmethod
     def create_embedding_function(config: EmbeddingConfig):
+        embeddings = EmbeddingFactory._create_base_embedding_function(config)
+        if config.cache_max_entries <= 0 and not config.cache_path:
+            return embeddings
+
+        # 所有提供商统一包装两级查询向量缓存
+        store = get_embedding_store(config.cache_path, config.cache_max_bytes) if config.cache_path else None
+        return CachedEmbeddings(
+            embeddings,
+            model_id=config.model_id,
+            max_entries=config.cache_max_entries,
+            store=store
+        )
+
+    @staticmethod
+    def _create_base_embedding_function(config: EmbeddingConfig):
         if config.provider == EmbeddingProvider.BEDROCK:
             bedrock_client = boto3.client(
                 service_name='bedrock-runtime',
@@ -33,4 +50,12 @@ class EmbeddingFactory:
                 model_name=config.model_name
             )
             
+        elif config.provider == EmbeddingProvider.HUGGINGFACE_ONNX:
+            return OnnxEmbeddings(
+                model_name=config.model_name,
+                onnx_path=config.onnx_path or os.path.join("models", "onnx", config.model_name.replace("/", "__")),
+                quantize=config.onnx_quantize,
+                num_threads=config.onnx_threads
+            )
+            
         raise ValueError(f"Unsupported embedding provider: {config.provider}")
\ No newline at end of file
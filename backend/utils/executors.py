@@ -0,0 +1,93 @@
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import functools
+import logging
+import os
+import threading
+
+# 配置日志
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+class ExecutorSaturatedError(RuntimeError):
+    """执行器的工作线程和等待队列都已占满"""
+
+class BoundedExecutor:
+    """
+    带有界等待队列的线程池
+    在线程池中运行同步的模型推理或 LLM 调用，避免阻塞事件循环；
+    正在执行和排队的任务总数超过上限时立即拒绝，而不是无限堆积
+    """
+    def __init__(self, name: str, max_workers: int, max_queue: int):
+        """
+        Args:
+            name: 执行器名称，用于线程名和日志
+            max_workers: 工作线程数
+            max_queue: 允许排队等待的任务数
+        """
+        self.name = name
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self._slots = threading.BoundedSemaphore(max_workers + max_queue)
+
+    async def run(self, func, *args, **kwargs):
+        """
+        在线程池中执行同步函数并等待结果
+
+        Raises:
+            ExecutorSaturatedError: 当执行器已满时
+        """
+        if not self._slots.acquire(blocking=False):
+            raise ExecutorSaturatedError(f"Executor '{self.name}' is saturated")
+        try:
+            future = self._executor.submit(functools.partial(func, *args, **kwargs))
+        except Exception:
+            self._slots.release()
+            raise
+        # 在工作线程真正结束时归还名额，调用方取消等待不会提前释放
+        future.add_done_callback(lambda _: self._slots.release())
+        return await asyncio.wrap_future(future)
+
+    def shutdown(self):
+        """停止接收新任务并等待正在执行的任务完成"""
+        self._executor.shutdown(wait=True)
+
+def _env_int(name: str, default: int) -> int:
+    value = os.getenv(name)
+    return int(value) if value else default
+
+def configure_torch_threads():
+    """
+    按 TORCH_NUM_THREADS 设置每个 worker 进程的 torch intra-op 线程数
+    未设置时按 CPU 核数平均分给 CPU 线程池的各个工作线程
+    """
+    import torch
+
+    num_threads = _env_int(
+        "TORCH_NUM_THREADS",
+        max(1, (os.cpu_count() or 1) // cpu_executor.max_workers)
+    )
+    torch.set_num_threads(num_threads)
+    logger.info(f"torch intra-op threads set to {num_threads}")
+
+# CPU 密集型任务：NER 推理、查询向量化与向量检索
+cpu_executor = BoundedExecutor(
+    "cpu",
+    max_workers=_env_int("CPU_POOL_WORKERS", 2),
+    max_queue=_env_int("CPU_POOL_QUEUE", 64)
+)
+
+# 混合检索中与稠密检索并发执行的稀疏检索：由 CPU 线程池中的请求提交并同步等待，
+# 所有 StdService 实例共用，默认与 CPU 线程池同样大小
+sparse_search_executor = ThreadPoolExecutor(
+    max_workers=_env_int("SPARSE_POOL_WORKERS", cpu_executor.max_workers),
+    thread_name_prefix="sparse-search"
+)
+
+# I/O 密集型任务：Ollama / OpenAI 等 LLM 调用
+llm_executor = BoundedExecutor(
+    "llm",
+    max_workers=_env_int("LLM_POOL_WORKERS", 8),
+    max_queue=_env_int("LLM_POOL_QUEUE", 32)
+)
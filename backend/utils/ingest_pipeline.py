@@ -0,0 +1,148 @@
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+import logging
+import queue
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# 队列结束标记
+_DONE = object()
+
+@dataclass
+class StageStats:
+    """单个流水线阶段的统计：处理的批次数、行数、各 worker 忙碌时间之和与失败批次数"""
+    name: str
+    workers: int = 1
+    batches: int = 0
+    rows: int = 0
+    busy_seconds: float = 0.0
+    errors: int = 0
+
+    @property
+    def rows_per_second(self) -> float:
+        """按阶段忙碌时间计算的吞吐（多 worker 时为各 worker 吞吐之和）"""
+        return self.rows / self.busy_seconds * self.workers if self.busy_seconds else 0.0
+
+    def as_dict(self) -> Dict:
+        return {
+            "stage": self.name,
+            "workers": self.workers,
+            "batches": self.batches,
+            "rows": self.rows,
+            "busy_seconds": round(self.busy_seconds, 3),
+            "rows_per_second": round(self.rows_per_second, 1),
+            "errors": self.errors,
+        }
+
+def run_pipeline(source: Iterable[Dict],
+                 stages: List[Tuple[str, Callable[[Dict], Optional[Dict]], int]],
+                 queue_size: int = 4) -> Tuple[List[StageStats], float]:
+    """
+    以多线程流水线方式处理批次：读取、嵌入、写入等阶段并发执行，阶段之间用有界队列连接，
+    下游较慢时上游阻塞等待，内存中最多同时存在约 queue_size * 阶段数 个批次
+
+    Args:
+        source: 批次迭代器（如分块读取 CSV），每个批次为字典，"size" 为行数
+        stages: (阶段名, 处理函数, worker 数) 列表；处理函数返回下游批次，返回 None 则丢弃该批次。
+            处理函数抛出异常时记录错误并跳过该批次，不中断整个流水线
+        queue_size: 相邻阶段之间队列的最大批次数
+
+    Returns:
+        (各阶段统计，含读取阶段; 总耗时秒数)
+
+    Raises:
+        读取 source 时的异常，在已读取的批次处理完之后抛出
+    """
+    read_stats = StageStats("read")
+    all_stats = [read_stats] + [StageStats(name, workers) for name, _, workers in stages]
+    queues = [queue.Queue(maxsize=queue_size) for _ in stages]
+    stats_lock = threading.Lock()
+    start = time.perf_counter()
+
+    source_errors = []
+
+    def read():
+        # 读取失败（如 CSV 格式错误）时仍通知下游结束，已读取的批次照常处理完
+        try:
+            iterator = iter(source)
+            while True:
+                t0 = time.perf_counter()
+                try:
+                    batch = next(iterator)
+                except StopIteration:
+                    break
+                read_stats.busy_seconds += time.perf_counter() - t0
+                read_stats.batches += 1
+                read_stats.rows += batch.get("size", 0)
+                queues[0].put(batch)
+        except Exception as e:
+            source_errors.append(e)
+        finally:
+            for _ in range(stages[0][2]):
+                queues[0].put(_DONE)
+
+    def make_worker(index: int):
+        name, func, _ = stages[index]
+        stats = all_stats[index + 1]
+        in_queue = queues[index]
+        out_queue = queues[index + 1] if index + 1 < len(stages) else None
+        remaining = {"workers": stats.workers}
+
+        def work():
+            while True:
+                batch = in_queue.get()
+                if batch is _DONE:
+                    break
+                t0 = time.perf_counter()
+                try:
+                    result = func(batch)
+                    error = False
+                except Exception as e:
+                    logger.error(f"Stage {name} failed on a batch of {batch.get('size', 0)} rows: {e}")
+                    result, error = None, True
+                elapsed = time.perf_counter() - t0
+                with stats_lock:
+                    stats.busy_seconds += elapsed
+                    stats.batches += 1
+                    stats.errors += error
+                    if not error:
+                        stats.rows += batch.get("size", 0)
+                if result is not None and out_queue is not None:
+                    out_queue.put(result)
+            # 本阶段最后一个结束的 worker 通知下游阶段的每个 worker
+            with stats_lock:
+                remaining["workers"] -= 1
+                last = remaining["workers"] == 0
+            if last and out_queue is not None:
+                for _ in range(stages[index + 1][2]):
+                    out_queue.put(_DONE)
+        return work
+
+    threads = [threading.Thread(target=read, name="ingest-read", daemon=True)]
+    for index, (name, _, workers) in enumerate(stages):
+        work = make_worker(index)
+        threads.extend(
+            threading.Thread(target=work, name=f"ingest-{name}-{worker}", daemon=True)
+            for worker in range(workers)
+        )
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if source_errors:
+        raise source_errors[0]
+    return all_stats, time.perf_counter() - start
+
+def log_stage_stats(stats: List[StageStats], elapsed: float):
+    """输出各阶段吞吐，瓶颈阶段为单 worker 平均忙碌时间最长的阶段"""
+    bottleneck = max(stats, key=lambda s: s.busy_seconds / s.workers)
+    for stage in stats:
+        marker = " <- bottleneck" if stage is bottleneck else ""
+        logger.info(
+            f"[{stage.name}] workers={stage.workers} batches={stage.batches} rows={stage.rows} "
+            f"busy={stage.busy_seconds:.1f}s rows/s={stage.rows_per_second:.1f} errors={stage.errors}{marker}"
+        )
+    total_rows = stats[-1].rows
+    logger.info(f"Pipeline finished: {total_rows} rows in {elapsed:.1f}s ({total_rows / elapsed if elapsed else 0:.1f} rows/s end-to-end)")
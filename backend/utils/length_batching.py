@@ -0,0 +1,110 @@
+from typing import Callable, Dict, List, Optional
+import re
+import time
+
+import numpy as np
+
+_APPROX_TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+
+def approx_token_lengths(docs: List[str]) -> List[int]:
+    """没有分词器时按词与标点个数估算长度（另加 CLS/SEP 两个特殊符号）"""
+    return [len(_APPROX_TOKEN_RE.findall(doc)) + 2 for doc in docs]
+
+def tokenizer_lengths(tokenizer, max_length: int = 512) -> Callable[[List[str]], List[int]]:
+    """用模型自己的分词器计算截断后的长度（含特殊符号）"""
+    def lengths(docs: List[str]) -> List[int]:
+        return [len(ids) for ids in tokenizer(docs, truncation=True, max_length=max_length)["input_ids"]]
+    return lengths
+
+def plan_batches(lengths, max_tokens: int, max_batch_size: int) -> List[np.ndarray]:
+    """
+    按长度排序后贪心切分批次：每批补齐后的 token 数（批大小 x 批内最大长度）不超过 max_tokens，
+    短文本因此可以组成更大的批，长文本的批更小；单条超过预算的文本单独成批
+
+    Returns:
+        每个批次在输入中的下标
+    """
+    lengths = np.asarray(lengths)
+    order = np.argsort(lengths, kind="stable")
+    batches, start = [], 0
+    for end in range(1, len(order) + 1):
+        # 升序排列，批内最大长度就是最后一条的长度
+        size = end - start
+        if size > 1 and (size > max_batch_size or size * lengths[order[end - 1]] > max_tokens):
+            batches.append(order[start:end - 1])
+            start = end - 1
+    if start < len(order):
+        batches.append(order[start:])
+    return batches
+
+def fixed_batches(n: int, batch_size: int) -> List[np.ndarray]:
+    """按输入顺序每 batch_size 条一批（原来的做法），用于对比补齐比例"""
+    return [np.arange(start, min(start + batch_size, n)) for start in range(0, n, batch_size)]
+
+def padded_tokens(lengths, batches: List[np.ndarray]) -> int:
+    lengths = np.asarray(lengths)
+    return int(sum(len(batch) * lengths[batch].max() for batch in batches if len(batch)))
+
+class LengthBucketedEmbeddingFunction:
+    """
+    包装建库脚本的嵌入函数（输入文档列表，输出向量矩阵）：
+    按分词长度排序、按 token 预算切批后逐批调用模型，再按原顺序拼回结果。
+    被包装的函数应把每次传入的列表作为一个前向批次（模型自身的 batch_size 不小于 max_batch_size）
+    """
+    def __init__(self,
+                 embedding_function: Callable[[List[str]], np.ndarray],
+                 length_function: Optional[Callable[[List[str]], List[int]]] = None,
+                 max_tokens: int = 16384,
+                 max_batch_size: int = 256,
+                 baseline_batch_size: int = 32):
+        """
+        Args:
+            embedding_function: 被包装的嵌入函数
+            length_function: 计算每篇文档 token 数的函数，为 None 时按词数估算
+            max_tokens: 每批补齐后的 token 预算
+            max_batch_size: 每批最多的文档数
+            baseline_batch_size: 对比用的按顺序定长批大小（模型默认的 batch_size）
+        """
+        self.embedding_function = embedding_function
+        self.length_function = length_function or approx_token_lengths
+        self.max_tokens = max_tokens
+        self.max_batch_size = max_batch_size
+        self.baseline_batch_size = baseline_batch_size
+        self.rows = 0
+        self.batches = 0
+        self.real_tokens = 0
+        self.padded_tokens = 0
+        self.baseline_padded_tokens = 0
+        self.seconds = 0.0
+
+    def __call__(self, docs: List[str]) -> np.ndarray:
+        if not docs:
+            return np.zeros((0, 0), dtype=np.float32)
+        start = time.perf_counter()
+        lengths = np.asarray(self.length_function(docs))
+        batches = plan_batches(lengths, self.max_tokens, self.max_batch_size)
+        result = None
+        for batch in batches:
+            vectors = np.asarray(self.embedding_function([docs[idx] for idx in batch]), dtype=np.float32)
+            if result is None:
+                result = np.empty((len(docs), vectors.shape[1]), dtype=np.float32)
+            result[batch] = vectors
+
+        self.seconds += time.perf_counter() - start
+        self.rows += len(docs)
+        self.batches += len(batches)
+        self.real_tokens += int(lengths.sum())
+        self.padded_tokens += padded_tokens(lengths, batches)
+        self.baseline_padded_tokens += padded_tokens(lengths, fixed_batches(len(docs), self.baseline_batch_size))
+        return result
+
+    def stats(self) -> Dict:
+        """补齐比例 = 补齐的 token 占计算的 token 的比例；baseline 为同样输入按顺序定长切批时的值"""
+        return {
+            "rows": self.rows,
+            "batches": self.batches,
+            "mean_batch_size": round(self.rows / self.batches, 1) if self.batches else 0.0,
+            "padding_ratio": round(1 - self.real_tokens / self.padded_tokens, 4) if self.padded_tokens else 0.0,
+            "baseline_padding_ratio": round(1 - self.real_tokens / self.baseline_padded_tokens, 4) if self.baseline_padded_tokens else 0.0,
+            "rows_per_second": round(self.rows / self.seconds, 1) if self.seconds else 0.0,
+        }
@@ -0,0 +1,114 @@
+from langchain_core.embeddings import Embeddings
+from typing import List, Optional
+import logging
+import os
+import platform
+import time
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+class OnnxEmbeddings(Embeddings):
+    """
+    通过 ONNX Runtime 在 CPU 上计算句向量
+    首次使用时用 optimum 把 Hugging Face 模型导出到 onnx_path，可选动态 int8 量化；
+    池化方式与 sentence-transformers 配置一致（bge-m3 为 CLS 池化 + L2 归一化），
+    因此向量与 HuggingFaceEmbeddings 建的集合兼容
+    """
+    def __init__(self,
+                 model_name: str,
+                 onnx_path: str,
+                 quantize: bool = True,
+                 num_threads: Optional[int] = None,
+                 pooling: str = "cls",
+                 normalize: bool = True,
+                 batch_size: int = 32,
+                 max_length: int = 512):
+        """
+        Args:
+            model_name: Hugging Face 模型名
+            onnx_path: 导出的 ONNX 模型目录，不存在时自动导出
+            quantize: 使用动态 int8 量化模型 model_quantized.onnx
+            num_threads: ONNX Runtime 算子内线程数，为 None 时由运行时决定
+            pooling: cls 或 mean
+            normalize: 输出向量做 L2 归一化
+            batch_size: 每次前向计算的文本数
+            max_length: 分词截断长度
+        """
+        from optimum.onnxruntime import ORTModelForFeatureExtraction
+        from transformers import AutoTokenizer
+        import onnxruntime
+
+        if pooling not in ("cls", "mean"):
+            raise ValueError(f"Unsupported pooling: {pooling}")
+        self.model_name = model_name
+        self.pooling = pooling
+        self.normalize = normalize
+        self.batch_size = batch_size
+        self.max_length = max_length
+
+        file_name = "model_quantized.onnx" if quantize else "model.onnx"
+        if not os.path.exists(os.path.join(onnx_path, file_name)):
+            export_onnx_model(model_name, onnx_path, quantize)
+
+        session_options = onnxruntime.SessionOptions()
+        if num_threads:
+            session_options.intra_op_num_threads = num_threads
+        self.model = ORTModelForFeatureExtraction.from_pretrained(
+            onnx_path,
+            file_name=file_name,
+            session_options=session_options,
+            provider="CPUExecutionProvider"
+        )
+        self.tokenizer = AutoTokenizer.from_pretrained(onnx_path)
+        logger.info(f"Loaded ONNX embedding model {os.path.join(onnx_path, file_name)}")
+
+    def _embed(self, texts: List[str]) -> List[List[float]]:
+        vectors = []
+        for start in range(0, len(texts), self.batch_size):
+            inputs = self.tokenizer(
+                texts[start:start + self.batch_size],
+                padding=True,
+                truncation=True,
+                max_length=self.max_length,
+                return_tensors="np"
+            )
+            hidden = np.asarray(self.model(**inputs).last_hidden_state, dtype=np.float32)
+            if self.pooling == "cls":
+                pooled = hidden[:, 0]
+            else:
+                mask = inputs["attention_mask"][..., None].astype(np.float32)
+                pooled = (hidden * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+            if self.normalize:
+                pooled = pooled / np.maximum(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12)
+            vectors.extend(pooled.tolist())
+        return vectors
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._embed(list(texts))
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed([text])[0]
+
+def export_onnx_model(model_name: str, onnx_path: str, quantize: bool = True):
+    """导出特征抽取 ONNX 模型并按当前 CPU 指令集做动态 int8 量化"""
+    from optimum.onnxruntime import ORTModelForFeatureExtraction, ORTQuantizer
+    from optimum.onnxruntime.configuration import AutoQuantizationConfig
+    from transformers import AutoTokenizer
+
+    start = time.perf_counter()
+    ORTModelForFeatureExtraction.from_pretrained(model_name, export=True).save_pretrained(onnx_path)
+    AutoTokenizer.from_pretrained(model_name).save_pretrained(onnx_path)
+    logger.info(f"Exported {model_name} to {onnx_path} in {time.perf_counter() - start:.1f}s")
+    if not quantize:
+        return
+
+    start = time.perf_counter()
+    if platform.machine().lower() in ("arm64", "aarch64"):
+        qconfig = AutoQuantizationConfig.arm64(is_static=False, per_channel=False)
+    else:
+        qconfig = AutoQuantizationConfig.avx2(is_static=False, per_channel=False)
+    quantizer = ORTQuantizer.from_pretrained(onnx_path, file_name="model.onnx")
+    quantizer.quantize(save_dir=onnx_path, quantization_config=qconfig)
+    logger.info(f"Quantized {model_name} to int8 in {time.perf_counter() - start:.1f}s")
@@ -0,0 +1,82 @@
+from typing import Dict, Tuple
+
+import numpy as np
+
+# 支持的向量存储精度
+VECTOR_DTYPES = ("float32", "float16", "int8", "binary")
+
+# 压缩表示检索时默认取 limit * 因子 个候选，再用全精度向量重排
+DEFAULT_RERANK_FACTORS = {"float32": 1, "float16": 2, "int8": 4, "binary": 10}
+
+# 分块计算得分，避免把整块压缩码一次性展开为 float32
+_BLOCK_ROWS = 8192
+
+def quantize(vectors: np.ndarray, vector_dtype: str) -> Tuple[np.ndarray, Dict]:
+    """
+    把归一化后的 float32 向量压缩为指定精度
+    按块处理，vectors 可以是 mmap 数组，除压缩码外只占用一块的临时内存
+
+    Returns:
+        (压缩码, 反量化所需参数)
+        - float16: 直接转为半精度
+        - int8: 按维度对称标量量化，参数为每维缩放系数
+        - binary: 按符号位打包，每 8 维占 1 字节
+    """
+    if vector_dtype == "float32":
+        return np.asarray(vectors, dtype=np.float32), {}
+    if vector_dtype not in ("float16", "int8", "binary"):
+        raise ValueError(f"Unsupported vector dtype: {vector_dtype}")
+    rows, dim = vectors.shape
+    params = {}
+    if vector_dtype == "float16":
+        codes = np.empty((rows, dim), dtype=np.float16)
+    elif vector_dtype == "int8":
+        max_abs = np.zeros(dim, dtype=np.float32)
+        for start in range(0, rows, _BLOCK_ROWS):
+            block = np.asarray(vectors[start:start + _BLOCK_ROWS], dtype=np.float32)
+            np.maximum(max_abs, np.abs(block).max(axis=0), out=max_abs)
+        scale = max_abs / 127.0 if rows else np.ones(dim, dtype=np.float32)
+        scale = np.maximum(scale, 1e-12).astype(np.float32)
+        codes = np.empty((rows, dim), dtype=np.int8)
+        params = {"scale": scale.tolist()}
+    else:
+        codes = np.empty((rows, (dim + 7) // 8), dtype=np.uint8)
+        params = {"dim": int(dim)}
+    for start in range(0, rows, _BLOCK_ROWS):
+        block = np.asarray(vectors[start:start + _BLOCK_ROWS], dtype=np.float32)
+        if vector_dtype == "float16":
+            codes[start:start + len(block)] = block.astype(np.float16)
+        elif vector_dtype == "int8":
+            codes[start:start + len(block)] = np.clip(np.rint(block / scale), -127, 127).astype(np.int8)
+        else:
+            codes[start:start + len(block)] = np.packbits(block > 0, axis=1)
+    return codes, params
+
+def score_codes(queries: np.ndarray, codes: np.ndarray, vector_dtype: str, params: Dict) -> np.ndarray:
+    """
+    用压缩码计算查询与所有向量的近似内积得分（非对称：查询保持全精度）
+
+    Returns:
+        形状为 (查询数, 向量数) 的 float32 得分矩阵
+    """
+    queries = np.asarray(queries, dtype=np.float32)
+    if vector_dtype == "float32":
+        return queries @ codes.T
+    if vector_dtype == "int8":
+        # (q * scale) · codes 等价于 q · 反量化向量
+        queries = queries * np.asarray(params["scale"], dtype=np.float32)
+
+    scores = np.empty((len(queries), len(codes)), dtype=np.float32)
+    for start in range(0, len(codes), _BLOCK_ROWS):
+        block = codes[start:start + _BLOCK_ROWS]
+        if vector_dtype == "binary":
+            bits = np.unpackbits(block, axis=1, count=params["dim"])
+            block = bits.astype(np.float32) * 2.0 - 1.0
+        else:
+            block = block.astype(np.float32)
+        scores[:, start:start + len(block)] = queries @ block.T
+    return scores
+
+def code_nbytes(codes: np.ndarray) -> int:
+    """压缩码常驻内存大小（字节）"""
+    return int(codes.nbytes)
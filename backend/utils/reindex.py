@@ -0,0 +1,80 @@
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Tuple
+import hashlib
+
+# 增量建库时每行额外保存的两个标量字段：术语稳定键与内容哈希（均为 32 位十六进制串）
+KEY_FIELD = "term_key"
+HASH_FIELD = "content_hash"
+HASH_LENGTH = 32
+
+def _digest(*parts: str) -> str:
+    # \x1f（单元分隔符）不会出现在术语文本中，避免 ("a b", "c") 与 ("a", "b c") 拼接后相同
+    return hashlib.blake2b("\x1f".join(parts).encode("utf-8"), digest_size=HASH_LENGTH // 2).hexdigest()
+
+def term_key(*identity: str) -> str:
+    """由术语的身份字段（如术语名 + 领域）计算稳定键，同一术语在每次建库中的键不变"""
+    return _digest(*identity)
+
+def content_hash(model: str, document: str, *values: str) -> str:
+    """由嵌入模型、待嵌入文本与写入的标量字段计算内容哈希，任一变化都需要重新嵌入并写入"""
+    return _digest(model, document, *values)
+
+@dataclass
+class TermDiff:
+    """
+    术语表与集合已有内容的差异
+    new / changed 为需要嵌入写入的术语键；stale_ids 为需要删除的旧行主键，
+    包括变更术语的旧行、已从术语表移除的术语以及集合中重复的行
+    """
+    new: List[str] = field(default_factory=list)
+    changed: List[str] = field(default_factory=list)
+    removed: List[str] = field(default_factory=list)
+    unchanged: int = 0
+    duplicates: int = 0
+    stale_ids: List[int] = field(default_factory=list)
+
+    @property
+    def to_embed(self) -> set:
+        return set(self.new) | set(self.changed)
+
+    def summary(self) -> Dict:
+        return {
+            "new": len(self.new),
+            "changed": len(self.changed),
+            "removed": len(self.removed),
+            "unchanged": self.unchanged,
+            "duplicate_rows": self.duplicates,
+            "rows_to_delete": len(self.stale_ids),
+        }
+
+def diff_terms(incoming: Dict[str, str], existing: Iterable[Dict]) -> TermDiff:
+    """
+    对比术语表与集合中的行
+
+    Args:
+        incoming: 术语表中的 {术语键: 内容哈希}
+        existing: 集合中的行（VectorStore.scan 的结果），含 id、term_key 与 content_hash
+    """
+    stored: Dict[str, List[Tuple[int, str]]] = {}
+    for row in existing:
+        stored.setdefault(row.get(KEY_FIELD), []).append((row["id"], row.get(HASH_FIELD)))
+
+    diff = TermDiff()
+    for key, digest in incoming.items():
+        rows = stored.get(key)
+        if not rows:
+            diff.new.append(key)
+            continue
+        # 同一术语有多行时（如中断的运行留下新旧两行）保留与当前内容一致的一行，其余删除
+        current = next((row_id for row_id, row_hash in rows if row_hash == digest), None)
+        if current is None:
+            diff.changed.append(key)
+        else:
+            diff.unchanged += 1
+            diff.duplicates += len(rows) - 1
+        diff.stale_ids.extend(row_id for row_id, _ in rows if row_id != current)
+    for key, rows in stored.items():
+        if key not in incoming:
+            diff.removed.append(key)
+            diff.stale_ids.extend(row_id for row_id, _ in rows)
+    return diff
@@ -0,0 +1,125 @@
+from typing import Dict, List, Optional
+import logging
+import multiprocessing
+import os
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+def embedding_model_id(provider: str, model_name: str) -> str:
+    """建库向量的模型标识（嵌入产物缓存按它分目录），ONNX 提供商区分是否 int8 量化"""
+    if provider == "huggingface-onnx":
+        from utils.embedding_config import EmbeddingConfig, EmbeddingProvider
+
+        return EmbeddingConfig(provider=EmbeddingProvider.HUGGINGFACE_ONNX, model_name=model_name).model_id
+    return f"sentence-transformers:{model_name}"
+
+def build_embedding_function(spec: Dict, num_threads: Optional[int] = None):
+    """
+    在工作进程中按 spec 构造 CPU 嵌入函数（输入文档列表，输出向量矩阵）
+
+    Args:
+        spec: provider、model_name，以及可选的 length_buckets / max_batch_tokens / max_batch_size
+        num_threads: 算子内线程数
+    """
+    from utils.length_batching import LengthBucketedEmbeddingFunction, tokenizer_lengths
+
+    max_batch_size = spec.get("max_batch_size", 256)
+    if spec["provider"] == "huggingface-onnx":
+        from utils.embedding_config import EmbeddingConfig, EmbeddingProvider
+        from utils.embedding_factory import EmbeddingFactory
+
+        onnx_embeddings = EmbeddingFactory._create_base_embedding_function(EmbeddingConfig(
+            provider=EmbeddingProvider.HUGGINGFACE_ONNX, model_name=spec["model_name"], onnx_threads=num_threads
+        ))
+        function = lambda docs: np.asarray(onnx_embeddings.embed_documents(docs), dtype=np.float32)
+        model_batch_size = onnx_embeddings.batch_size
+        tokenizer, max_length = onnx_embeddings.tokenizer, onnx_embeddings.max_length
+        if spec.get("length_buckets"):
+            onnx_embeddings.batch_size = max_batch_size
+    else:
+        from pymilvus import model
+
+        function = model.dense.SentenceTransformerEmbeddingFunction(
+            model_name=spec["model_name"], device="cpu", trust_remote_code=True
+        )
+        model_batch_size = function.batch_size
+        tokenizer, max_length = function.model.tokenizer, function.model.max_seq_length
+        if spec.get("length_buckets"):
+            function.batch_size = max_batch_size
+
+    if spec.get("length_buckets"):
+        function = LengthBucketedEmbeddingFunction(
+            function,
+            tokenizer_lengths(tokenizer, max_length),
+            max_tokens=spec.get("max_batch_tokens", 16384),
+            max_batch_size=max_batch_size,
+            baseline_batch_size=model_batch_size
+        )
+    return function
+
+# 工作进程内的嵌入函数，由 _init_worker 构造
+_worker_function = None
+
+def _init_worker(spec: Dict, num_threads: int, counter, pin_cores: bool):
+    global _worker_function
+
+    with counter.get_lock():
+        index = counter.value
+        counter.value += 1
+    # 固定每个进程的线程数，避免 N 个进程各自按全部核数开线程而互相争抢
+    for name in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+        os.environ[name] = str(num_threads)
+    try:
+        import torch
+
+        torch.set_num_threads(num_threads)
+        torch.set_num_interop_threads(1)
+    except (ImportError, RuntimeError):
+        pass
+    if pin_cores and hasattr(os, "sched_setaffinity"):
+        cores = sorted(os.sched_getaffinity(0))
+        assigned = cores[index * num_threads:(index + 1) * num_threads]
+        if assigned:
+            os.sched_setaffinity(0, assigned)
+    _worker_function = build_embedding_function(spec, num_threads)
+    logger.info(f"Embedding worker {index} (pid {os.getpid()}) ready with {num_threads} threads")
+
+def _embed_shard(docs: List[str]) -> np.ndarray:
+    return np.asarray(_worker_function(docs), dtype=np.float32)
+
+class ShardedEmbeddingFunction:
+    """
+    多进程分片嵌入：每次调用把文档按行切成 workers 段连续区间，
+    由各自加载了模型的工作进程并行计算，再按原顺序拼接，调用方看到的仍是单个嵌入函数。
+    工作进程以 fork 方式在构造时全部启动，应在连接向量存储 / 图数据库以及建库流水线的线程启动之前创建，
+    否则子进程会继承 gRPC 等库的后台线程所持有的锁
+    """
+    def __init__(self, spec: Dict, workers: int, threads_per_worker: Optional[int] = None, pin_cores: bool = False):
+        """
+        Args:
+            spec: 传给 build_embedding_function 的模型配置
+            workers: 工作进程数
+            threads_per_worker: 每个进程的线程数，默认平分 CPU 核数
+            pin_cores: 把每个进程绑定到各自的一组 CPU 核上（仅 Linux）
+        """
+        self.workers = workers
+        self.threads_per_worker = threads_per_worker or max(1, (os.cpu_count() or 1) // workers)
+        self.model_id = embedding_model_id(spec["provider"], spec["model_name"])
+        context = multiprocessing.get_context("fork")
+        self._pool = context.Pool(
+            workers,
+            initializer=_init_worker,
+            initargs=(spec, self.threads_per_worker, context.Value("i", 0), pin_cores)
+        )
+        logger.info(f"Started {workers} embedding workers with {self.threads_per_worker} threads each")
+
+    def __call__(self, docs: List[str]) -> np.ndarray:
+        shards = [shard for shard in np.array_split(np.arange(len(docs)), self.workers) if len(shard)]
+        results = self._pool.map(_embed_shard, [[docs[idx] for idx in shard] for shard in shards], chunksize=1)
+        return np.concatenate(results) if results else np.zeros((0, 0), dtype=np.float32)
+
+    def close(self):
+        self._pool.close()
+        self._pool.join()
@@ -0,0 +1,84 @@
+from collections import Counter
+from typing import Dict, Iterable, List
+import json
+import math
+import os
+import re
+
+# 小写字母数字串，保留评级类写法末尾的 +/-（如 "a+", "bb-"）
+_TOKEN_RE = re.compile(r"[0-9a-z]+[+\-]*")
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN_RE.findall(text.casefold())
+
+class BM25SparseEncoder:
+    """
+    BM25 稀疏向量编码器
+    文档侧权重为完整的 BM25 词项得分，查询侧每个词权重为 1，
+    因此查询向量与文档向量的内积即为 BM25 得分，可直接用稀疏 IP 检索
+    """
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.vocabulary: Dict[str, int] = {}
+        self.idf: List[float] = []
+        self.avg_doc_len = 0.0
+
+    def fit(self, documents: Iterable[str]) -> "BM25SparseEncoder":
+        doc_freq = Counter()
+        n_docs, total_len = 0, 0
+        for document in documents:
+            tokens = tokenize(document)
+            n_docs += 1
+            total_len += len(tokens)
+            doc_freq.update(set(tokens))
+
+        self.vocabulary = {token: idx for idx, token in enumerate(sorted(doc_freq))}
+        self.idf = [
+            math.log(1 + (n_docs - doc_freq[token] + 0.5) / (doc_freq[token] + 0.5))
+            for token in sorted(doc_freq)
+        ]
+        self.avg_doc_len = total_len / n_docs if n_docs else 0.0
+        return self
+
+    def encode_documents(self, documents: List[str]) -> List[Dict[int, float]]:
+        vectors = []
+        for document in documents:
+            tokens = tokenize(document)
+            norm = self.k1 * (1 - self.b + self.b * len(tokens) / self.avg_doc_len) if self.avg_doc_len else self.k1
+            vector = {}
+            for token, tf in Counter(tokens).items():
+                idx = self.vocabulary.get(token)
+                if idx is not None:
+                    vector[idx] = self.idf[idx] * tf * (self.k1 + 1) / (tf + norm)
+            vectors.append(vector)
+        return vectors
+
+    def encode_queries(self, queries: List[str]) -> List[Dict[int, float]]:
+        return [
+            {self.vocabulary[token]: 1.0 for token in set(tokenize(query)) if token in self.vocabulary}
+            for query in queries
+        ]
+
+    def save(self, path: str):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({
+                "k1": self.k1,
+                "b": self.b,
+                "avg_doc_len": self.avg_doc_len,
+                "vocabulary": self.vocabulary,
+                "idf": self.idf
+            }, f, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, path: str) -> "BM25SparseEncoder":
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        encoder = cls(k1=data["k1"], b=data["b"])
+        encoder.avg_doc_len = data["avg_doc_len"]
+        encoder.vocabulary = data["vocabulary"]
+        encoder.idf = data["idf"]
+        return encoder
@@ -0,0 +1,130 @@
+from abc import ABC, abstractmethod
+from typing import Dict, Iterable, List, Optional
+import csv
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# RF2 描述文件的 typeId 到 SNOMED_G descriptionType 的对应
+RF2_DESCRIPTION_TYPES = {
+    "900000000000003001": "FSN",
+    "900000000000013009": "Synonym",
+    "900000000000550004": "Definition",
+}
+
+class SynonymProvider(ABC):
+    """
+    SNOMED 概念描述（同义词）来源
+    get_many 按批次取一组概念编码的描述，运行期间记住已取过的结果；
+    每个概念的描述按 descriptionType 排序，与逐条查询 Neo4j 时的顺序一致
+    """
+    def __init__(self):
+        self._memo: Dict[str, List[str]] = {}
+        self.queries = 0
+        self.memo_hits = 0
+        self.missing = 0
+        self.seconds = 0.0
+
+    def get_many(self, concept_codes: Iterable[str]) -> Dict[str, List[str]]:
+        """返回 {概念编码: 描述列表}，找不到的概念对应空列表"""
+        codes = list(dict.fromkeys(concept_codes))
+        todo = [code for code in codes if code not in self._memo]
+        self.memo_hits += len(codes) - len(todo)
+        if todo:
+            start = time.perf_counter()
+            found = self._fetch(todo)
+            self.seconds += time.perf_counter() - start
+            not_found = [code for code in todo if code not in found]
+            if not_found:
+                self.missing += len(not_found)
+                logger.warning(f"{len(not_found)} of {len(todo)} concepts not found in {self.name}")
+                logger.debug(f"Concepts not found: {not_found}")
+            for code in todo:
+                self._memo[code] = found.get(code, [])
+        return {code: self._memo[code] for code in codes}
+
+    @property
+    def name(self) -> str:
+        return type(self).__name__
+
+    @abstractmethod
+    def _fetch(self, concept_codes: List[str]) -> Dict[str, List[str]]:
+        """取一批未缓存的概念的描述，不存在的概念不出现在结果中"""
+
+    def stats(self) -> Dict:
+        return {
+            "provider": self.name,
+            "queries": self.queries,
+            "concepts": len(self._memo),
+            "missing": self.missing,
+            "memo_hits": self.memo_hits,
+            "seconds": round(self.seconds, 3),
+        }
+
+    def close(self):
+        """释放连接"""
+
+class Neo4jSynonymProvider(SynonymProvider):
+    """每批概念只做一次 UNWIND 查询"""
+    QUERY = """
+        UNWIND $codes AS code
+        MATCH (c:ObjectConcept {id: code})
+        OPTIONAL MATCH (c)-[:HAS_DESCRIPTION]->(d:Description)
+        WITH c, d ORDER BY d.descriptionType
+        RETURN c.id AS code, [term IN collect(d.term) WHERE term IS NOT NULL] AS terms
+    """
+
+    def __init__(self, driver):
+        super().__init__()
+        self.driver = driver
+
+    def _fetch(self, concept_codes):
+        with self.driver.session() as session:
+            result = session.run(self.QUERY, codes=concept_codes)
+            self.queries += 1
+            return {record["code"]: list(record["terms"]) for record in result}
+
+    def close(self):
+        self.driver.close()
+
+class OfflineSynonymProvider(SynonymProvider):
+    """
+    不依赖图数据库，直接读取 build.cypher 导入的描述文件：
+    SNOMED_G 的 descrip_new.csv（sctid / term / descriptionType 列），
+    或 RF2 的 sct2_Description_*.txt（制表符分隔，conceptId / typeId / term 列，typeId 映射为 FSN / Synonym / Definition）。
+    只保留 concept_codes 中的概念，避免把整套 SNOMED 描述读入内存
+    """
+    def __init__(self, path: str, concept_codes: Optional[Iterable[str]] = None):
+        super().__init__()
+        self.path = path
+        wanted = set(concept_codes) if concept_codes is not None else None
+        start = time.perf_counter()
+        descriptions: Dict[str, List] = {}
+        with open(path, newline="", encoding="utf-8") as f:
+            is_rf2 = "\t" in f.readline()
+            f.seek(0)
+            reader = csv.DictReader(f, delimiter="\t" if is_rf2 else ",", quoting=csv.QUOTE_NONE if is_rf2 else csv.QUOTE_MINIMAL)
+            for row in reader:
+                code = row["conceptId"] if is_rf2 else row["sctid"]
+                if wanted is not None and code not in wanted:
+                    continue
+                description_type = RF2_DESCRIPTION_TYPES.get(row["typeId"], row["typeId"]) if is_rf2 else row.get("descriptionType")
+                descriptions.setdefault(code, []).append((description_type or "", row["term"]))
+        # 与 Neo4j 查询的 ORDER BY d.descriptionType 一致（同类型内保持文件顺序）
+        self._descriptions = {
+            code: [term for _, term in sorted(items, key=lambda item: item[0])]
+            for code, items in descriptions.items()
+        }
+        self.load_seconds = time.perf_counter() - start
+        logger.info(f"Loaded descriptions of {len(self._descriptions)} concepts from {path} in {self.load_seconds:.1f}s")
+
+    @property
+    def name(self) -> str:
+        return f"{type(self).__name__}({self.path})"
+
+    def _fetch(self, concept_codes):
+        return {code: self._descriptions[code] for code in concept_codes if code in self._descriptions}
+
+    def stats(self) -> Dict:
+        return {**super().stats(), "load_seconds": round(self.load_seconds, 3)}
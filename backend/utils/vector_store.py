@@ -0,0 +1,963 @@
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, Iterator, List, Optional
+import json
+import logging
+import os
+import re
+import threading
+
+import numpy as np
+
+from utils.quantization import VECTOR_DTYPES, DEFAULT_RERANK_FACTORS, quantize, score_codes
+
+# 本地存储的默认位置固定在 backend/db 下，与启动目录无关：
+# 服务从 backend/ 启动，建库工具从仓库根目录运行，两者读写的是同一份数据
+DEFAULT_DB_DIR = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "db"))
+DEFAULT_MILVUS_LITE_PATH = os.path.join(DEFAULT_DB_DIR, "snomed_bge_m3.db")
+DEFAULT_NUMPY_DIR = os.path.join(DEFAULT_DB_DIR, "numpy")
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class CollectionSpec:
+    """
+    与后端无关的集合定义
+    向量字段固定名为 vector，主键 id 自增；scalar_fields 为 VARCHAR 字段名到最大长度的映射；
+    vector_dtype 为向量存储精度：float32 / float16 / int8 / binary；
+    sparse 为 True 时另建稀疏向量字段 sparse_vector（{词项下标: 权重}，内积度量），
+    供混合检索的词法召回使用
+    """
+    dim: int
+    scalar_fields: Dict[str, int]
+    description: str = ""
+    metric_type: str = "COSINE"
+    index_type: str = "AUTOINDEX"
+    index_params: Dict = field(default_factory=dict)
+    vector_dtype: str = "float32"
+    sparse: bool = False
+
+class VectorStore(ABC):
+    """
+    向量存储接口
+    StdService 与 tools 下的建库脚本都通过该接口访问向量数据，
+    search 返回的命中格式与 MilvusClient.search 保持一致：
+    {"id": ..., "distance": ..., "entity": {字段: 值}}
+    """
+    @abstractmethod
+    def has_collection(self, collection_name: str) -> bool:
+        ...
+
+    @abstractmethod
+    def create_collection(self, collection_name: str, spec: CollectionSpec):
+        ...
+
+    @abstractmethod
+    def drop_collection(self, collection_name: str):
+        ...
+
+    @abstractmethod
+    def insert(self, collection_name: str, rows: List[Dict]) -> int:
+        """插入若干行，每行包含 vector 与标量字段（稀疏集合另含 sparse_vector），返回插入行数"""
+
+    def flush(self, collection_name: str):
+        """把已插入的数据持久化"""
+
+    def load(self, collection_name: str):
+        """把集合加载到内存以供检索"""
+
+    def release(self, collection_name: str):
+        """释放集合占用的内存"""
+
+    def index_type(self, collection_name: str) -> str:
+        """返回集合向量字段的索引类型，用于校验检索参数"""
+        return "FLAT"
+
+    def has_sparse(self, collection_name: str) -> bool:
+        """集合是否带有稀疏向量字段"""
+        return False
+
+    def get_metadata(self, collection_name: str) -> Dict:
+        """读取建库时写入的集合级元数据（如降维投影），没有时返回空字典"""
+        return {}
+
+    def set_metadata(self, collection_name: str, metadata: Dict):
+        """写入可 JSON 序列化的集合级元数据"""
+        raise NotImplementedError(f"{type(self).__name__} does not support collection metadata")
+
+    def scan(self, collection_name: str, output_fields: List[str], batch_size: int = 1000) -> Iterator[Dict]:
+        """逐行遍历已持久化的数据，每行为 {"id": 主键, 字段: 值}，供增量建库对比已有内容"""
+        raise NotImplementedError(f"{type(self).__name__} does not support scanning")
+
+    def delete(self, collection_name: str, ids: Iterable[int]) -> int:
+        """按主键删除行，返回删除的行数"""
+        raise NotImplementedError(f"{type(self).__name__} does not support deletion")
+
+    def bulk_load(self, collection_name: str, artifact_dir: str, remote_prefix: Optional[str] = None, batch_size: int = 10000) -> int:
+        """
+        导入 BulkArtifactWriter 写出的列式产物，返回导入行数
+        默认按大批量逐批 insert 后 flush；支持文件级导入的后端覆盖该方法
+
+        Args:
+            artifact_dir: 本地产物目录（含 manifest.json）
+            remote_prefix: 产物在服务端对象存储中的路径前缀，仅 Milvus 服务端使用
+        """
+        from utils.bulk_artifacts import iter_rows
+
+        total = 0
+        for rows in iter_rows(artifact_dir, batch_size):
+            total += self.insert(collection_name, rows)
+        self.flush(collection_name)
+        return total
+
+    def sparse_search(self,
+                      collection_name: str,
+                      sparse_vectors: List[Dict[int, float]],
+                      limit: int,
+                      output_fields: List[str],
+                      filter: Optional[str] = None) -> List[List[Dict]]:
+        """
+        稀疏向量内积检索，命中格式同 search；只返回得分大于 0 的行
+
+        Args:
+            sparse_vectors: 查询稀疏向量，{词项下标: 权重}
+        """
+        raise NotImplementedError(f"{type(self).__name__} does not support sparse search")
+
+    @abstractmethod
+    def search(self,
+               collection_name: str,
+               vectors: List[List[float]],
+               limit: int,
+               output_fields: List[str],
+               filter: Optional[str] = None,
+               search_params: Optional[Dict] = None) -> List[List[Dict]]:
+        """
+        向量检索
+
+        Args:
+            filter: 标量过滤表达式，如 domain_name == "FINTERM"
+            search_params: 扁平的索引检索参数，如 {"nprobe": 32}、{"ef": 64}、
+                {"radius": 0.5}、{"rerank_factor": 4}
+        """
+
+    def supports_rerank(self, collection_name: str) -> bool:
+        """集合是否以压缩精度检索并保存了全精度向量，可按 rerank_factor 重排"""
+        return False
+
+    def close(self):
+        """关闭连接"""
+
+class MilvusVectorStore(VectorStore):
+    """
+    Milvus 服务端后端（uri 形如 tcp://localhost:19530）
+    float16 / int8 集合另存一份 float32 向量 vector_full（FLAT 索引，mmap 存储，不参与 ANN 检索）：
+    先在压缩向量上取 limit * rerank_factor 个候选并带回它们的 vector_full，再在客户端按全精度得分重排。
+    没有 vector_full 字段的旧集合只返回压缩向量上的近似结果
+    """
+    RERANK_FIELD = "vector_full"
+    # 全精度向量以 mmap 方式存储，不占用查询节点内存
+    MMAP_RERANK_FIELD = True
+
+    def __init__(self, uri: str = "tcp://localhost:19530"):
+        from pymilvus import MilvusClient
+
+        self.uri = uri
+        self.client = MilvusClient(uri)
+        self._vector_dtypes: Dict[str, str] = {}
+        self._index_types: Dict[str, str] = {}
+        self._sparse: Dict[str, bool] = {}
+        # 集合的重排配置 (压缩精度, 度量)，没有全精度向量时为 None
+        self._rerank: Dict[str, Optional[tuple]] = {}
+
+    def has_collection(self, collection_name: str) -> bool:
+        return self.client.has_collection(collection_name)
+
+    def create_collection(self, collection_name: str, spec: CollectionSpec):
+        from pymilvus import DataType, FieldSchema, CollectionSchema
+
+        index_type, index_params = spec.index_type, spec.index_params
+        if spec.vector_dtype == "float16":
+            vector_type = DataType.FLOAT16_VECTOR
+        elif spec.vector_dtype == "int8":
+            # Milvus 在索引层做标量量化，原始向量仍以 float32 保存
+            vector_type = DataType.FLOAT_VECTOR
+            if index_type == "AUTOINDEX":
+                index_type, index_params = "IVF_SQ8", {"nlist": 1024, **index_params}
+        elif spec.vector_dtype == "float32":
+            vector_type = DataType.FLOAT_VECTOR
+        else:
+            raise ValueError(f"Vector dtype {spec.vector_dtype} is not supported by the Milvus store")
+
+        fields = [
+            FieldSchema(name="id", dtype=DataType.INT64, is_primary=True, auto_id=True),
+            FieldSchema(name="vector", dtype=vector_type, dim=spec.dim),
+        ]
+        fields.extend(
+            FieldSchema(name=name, dtype=DataType.VARCHAR, is_nullable=True, max_length=max_length)
+            for name, max_length in spec.scalar_fields.items()
+        )
+        rerank = spec.vector_dtype in ("float16", "int8") and spec.metric_type in ("COSINE", "IP")
+        if rerank:
+            fields.append(FieldSchema(name=self.RERANK_FIELD, dtype=DataType.FLOAT_VECTOR, dim=spec.dim,
+                                      **({"mmap_enabled": True} if self.MMAP_RERANK_FIELD else {})))
+        if spec.sparse:
+            fields.append(FieldSchema(name="sparse_vector", dtype=DataType.SPARSE_FLOAT_VECTOR))
+        schema = CollectionSchema(fields, spec.description, enable_dynamic_field=True)
+        self.client.create_collection(collection_name=collection_name, schema=schema)
+
+        milvus_index_params = self.client.prepare_index_params()
+        milvus_index_params.add_index(
+            field_name="vector",
+            index_type=index_type,
+            metric_type=spec.metric_type,
+            params=index_params
+        )
+        if rerank:
+            # Milvus 要求每个向量字段都有索引才能加载；FLAT 不另建结构，只用于取回候选的原始向量
+            milvus_index_params.add_index(
+                field_name=self.RERANK_FIELD,
+                index_type="FLAT",
+                metric_type=spec.metric_type
+            )
+        if spec.sparse:
+            milvus_index_params.add_index(
+                field_name="sparse_vector",
+                index_type="SPARSE_INVERTED_INDEX",
+                metric_type="IP"
+            )
+        self.client.create_index(collection_name=collection_name, index_params=milvus_index_params)
+        self._vector_dtypes[collection_name] = "float16" if spec.vector_dtype == "float16" else "float32"
+        self._sparse[collection_name] = spec.sparse
+        self._rerank[collection_name] = (spec.vector_dtype, spec.metric_type) if rerank else None
+
+    def _rerank_config(self, collection_name: str) -> Optional[tuple]:
+        if collection_name not in self._rerank:
+            description = self.client.describe_collection(collection_name)
+            if any(f["name"] == self.RERANK_FIELD for f in description["fields"]):
+                index_names = self.client.list_indexes(collection_name, field_name="vector")
+                metric_type = self.client.describe_index(collection_name, index_names[0])["metric_type"]
+                self._rerank[collection_name] = ("float16" if self._is_float16(collection_name) else "int8", metric_type)
+            else:
+                self._rerank[collection_name] = None
+        return self._rerank[collection_name]
+
+    def supports_rerank(self, collection_name: str) -> bool:
+        return self._rerank_config(collection_name) is not None
+
+    def _is_float16(self, collection_name: str) -> bool:
+        if collection_name not in self._vector_dtypes:
+            from pymilvus import DataType
+
+            description = self.client.describe_collection(collection_name)
+            vector_field = next(f for f in description["fields"] if f["name"] == "vector")
+            self._vector_dtypes[collection_name] = (
+                "float16" if vector_field["type"] == DataType.FLOAT16_VECTOR else "float32"
+            )
+        return self._vector_dtypes[collection_name] == "float16"
+
+    def drop_collection(self, collection_name: str):
+        self.client.drop_collection(collection_name)
+        self._vector_dtypes.pop(collection_name, None)
+        self._index_types.pop(collection_name, None)
+        self._sparse.pop(collection_name, None)
+        self._rerank.pop(collection_name, None)
+
+    def index_type(self, collection_name: str) -> str:
+        if collection_name not in self._index_types:
+            index_names = self.client.list_indexes(collection_name, field_name="vector")
+            description = self.client.describe_index(collection_name, index_names[0]) if index_names else {}
+            self._index_types[collection_name] = description.get("index_type", "FLAT")
+        return self._index_types[collection_name]
+
+    # 集合元数据以 JSON 字符串保存在集合属性中
+    _METADATA_PROPERTY = "app.metadata"
+
+    def get_metadata(self, collection_name: str) -> Dict:
+        properties = self.client.describe_collection(collection_name).get("properties") or {}
+        value = properties.get(self._METADATA_PROPERTY)
+        return json.loads(value) if value else {}
+
+    def set_metadata(self, collection_name: str, metadata: Dict):
+        self.client.alter_collection_properties(
+            collection_name,
+            properties={self._METADATA_PROPERTY: json.dumps(metadata, ensure_ascii=False)}
+        )
+
+    def has_sparse(self, collection_name: str) -> bool:
+        if collection_name not in self._sparse:
+            description = self.client.describe_collection(collection_name)
+            self._sparse[collection_name] = any(f["name"] == "sparse_vector" for f in description["fields"])
+        return self._sparse[collection_name]
+
+    def scan(self, collection_name, output_fields, batch_size=1000):
+        self.load(collection_name)
+        iterator = self.client.query_iterator(
+            collection_name=collection_name,
+            batch_size=batch_size,
+            filter="",
+            output_fields=output_fields
+        )
+        try:
+            while True:
+                rows = iterator.next()
+                if not rows:
+                    break
+                yield from rows
+        finally:
+            iterator.close()
+
+    def delete(self, collection_name, ids):
+        ids = [int(idx) for idx in ids]
+        if not ids:
+            return 0
+        res = self.client.delete(collection_name=collection_name, ids=ids)
+        return res["delete_count"]
+
+    def bulk_load(self, collection_name, artifact_dir, remote_prefix=None, batch_size=10000):
+        # 服务端批量导入读取的是 Milvus 对象存储里的文件，需先把产物目录同步到 remote_prefix；
+        # NumPy 导入格式不支持 float16 与稀疏向量字段，产物中也没有重排用的全精度向量列，这些集合退回逐批 insert
+        if (remote_prefix is None or self._is_float16(collection_name) or self.has_sparse(collection_name)
+                or self.supports_rerank(collection_name)):
+            if remote_prefix is not None:
+                logger.warning(f"Bulk insert is not supported for {collection_name}, falling back to row inserts")
+            return super().bulk_load(collection_name, artifact_dir, remote_prefix, batch_size)
+
+        import time
+        from pymilvus import BulkInsertState, connections, utility
+        from utils.bulk_artifacts import read_manifest
+
+        manifest = read_manifest(artifact_dir)
+        alias = f"bulk_load_{id(self)}"
+        connections.connect(alias=alias, uri=self.uri)
+        try:
+            task_ids = []
+            for partition in manifest["partitions"]:
+                prefix = f"{remote_prefix.rstrip('/')}/{partition['name']}"
+                files = [f"{prefix}/{name}.npy" for name in ["vector", *manifest["spec"]["scalar_fields"]]]
+                task_ids.append(utility.do_bulk_insert(collection_name=collection_name, files=files, using=alias))
+            total = 0
+            for task_id in task_ids:
+                while True:
+                    state = utility.get_bulk_insert_state(task_id, using=alias)
+                    if state.state in (BulkInsertState.ImportFailed, BulkInsertState.ImportFailedAndCleaned):
+                        raise RuntimeError(f"Bulk insert task {task_id} failed: {state.failed_reason}")
+                    if state.state == BulkInsertState.ImportCompleted:
+                        total += state.row_count
+                        break
+                    time.sleep(2)
+        finally:
+            connections.disconnect(alias)
+        return total
+
+    def insert(self, collection_name: str, rows: List[Dict]) -> int:
+        if self.supports_rerank(collection_name):
+            rows = [{**row, self.RERANK_FIELD: np.asarray(row["vector"], dtype=np.float32)} for row in rows]
+        if self._is_float16(collection_name):
+            rows = [{**row, "vector": np.asarray(row["vector"], dtype=np.float16)} for row in rows]
+        res = self.client.insert(collection_name=collection_name, data=rows)
+        return res["insert_count"]
+
+    def flush(self, collection_name: str):
+        self.client.flush(collection_name)
+
+    def load(self, collection_name: str):
+        self.client.load_collection(collection_name)
+
+    def release(self, collection_name: str):
+        self.client.release_collection(collection_name)
+
+    def search(self, collection_name, vectors, limit, output_fields, filter=None, search_params=None):
+        search_params = dict(search_params or {})
+        rerank = self._rerank_config(collection_name)
+        rerank_factor = search_params.pop("rerank_factor", DEFAULT_RERANK_FACTORS[rerank[0]] if rerank else 0)
+        rerank_factor = rerank_factor if rerank else 0
+        kwargs = {}
+        if filter:
+            kwargs["filter"] = filter
+        if search_params:
+            kwargs["search_params"] = {"params": search_params}
+        queries = np.asarray(vectors, dtype=np.float32)
+        if self._is_float16(collection_name):
+            vectors = [np.asarray(vector, dtype=np.float16) for vector in vectors]
+        results = self.client.search(
+            collection_name=collection_name,
+            data=vectors,
+            anns_field="vector",
+            limit=limit * rerank_factor if rerank_factor > 0 else limit,
+            output_fields=output_fields + [self.RERANK_FIELD] if rerank_factor > 0 else output_fields,
+            **kwargs
+        )
+        if rerank_factor <= 0:
+            return results
+        if rerank[1] == "COSINE":
+            queries = _normalize(queries)
+        reranked = []
+        for query, hits in zip(queries, results):
+            hits = list(hits)
+            if not hits:
+                reranked.append([])
+                continue
+            full = np.asarray([hit["entity"].pop(self.RERANK_FIELD) for hit in hits], dtype=np.float32)
+            if rerank[1] == "COSINE":
+                full = _normalize(full)
+            exact = full @ query
+            reranked.append([{**hits[idx], "distance": float(exact[idx])} for idx in np.argsort(-exact)[:limit]])
+        return reranked
+
+    def sparse_search(self, collection_name, sparse_vectors, limit, output_fields, filter=None):
+        # 查询中没有任何已知词项时 Milvus 拒绝空稀疏向量，直接返回空结果
+        non_empty = [idx for idx, vector in enumerate(sparse_vectors) if vector]
+        results = [[] for _ in sparse_vectors]
+        if not non_empty:
+            return results
+        kwargs = {"filter": filter} if filter else {}
+        hits = self.client.search(
+            collection_name=collection_name,
+            data=[sparse_vectors[idx] for idx in non_empty],
+            anns_field="sparse_vector",
+            limit=limit,
+            output_fields=output_fields,
+            search_params={"metric_type": "IP"},
+            **kwargs
+        )
+        for idx, row_hits in zip(non_empty, hits):
+            results[idx] = [hit for hit in row_hits if hit["distance"] > 0]
+        return results
+
+    def close(self):
+        self.client.close()
+
+class MilvusLiteVectorStore(MilvusVectorStore):
+    """Milvus Lite 本地文件后端（db_path 默认为 backend/db/snomed_bge_m3.db）"""
+    # Milvus Lite 不支持 mmap 字段
+    MMAP_RERANK_FIELD = False
+
+    def __init__(self, db_path: str = DEFAULT_MILVUS_LITE_PATH):
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        super().__init__(db_path)
+
+class NumpyVectorStore(VectorStore):
+    """
+    进程内暴力检索后端
+    每个集合保存为 root_dir/<collection>/ 下的归一化 float32 矩阵 vectors.npy
+    （以只读 mmap 加载）与列式标量字段 fields.json；
+    检索为一次批量矩阵乘加 argpartition 取 top-k，适合数万量级的术语表。
+    vector_dtype 非 float32 时另存压缩码 codes.npy 常驻内存，先用压缩码取
+    limit * rerank_factor 个候选，再从 mmap 中读取候选的全精度向量重排。
+    稀疏集合另存 CSR 形式的 sparse.npz，加载时转成按词项排列的倒排表。
+    insert 的每批直接追加到集合目录下的暂存文件（pending.*），内存中只保留当前批；
+    flush 时按块把已有矩阵与暂存向量拷进新的 vectors.npy，内存占用与集合大小无关。
+    主键 id 即行号；delete 与 insert 一样在 flush 时生效，先删除再追加，
+    删除后其余行的 id 会前移
+    """
+    # 暂存文件：float32 向量、每行一个 JSON 对象的标量字段，以及稀疏向量的 CSR 三个数组
+    _STAGING_FILES = {
+        "vectors": "pending.vectors.f32",
+        "fields": "pending.fields.jsonl",
+        "sparse_lengths": "pending.sparse_lengths.i64",
+        "sparse_indices": "pending.sparse_indices.i64",
+        "sparse_values": "pending.sparse_values.f32",
+    }
+    # flush 时每次拷贝的行数
+    _COPY_ROWS = 65536
+
+    def __init__(self, root_dir: str = DEFAULT_NUMPY_DIR):
+        self.root_dir = root_dir
+        self._collections: Dict[str, Dict] = {}
+        # 本实例写入暂存文件、尚未 flush 的行数
+        self._pending: Dict[str, int] = {}
+        self._deleted: Dict[str, set] = {}
+        self._lock = threading.Lock()
+
+    def _dir(self, collection_name: str) -> str:
+        return os.path.join(self.root_dir, collection_name)
+
+    def _read_meta(self, collection_name: str) -> Dict:
+        with open(os.path.join(self._dir(collection_name), "meta.json"), encoding="utf-8") as f:
+            return json.load(f)
+
+    def has_collection(self, collection_name: str) -> bool:
+        return os.path.exists(os.path.join(self._dir(collection_name), "meta.json"))
+
+    def create_collection(self, collection_name: str, spec: CollectionSpec):
+        if spec.metric_type not in ("COSINE", "IP"):
+            raise ValueError(f"Unsupported metric for numpy store: {spec.metric_type}")
+        if spec.vector_dtype not in VECTOR_DTYPES:
+            raise ValueError(f"Unsupported vector dtype: {spec.vector_dtype}")
+        directory = self._dir(collection_name)
+        os.makedirs(directory, exist_ok=True)
+        meta = {
+            "dim": spec.dim,
+            "metric_type": spec.metric_type,
+            "description": spec.description,
+            "scalar_fields": spec.scalar_fields,
+            "vector_dtype": spec.vector_dtype,
+            "sparse": spec.sparse,
+            "count": 0
+        }
+        np.save(os.path.join(directory, "vectors.npy"), np.zeros((0, spec.dim), dtype=np.float32))
+        if spec.sparse:
+            np.savez(
+                os.path.join(directory, "sparse.npz"),
+                indptr=np.zeros(1, dtype=np.int64),
+                indices=np.zeros(0, dtype=np.int64),
+                values=np.zeros(0, dtype=np.float32)
+            )
+        with open(os.path.join(directory, "fields.json"), "w", encoding="utf-8") as f:
+            json.dump({name: [] for name in spec.scalar_fields}, f)
+        with open(os.path.join(directory, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False, indent=2)
+
+    def drop_collection(self, collection_name: str):
+        import shutil
+
+        with self._lock:
+            self._collections.pop(collection_name, None)
+            self._pending.pop(collection_name, None)
+            self._deleted.pop(collection_name, None)
+        shutil.rmtree(self._dir(collection_name), ignore_errors=True)
+
+    def _staging_path(self, collection_name: str, name: str) -> str:
+        return os.path.join(self._dir(collection_name), self._STAGING_FILES[name])
+
+    def _clear_staging(self, collection_name: str):
+        for name in self._STAGING_FILES:
+            path = self._staging_path(collection_name, name)
+            if os.path.exists(path):
+                os.remove(path)
+
+    def insert(self, collection_name: str, rows: List[Dict]) -> int:
+        # 每批直接追加写入暂存文件，flush 时再合并，避免每批重写整个矩阵，也不在内存中累积
+        if not rows:
+            return 0
+        meta = self._read_meta(collection_name)
+        vectors = np.asarray([row["vector"] for row in rows], dtype=np.float32)
+        if vectors.shape[1] != meta["dim"]:
+            raise ValueError(f"Expected {meta['dim']}-dimensional vectors, got {vectors.shape[1]}")
+        if meta["metric_type"] == "COSINE":
+            vectors = _normalize(vectors)
+        lines = "".join(
+            json.dumps({name: row.get(name) for name in meta["scalar_fields"]}, ensure_ascii=False) + "\n"
+            for row in rows
+        )
+        if meta.get("sparse"):
+            sparse_vectors = [row.get("sparse_vector") or {} for row in rows]
+            lengths = np.fromiter((len(vector) for vector in sparse_vectors), dtype=np.int64, count=len(rows))
+            indices = np.fromiter((int(k) for vector in sparse_vectors for k in vector), dtype=np.int64, count=int(lengths.sum()))
+            values = np.fromiter((v for vector in sparse_vectors for v in vector.values()), dtype=np.float32, count=int(lengths.sum()))
+        with self._lock:
+            if collection_name not in self._pending:
+                # 丢弃上次异常退出时遗留的、未 flush 的暂存数据
+                self._clear_staging(collection_name)
+                self._pending[collection_name] = 0
+            with open(self._staging_path(collection_name, "vectors"), "ab") as f:
+                vectors.tofile(f)
+            with open(self._staging_path(collection_name, "fields"), "a", encoding="utf-8") as f:
+                f.write(lines)
+            if meta.get("sparse"):
+                for name, array in (("sparse_lengths", lengths), ("sparse_indices", indices), ("sparse_values", values)):
+                    with open(self._staging_path(collection_name, name), "ab") as f:
+                        array.tofile(f)
+            self._pending[collection_name] += len(rows)
+        return len(rows)
+
+    def scan(self, collection_name, output_fields, batch_size=1000):
+        with open(os.path.join(self._dir(collection_name), "fields.json"), encoding="utf-8") as f:
+            fields = json.load(f)
+        count = self._read_meta(collection_name)["count"]
+        names = [name for name in output_fields if name in fields]
+        for idx in range(count):
+            yield {"id": idx, **{name: fields[name][idx] for name in names}}
+
+    def delete(self, collection_name, ids):
+        ids = {int(idx) for idx in ids}
+        with self._lock:
+            self._deleted.setdefault(collection_name, set()).update(ids)
+        return len(ids)
+
+    def bulk_load(self, collection_name, artifact_dir, remote_prefix=None, batch_size=10000):
+        # 产物的 vector.npy 与 vectors.npy 同为归一化 float32 矩阵：
+        # 空集合导入单个分区时直接硬链接（跨文件系统时复制），检索时 mmap 的就是产物文件；
+        # 否则用 open_memmap 把已有矩阵与各分区逐块拷进新文件，不在内存中拼接整个矩阵
+        import shutil
+        from utils.bulk_artifacts import read_manifest, read_partition
+
+        self.flush(collection_name)
+        manifest = read_manifest(artifact_dir)
+        directory = self._dir(collection_name)
+        meta = self._read_meta(collection_name)
+        spec = manifest["spec"]
+        if spec["dim"] != meta["dim"] or spec["metric_type"] != meta["metric_type"]:
+            raise ValueError(
+                f"Artifact {artifact_dir} ({spec['dim']}d {spec['metric_type']}) does not match "
+                f"collection {collection_name} ({meta['dim']}d {meta['metric_type']})"
+            )
+        partitions = manifest["partitions"]
+        with open(os.path.join(directory, "fields.json"), encoding="utf-8") as f:
+            fields = json.load(f)
+
+        vectors_path = os.path.join(directory, "vectors.npy")
+        tmp_path = vectors_path + ".tmp.npy"
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        if meta["count"] == 0 and len(partitions) == 1:
+            source = os.path.join(artifact_dir, partitions[0]["name"], "vector.npy")
+            try:
+                os.link(source, tmp_path)
+            except OSError:
+                shutil.copyfile(source, tmp_path)
+            merged = None
+        else:
+            existing = np.load(vectors_path, mmap_mode="r")
+            merged = np.lib.format.open_memmap(
+                tmp_path, mode="w+", dtype=np.float32, shape=(meta["count"] + manifest["rows"], meta["dim"])
+            )
+            merged[:meta["count"]] = existing[:meta["count"]]
+            del existing
+
+        offset = meta["count"]
+        sparse_parts = []
+        for partition in partitions:
+            part_vectors, part_fields, part_sparse = read_partition(artifact_dir, partition, list(spec["scalar_fields"]))
+            if merged is not None:
+                merged[offset:offset + partition["rows"]] = part_vectors
+            for name in fields:
+                fields[name].extend(part_fields.get(name, [None] * partition["rows"]))
+            if meta.get("sparse"):
+                if part_sparse is None:
+                    part_sparse = (np.zeros(partition["rows"] + 1, dtype=np.int64), np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32))
+                sparse_parts.append(part_sparse)
+            offset += partition["rows"]
+        if merged is not None:
+            merged.flush()
+            del merged
+        meta["count"] = offset
+
+        vector_dtype = meta.get("vector_dtype", "float32")
+        if vector_dtype != "float32":
+            codes, meta["quantization"] = quantize(np.load(tmp_path, mmap_mode="r"), vector_dtype)
+            _atomic_save_npy(os.path.join(directory, "codes.npy"), codes)
+        if sparse_parts:
+            _concat_sparse(os.path.join(directory, "sparse.npz"), sparse_parts)
+        os.replace(tmp_path, vectors_path)
+        _atomic_write_json(os.path.join(directory, "fields.json"), fields)
+        _atomic_write_json(os.path.join(directory, "meta.json"), meta)
+        self.release(collection_name)
+        return manifest["rows"]
+
+    def flush(self, collection_name: str):
+        with self._lock:
+            pending = self._pending.pop(collection_name, 0)
+            deleted = self._deleted.pop(collection_name, set())
+            self._collections.pop(collection_name, None)
+        if not pending and not deleted:
+            return
+
+        directory = self._dir(collection_name)
+        meta = self._read_meta(collection_name)
+        existing = np.load(os.path.join(directory, "vectors.npy"), mmap_mode="r")
+        with open(os.path.join(directory, "fields.json"), encoding="utf-8") as f:
+            fields = json.load(f)
+
+        keep = None
+        if deleted:
+            keep = np.ones(len(existing), dtype=bool)
+            keep[[idx for idx in deleted if idx < len(existing)]] = False
+            fields = {name: [value for value, kept in zip(values, keep) if kept] for name, values in fields.items()}
+        kept = len(existing) if keep is None else int(keep.sum())
+
+        # 先写临时文件再替换，检索进程不会读到写了一半的文件；已有行与暂存行都按块拷贝
+        vectors_path = os.path.join(directory, "vectors.npy")
+        tmp_path = vectors_path + ".tmp.npy"
+        merged = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=np.float32, shape=(kept + pending, meta["dim"]))
+        offset = 0
+        for start in range(0, len(existing), self._COPY_ROWS):
+            block = existing[start:start + self._COPY_ROWS]
+            if keep is not None:
+                block = block[keep[start:start + self._COPY_ROWS]]
+            merged[offset:offset + len(block)] = block
+            offset += len(block)
+        if pending:
+            staged = np.memmap(self._staging_path(collection_name, "vectors"), dtype=np.float32, mode="r",
+                               shape=(pending, meta["dim"]))
+            for start in range(0, pending, self._COPY_ROWS):
+                block = staged[start:start + self._COPY_ROWS]
+                merged[offset:offset + len(block)] = block
+                offset += len(block)
+            del staged
+            with open(self._staging_path(collection_name, "fields"), encoding="utf-8") as f:
+                for line in f:
+                    row = json.loads(line)
+                    for name in fields:
+                        fields[name].append(row.get(name))
+        merged.flush()
+        del merged, existing
+        meta["count"] = kept + pending
+
+        vector_dtype = meta.get("vector_dtype", "float32")
+        if vector_dtype != "float32":
+            codes, meta["quantization"] = quantize(np.load(tmp_path, mmap_mode="r"), vector_dtype)
+            _atomic_save_npy(os.path.join(directory, "codes.npy"), codes)
+        if meta.get("sparse"):
+            parts = []
+            if pending:
+                lengths = np.fromfile(self._staging_path(collection_name, "sparse_lengths"), dtype=np.int64)
+                parts.append((
+                    np.concatenate([[0], np.cumsum(lengths)]).astype(np.int64),
+                    np.fromfile(self._staging_path(collection_name, "sparse_indices"), dtype=np.int64),
+                    np.fromfile(self._staging_path(collection_name, "sparse_values"), dtype=np.float32),
+                ))
+            _concat_sparse(os.path.join(directory, "sparse.npz"), parts, keep)
+        os.replace(tmp_path, vectors_path)
+        _atomic_write_json(os.path.join(directory, "fields.json"), fields)
+        _atomic_write_json(os.path.join(directory, "meta.json"), meta)
+        if pending:
+            self._clear_staging(collection_name)
+
+    def load(self, collection_name: str):
+        with self._lock:
+            if collection_name in self._collections:
+                return
+        directory = self._dir(collection_name)
+        meta = self._read_meta(collection_name)
+        vectors = np.load(os.path.join(directory, "vectors.npy"), mmap_mode="r")
+        codes = None
+        if meta.get("vector_dtype", "float32") != "float32" and meta["count"] > 0:
+            codes = np.load(os.path.join(directory, "codes.npy"))
+        with open(os.path.join(directory, "fields.json"), encoding="utf-8") as f:
+            fields = json.load(f)
+        postings = _load_postings(os.path.join(directory, "sparse.npz")) if meta.get("sparse") else None
+        with self._lock:
+            self._collections[collection_name] = {
+                "meta": meta, "vectors": vectors, "codes": codes, "fields": fields, "postings": postings
+            }
+        logger.info(f"Loaded numpy collection {collection_name}: {vectors.shape[0]} x {vectors.shape[1]}")
+
+    def release(self, collection_name: str):
+        with self._lock:
+            self._collections.pop(collection_name, None)
+
+    def index_type(self, collection_name: str) -> str:
+        return "NUMPY_" + self._read_meta(collection_name).get("vector_dtype", "float32").upper()
+
+    def supports_rerank(self, collection_name: str) -> bool:
+        return self._read_meta(collection_name).get("vector_dtype", "float32") != "float32"
+
+    def has_sparse(self, collection_name: str) -> bool:
+        return bool(self._read_meta(collection_name).get("sparse"))
+
+    def get_metadata(self, collection_name: str) -> Dict:
+        return self._read_meta(collection_name).get("metadata", {})
+
+    def set_metadata(self, collection_name: str, metadata: Dict):
+        with self._lock:
+            meta = self._read_meta(collection_name)
+            meta["metadata"] = metadata
+            _atomic_write_json(os.path.join(self._dir(collection_name), "meta.json"), meta)
+
+    def _filter_mask(self, collection: Dict, filter: str) -> np.ndarray:
+        """解析 field == "value" 形式的等值过滤表达式，结果按表达式缓存"""
+        masks = collection.setdefault("filter_masks", {})
+        if filter not in masks:
+            match = _EQUALITY_FILTER_RE.match(filter)
+            if match is None:
+                raise NotImplementedError(f"Unsupported filter expression for numpy store: {filter}")
+            name, value = match.group(1), _unescape(match.group(3))
+            if name not in collection["fields"]:
+                raise ValueError(f"Unknown filter field: {name}")
+            masks[filter] = np.fromiter(
+                (item == value for item in collection["fields"][name]),
+                dtype=bool,
+                count=len(collection["fields"][name])
+            )
+        return masks[filter]
+
+    def search(self, collection_name, vectors, limit, output_fields, filter=None, search_params=None):
+        self.load(collection_name)
+        collection = self._collections[collection_name]
+        matrix = collection["vectors"]
+        if matrix.shape[0] == 0:
+            return [[] for _ in vectors]
+
+        search_params = search_params or {}
+        mask = self._filter_mask(collection, filter) if filter else None
+        meta = collection["meta"]
+        queries = np.asarray(vectors, dtype=np.float32)
+        if meta["metric_type"] == "COSINE":
+            queries = _normalize(queries)
+
+        vector_dtype = meta.get("vector_dtype", "float32")
+        if vector_dtype == "float32":
+            scores = queries @ matrix.T
+            if mask is not None:
+                scores[:, ~mask] = -np.inf
+            ids = _top_k(scores, limit)
+            distances = np.take_along_axis(scores, ids, axis=1)
+        else:
+            rerank_factor = search_params.get("rerank_factor", DEFAULT_RERANK_FACTORS[vector_dtype])
+            approx = score_codes(queries, collection["codes"], vector_dtype, meta["quantization"])
+            if mask is not None:
+                approx[:, ~mask] = -np.inf
+            if rerank_factor > 0:
+                ids, distances = _rerank(queries, matrix, _top_k(approx, limit * rerank_factor), limit, mask)
+            else:
+                ids = _top_k(approx, limit)
+                distances = np.take_along_axis(approx, ids, axis=1)
+
+        # 与 Milvus 范围检索一致：只保留相似度大于 radius 的结果；同时去掉被过滤的行
+        radius = search_params.get("radius", -np.inf)
+        fields = collection["fields"]
+        return [
+            [
+                {
+                    "id": int(idx),
+                    "distance": float(distance),
+                    "entity": {name: fields[name][idx] for name in output_fields if name in fields}
+                }
+                for idx, distance in zip(row_ids, row_distances)
+                if distance > radius and (mask is None or mask[idx])
+            ]
+            for row_ids, row_distances in zip(ids, distances)
+        ]
+
+    def sparse_search(self, collection_name, sparse_vectors, limit, output_fields, filter=None):
+        self.load(collection_name)
+        collection = self._collections[collection_name]
+        postings = collection["postings"]
+        if postings is None:
+            raise ValueError(f"Collection {collection_name} has no sparse vectors")
+
+        n = collection["meta"]["count"]
+        mask = self._filter_mask(collection, filter) if filter else None
+        terms, starts, rows, values = postings["terms"], postings["starts"], postings["rows"], postings["values"]
+        fields = collection["fields"]
+        results = []
+        for sparse_vector in sparse_vectors:
+            # 按查询词项累加倒排表中的权重，每个词项在一行中至多出现一次
+            scores = np.zeros(n, dtype=np.float32)
+            for term, weight in sparse_vector.items():
+                pos = np.searchsorted(terms, int(term))
+                if pos < len(terms) and terms[pos] == int(term):
+                    start, end = starts[pos], starts[pos + 1]
+                    scores[rows[start:end]] += weight * values[start:end]
+            if mask is not None:
+                scores[~mask] = 0
+            candidates = np.flatnonzero(scores > 0)
+            if len(candidates) > limit:
+                candidates = candidates[np.argpartition(-scores[candidates], limit - 1)[:limit]]
+            candidates = candidates[np.argsort(-scores[candidates], kind="stable")]
+            results.append([
+                {
+                    "id": int(idx),
+                    "distance": float(scores[idx]),
+                    "entity": {name: fields[name][idx] for name in output_fields if name in fields}
+                }
+                for idx in candidates
+            ])
+        return results
+
+    def close(self):
+        with self._lock:
+            self._collections.clear()
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """对每行得分取降序 top-k 下标：先 argpartition 选出 k 个，再只对这 k 个排序"""
+    k = min(k, scores.shape[1])
+    if k < scores.shape[1]:
+        candidates = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    else:
+        candidates = np.tile(np.arange(scores.shape[1]), (scores.shape[0], 1))
+    order = np.argsort(-np.take_along_axis(scores, candidates, axis=1), axis=1)
+    return np.take_along_axis(candidates, order, axis=1)
+
+_EQUALITY_FILTER_RE = re.compile(r'^\s*(\w+)\s*==\s*(["\'])((?:[^\\]|\\.)*?)\2\s*$')
+
+def _unescape(value: str) -> str:
+    return re.sub(r"\\(.)", r"\1", value)
+
+def _rerank(queries: np.ndarray, matrix: np.ndarray, candidates: np.ndarray, k: int, mask: Optional[np.ndarray] = None):
+    """用全精度向量对候选重新打分，只从 mmap 读取候选所在的行"""
+    ids, distances = [], []
+    for query, row_candidates in zip(queries, candidates):
+        row_candidates = np.sort(row_candidates)
+        if mask is not None:
+            row_candidates = row_candidates[mask[row_candidates]]
+        exact = np.asarray(matrix[row_candidates], dtype=np.float32) @ query
+        order = np.argsort(-exact)[:k]
+        ids.append(row_candidates[order])
+        distances.append(exact[order])
+    return ids, distances
+
+def _concat_sparse(path: str, parts: List[tuple], keep: Optional[np.ndarray] = None):
+    """把若干 CSR 分块 (indptr, indices, values) 按行追加到 CSR 文件；keep 不为空时先去掉被删除的行"""
+    with np.load(path) as data:
+        indptr, indices, values = data["indptr"], data["indices"], data["values"]
+    if keep is not None:
+        row_lengths = np.diff(indptr)
+        entry_mask = np.repeat(keep, row_lengths)
+        indices, values = indices[entry_mask], values[entry_mask]
+        indptr = np.concatenate([[0], np.cumsum(row_lengths[keep])]).astype(np.int64)
+    indptr, indices, values = [indptr], [indices], [values]
+    for part_indptr, part_indices, part_values in parts:
+        indptr.append(indptr[-1][-1] + part_indptr[1:])
+        indices.append(part_indices)
+        values.append(part_values)
+    tmp_path = path + ".tmp.npz"
+    np.savez(
+        tmp_path,
+        indptr=np.concatenate(indptr).astype(np.int64),
+        indices=np.concatenate(indices).astype(np.int64),
+        values=np.concatenate(values).astype(np.float32)
+    )
+    os.replace(tmp_path, path)
+
+def _load_postings(path: str) -> Dict[str, np.ndarray]:
+    """把按行存储的 CSR 稀疏矩阵转成按词项排列的倒排表"""
+    with np.load(path) as data:
+        indptr, indices, values = data["indptr"], data["indices"], data["values"]
+    row_of_entry = np.repeat(np.arange(len(indptr) - 1), np.diff(indptr))
+    order = np.argsort(indices, kind="stable")
+    sorted_terms = indices[order]
+    terms, starts = np.unique(sorted_terms, return_index=True)
+    return {
+        "terms": terms,
+        "starts": np.append(starts, len(sorted_terms)),
+        "rows": row_of_entry[order],
+        "values": values[order],
+    }
+
+def _atomic_save_npy(path: str, array: np.ndarray):
+    tmp_path = path + ".tmp.npy"
+    np.save(tmp_path, array)
+    os.replace(tmp_path, path)
+
+def _atomic_write_json(path: str, data):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+def create_vector_store(backend: Optional[str] = None, uri: Optional[str] = None) -> VectorStore:
+    """
+    按名称创建向量存储，未指定时读取环境变量 VECTOR_STORE_BACKEND / VECTOR_STORE_URI
+
+    Args:
+        backend: milvus（服务端）/ milvus-lite（本地文件）/ numpy（进程内）
+        uri: 服务地址、Milvus Lite 文件路径或 numpy 集合根目录，本地后端默认位于 backend/db 下
+    """
+    backend = (backend or os.getenv("VECTOR_STORE_BACKEND", "milvus")).lower()
+    uri = uri or os.getenv("VECTOR_STORE_URI")
+    if backend == "milvus":
+        return MilvusVectorStore(uri or "tcp://localhost:19530")
+    elif backend == "milvus-lite":
+        return MilvusLiteVectorStore(uri or DEFAULT_MILVUS_LITE_PATH)
+    elif backend == "numpy":
+        return NumpyVectorStore(uri or DEFAULT_NUMPY_DIR)
+    raise ValueError(f"Unsupported vector store backend: {backend}")